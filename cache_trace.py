@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+gem5 Cache調試跟蹤（--debug-flags=Cache）的流式分析器
+
+逐行讀取跟蹤文件（支持 .gz / .zst 壓縮，或 trace_store.py 轉換的 .ctrace），在常數內存中生成 CacheEvent，
+並彙總每個緩存的:
+  - MESI狀態轉換矩陣：填充（`Block addr ... moving from <舊狀態> to state: <新狀態>`）和
+    偵聽引起的降級/失效（`handleSnoop: snoop hit for <包>, old state is <舊狀態>` 加上同一緩存
+    下一行的 `new state is <新狀態>`）
+  - 按請求類型統計的命中/缺失次數（`access for ReadReq [...] hit/miss`）
+  - 每個set的填充次數（衝突熱圖）
+  - 緩存塊駐留時間直方圖（從填充到失效/重新填充，log2分桶，單位tick）
+"""
+
+import re
+import sys
+import gzip
+import json
+from collections import namedtuple, defaultdict
+
+MESI_STATES = ('M', 'O', 'E', 'S', 'I')
+
+CacheEvent = namedtuple('CacheEvent', [
+    'tick',        # int
+    'cache',       # 'system.l1_dcache0'
+    'kind',        # access / transition / update / mshr / create_miss / response / snoop / other
+    'cmd',         # 'ReadReq'，沒有時為None
+    'start',       # 訪問起始地址，沒有時為None
+    'end',         # 訪問結束地址（包含）
+    'flags',       # 'IF' / 'UC' 等包標誌
+    'hit',         # access事件: True/False，其它為None
+    'old_state',   # transition/snoop事件的舊狀態字母
+    'state',       # 新狀態（或命中時的狀態）字母
+    'set',         # set編號，沒有時為None
+    'way',         # way編號，沒有時為None
+    'message'      # 原始消息（僅other事件保留）
+])
+
+_PACKET_RE = re.compile(r'(\w+) \[([0-9a-f]+):([0-9a-f]+)\]((?: [A-Z]{2,})*)')
+_STATE_RE = re.compile(r'state: \S+ \((\w)\)')
+_SET_WAY_RE = re.compile(r'set: (0x[0-9a-f]+) way: (\d+)')
+_ACCESS_RE = re.compile(r'access for (\w+) \[([0-9a-f]+):([0-9a-f]+)\]((?: [A-Z]{2,})*) (hit|miss)')
+_TRANSITION_RE = re.compile(r'Block addr (0x[0-9a-f]+) \((\w+)\) moving from (.*?)to state: \S+ \((\w)\)')
+_SNOOP_RE = re.compile(r'handleSnoop: snoop hit for (\w+) \[([0-9a-f]+):([0-9a-f]+)\]((?: [A-Z]{2,})*)'
+                       r'.*?, old state is state: \S+ \((\w)\)')
+_NEW_STATE_RE = re.compile(r'new state is state: \S+ \((\w)\)')
+
+_MESSAGE_KINDS = (
+    ('sendMSHRQueuePacket', 'mshr'),
+    ('createMissPacket', 'create_miss'),
+    ('recvTimingResp', 'response'),
+    ('Block for addr', 'update'),
+)
+
+def open_trace(path):
+    """按擴展名打開（可能壓縮的）跟蹤文件，返回文本行迭代器"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("讀取 .zst 跟蹤需要zstandard: pip install zstandard")
+        import io
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+        return io.TextIOWrapper(stream)
+    return open(path, 'r')
+
+def _set_way(message):
+    match = _SET_WAY_RE.search(message)
+    if match:
+        return int(match.group(1), 16), int(match.group(2))
+    return None, None
+
+def parse_trace_line(line, pending=None):
+    """解析一行調試輸出，非緩存事件行返回None
+
+    偵聽命中的舊狀態和新狀態在相鄰兩行輸出：pending為 {緩存: (地址, 舊狀態)} 時，snoop事件
+    記下舊狀態，同一緩存的 `new state is` 行再組成transition事件（每個緩存至多一項，常數內存）；
+    pending為None時 `new state is` 行為other事件
+    """
+    tick, sep, rest = line.partition(': ')
+    if not sep or not tick.strip().isdigit():
+        return None
+    cache, sep, message = rest.partition(': ')
+    if not sep:
+        return None
+
+    tick = int(tick)
+    message = message.rstrip('\n')
+
+    if message.startswith('access for '):
+        match = _ACCESS_RE.match(message)
+        if match:
+            cmd, start, end, flags, result = match.groups()
+            state = _STATE_RE.search(message)
+            set_index, way = _set_way(message)
+            return CacheEvent(tick, cache, 'access', cmd, int(start, 16), int(end, 16),
+                              flags.strip(), result == 'hit', None,
+                              state.group(1) if state else None, set_index, way, None)
+
+    if message.startswith('Block addr '):
+        match = _TRANSITION_RE.match(message)
+        if match:
+            addr, _, old, new = match.groups()
+            old_state = _STATE_RE.search(old)
+            set_index, way = _set_way(message)
+            return CacheEvent(tick, cache, 'transition', None, int(addr, 16), None, '',
+                              None, old_state.group(1) if old_state else 'I', new,
+                              set_index, way, None)
+
+    if message.startswith('handleSnoop: snoop hit'):
+        match = _SNOOP_RE.match(message)
+        if match:
+            cmd, start, end, flags, old = match.groups()
+            if pending is not None:
+                pending[cache] = (int(start, 16), old)
+            set_index, way = _set_way(message)
+            return CacheEvent(tick, cache, 'snoop', cmd, int(start, 16), int(end, 16),
+                              flags.strip(), None, old, None, set_index, way, None)
+
+    if message.startswith('new state is') and pending and cache in pending:
+        match = _NEW_STATE_RE.match(message)
+        if match:
+            addr, old = pending.pop(cache)
+            set_index, way = _set_way(message)
+            return CacheEvent(tick, cache, 'transition', None, addr, None, '',
+                              None, old, match.group(1), set_index, way, None)
+
+    for prefix, kind in _MESSAGE_KINDS:
+        if message.startswith(prefix):
+            packet = _PACKET_RE.search(message)
+            if packet:
+                cmd, start, end, flags = packet.groups()
+                return CacheEvent(tick, cache, kind, cmd, int(start, 16), int(end, 16),
+                                  flags.strip(), None, None, None, None, None, None)
+            return CacheEvent(tick, cache, kind, None, None, None, '',
+                              None, None, None, None, None, None)
+
+    return CacheEvent(tick, cache, 'other', None, None, None, '',
+                      None, None, None, None, None, message)
+
+def iter_cache_events(path_or_lines):
+    """從文件路徑或行迭代器中逐個產生CacheEvent（生成器，常數內存）"""
+    if isinstance(path_or_lines, str):
+        from trace_store import is_binary_trace, TraceFile
+        if is_binary_trace(path_or_lines):
+            trace = TraceFile(path_or_lines)
+            yield from trace.to_events(trace.events)
+            return
+        with open_trace(path_or_lines) as f:
+            yield from iter_cache_events(f)
+        return
+
+    pending = {}
+    for line in path_or_lines:
+        event = parse_trace_line(line, pending)
+        if event is not None:
+            yield event
+
+def iter_accesses(path_or_lines, caches=None):
+    """只產生訪問事件 (tick, cache, cmd, start, size, hit)，可按緩存名過濾"""
+    for event in iter_cache_events(path_or_lines):
+        if event.kind != 'access':
+            continue
+        if caches is not None and event.cache not in caches:
+            continue
+        yield event.tick, event.cache, event.cmd, event.start, event.end - event.start + 1, event.hit
+
+def _log2_bucket(value):
+    return max(0, int(value).bit_length() - 1)
+
+class TraceAnalyzer:
+    """對CacheEvent流進行單遍彙總"""
+
+    def __init__(self, block_size=64):
+        self.block_size = block_size
+        self.events = 0
+        self.first_tick = None
+        self.last_tick = None
+        # {cache: {(舊狀態, 新狀態): 次數}}
+        self.transitions = defaultdict(lambda: defaultdict(int))
+        # {cache: {請求類型: [命中, 缺失]}}
+        self.accesses = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        # {cache: {set: 填充次數}}
+        self.set_fills = defaultdict(lambda: defaultdict(int))
+        # {cache: {log2(駐留tick): 次數}}
+        self.lifetimes = defaultdict(lambda: defaultdict(int))
+        # {(cache, 塊地址): 填充tick}，只保存當前駐留的塊
+        self._resident = {}
+
+    def feed(self, event):
+        self.events += 1
+        if self.first_tick is None:
+            self.first_tick = event.tick
+        self.last_tick = event.tick
+
+        if event.kind == 'access':
+            counts = self.accesses[event.cache][event.cmd]
+            counts[0 if event.hit else 1] += 1
+        elif event.kind == 'transition':
+            self.transitions[event.cache][(event.old_state, event.state)] += 1
+            key = (event.cache, event.start - event.start % self.block_size)
+
+            if event.old_state == 'I':
+                # 從無效狀態填充：如果塊已駐留，說明期間被替換過，以重新填充結束上一次駐留
+                # （偵聽失效在下面結束駐留）
+                if event.set is not None:
+                    self.set_fills[event.cache][event.set] += 1
+                self._end_lifetime(key, event.tick)
+                self._resident[key] = event.tick
+            elif event.state == 'I':
+                self._end_lifetime(key, event.tick)
+
+    def _end_lifetime(self, key, tick):
+        filled = self._resident.pop(key, None)
+        if filled is not None:
+            self.lifetimes[key[0]][_log2_bucket(tick - filled)] += 1
+
+    def consume(self, events):
+        for event in events:
+            self.feed(event)
+        return self
+
+    def summary(self):
+        """返回可JSON序列化的彙總結果"""
+        caches = sorted(set(self.transitions) | set(self.accesses) | set(self.set_fills))
+        result = {
+            'events': self.events,
+            'first_tick': self.first_tick,
+            'last_tick': self.last_tick,
+            'caches': {}
+        }
+        for cache in caches:
+            matrix = {old: {new: self.transitions[cache].get((old, new), 0) for new in MESI_STATES}
+                      for old in MESI_STATES}
+            result['caches'][cache] = {
+                'transition_matrix': matrix,
+                'accesses': {cmd: {'hits': hits, 'misses': misses}
+                             for cmd, (hits, misses) in sorted(self.accesses[cache].items())},
+                'set_fills': dict(sorted(self.set_fills[cache].items())),
+                'lifetime_log2_ticks': dict(sorted(self.lifetimes[cache].items()))
+            }
+        return result
+
+def analyze_trace(path, block_size=64):
+    """分析一個跟蹤文件，返回彙總結果（.ctrace 在記錄數組上向量化計算）"""
+    from trace_store import is_binary_trace, TraceFile, summarize
+    if is_binary_trace(path):
+        return summarize(TraceFile(path), block_size)
+    return TraceAnalyzer(block_size).consume(iter_cache_events(path)).summary()
+
+def print_summary(summary):
+    """打印彙總結果"""
+    print(f"事件數: {summary['events']:,}  (tick {summary['first_tick']} - {summary['last_tick']})")
+    for cache, data in summary['caches'].items():
+        print(f"\n=== {cache} ===")
+
+        print("MESI轉換矩陣 (行: 舊狀態, 列: 新狀態)")
+        print("      " + "".join(f"{state:>10}" for state in MESI_STATES))
+        for old in MESI_STATES:
+            row = data['transition_matrix'][old]
+            print(f"  {old:>3} " + "".join(f"{row[new]:>10,}" for new in MESI_STATES))
+
+        if data['accesses']:
+            print("按請求類型的命中/缺失")
+            for cmd, counts in data['accesses'].items():
+                total = counts['hits'] + counts['misses']
+                print(f"  {cmd:<20} 命中 {counts['hits']:>10,}  缺失 {counts['misses']:>10,}  "
+                      f"缺失率 {counts['misses'] / total * 100:6.2f}%")
+
+        if data['set_fills']:
+            hottest = sorted(data['set_fills'].items(), key=lambda item: item[1], reverse=True)[:5]
+            print("填充最多的set: " + ", ".join(f"{s:#x}({n})" for s, n in hottest))
+
+        if data['lifetime_log2_ticks']:
+            print("塊駐留時間直方圖 (ticks)")
+            for bucket, count in data['lifetime_log2_ticks'].items():
+                print(f"  [{1 << bucket:>12}, {1 << (bucket + 1):>12}) {count:>8,}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='gem5 Cache調試跟蹤分析')
+    parser.add_argument('trace', help='跟蹤文件（支持 .gz / .zst 和 .ctrace）')
+    parser.add_argument('--block-size', type=int, default=64, help='緩存行大小（默認: 64）')
+    parser.add_argument('--json', help='將彙總結果保存為JSON')
+    args = parser.parse_args()
+
+    summary = analyze_trace(args.trace, args.block_size)
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n📁 彙總結果已保存: {args.json}")
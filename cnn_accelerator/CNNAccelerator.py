@@ -1,12 +1,35 @@
 # File: src/cnn_accelerator/CNNAccelerator.py
 from m5.params import *
+from m5.proxy import *
 from m5.objects.ClockedObject import ClockedObject
 
 class CNNAccelerator(ClockedObject):  # 必須繼承ClockedObject
     type = 'CNNAccelerator'
     cxx_header = "cnn_accelerator/cnn_accelerator.hh"
     cxx_class = "gem5::CNNAccelerator"
-    
-    cache_port = RequestPort("Cache port")
-    dma_port = RequestPort("DMA port")
 
+    cache_port = RequestPort("Cache port (coherent filter reads)")
+    dma_port = RequestPort("DMA port (input/output tile streaming)")
+
+    system = Param.System(Parent.any, "System the accelerator belongs to")
+
+    # 卷積層形狀（stride 1, same padding）
+    input_height = Param.Unsigned(32, "Input feature map height")
+    input_width = Param.Unsigned(32, "Input feature map width")
+    in_channels = Param.Unsigned(16, "Input channels")
+    out_channels = Param.Unsigned(16, "Output channels (number of filters)")
+    kernel_size = Param.Unsigned(3, "Filter height/width")
+    element_size = Param.Unsigned(4, "Bytes per element")
+
+    # 內存佈局（必須按緩存行對齊）
+    input_addr = Param.Addr(0x10000000, "Base address of the input feature map")
+    filter_addr = Param.Addr(0x11000000, "Base address of the filters")
+    output_addr = Param.Addr(0x12000000, "Base address of the output feature map")
+
+    # 時序參數
+    tile_size = Param.MemorySize('4kB', "Bytes of input feature map per tile")
+    max_outstanding = Param.Unsigned(8, "Maximum in-flight requests per port")
+    macs_per_cycle = Param.Unsigned(64, "MAC operations completed per cycle")
+    double_buffer = Param.Bool(True, "Overlap compute on tile i with the "
+                               "fetch of tile i+1 and the store of tile i-1")
+    start_delay = Param.Latency('1us', "Delay before the layer starts")
@@ -1,71 +1,314 @@
 // File: src/cnn_accelerator/cnn_accelerator.cc
 #include "cnn_accelerator/cnn_accelerator.hh"
-#include <iostream>
+
+#include <algorithm>
+
+#include "base/logging.hh"
+#include "base/trace.hh"
+#include "debug/CNNAccel.hh"
+#include "debug/CNNAccelMESI.hh"
 
 namespace gem5 {
 
 // 關鍵修正：使用成員初始化列表
 CNNAccelerator::CNNAccelerator(const CNNAcceleratorParams &p)
   : ClockedObject(p),                    // 使用初始化列表調用基類構造函數
-    cache_port("cache_port", this),      // 初始化端口
-    dma_port("dma_port", this)          // 初始化端口
+    cache_port("cache_port", this, "cachePort", p.max_outstanding),
+    dma_port("dma_port", this, "dmaPort", p.max_outstanding),
+    system(p.system),
+    inChannels(p.in_channels),
+    outChannels(p.out_channels),
+    kernelSize(p.kernel_size),
+    elementSize(p.element_size),
+    inputAddr(p.input_addr),
+    filterAddr(p.filter_addr),
+    outputAddr(p.output_addr),
+    numPixels(p.input_height * p.input_width),
+    filterBytes(Addr(p.kernel_size) * p.kernel_size * p.in_channels *
+                p.out_channels * p.element_size),
+    tilePixels(std::max<Addr>(1, p.tile_size /
+                                 (p.in_channels * p.element_size))),
+    macsPerCycle(p.macs_per_cycle),
+    numBuffers(p.double_buffer ? 2 : 1),
+    startDelay(p.start_delay),
+    numTiles(0),
+    filtersReady(false),
+    nextLoadTile(0),
+    loadsInFlight(0),
+    readyTiles(0),
+    computing(false),
+    computeTile(0),
+    storesInFlight(0),
+    tilesStored(0),
+    computeIdleSince(0),
+    waitingForOutput(false),
+    layerDone(false),
+    startDeferred(false),
+    drainingEngines(0),
+    startEvent([this]{ startLayer(); }, name() + ".startEvent"),
+    computeEvent([this]{ computeDone(); }, name() + ".computeEvent"),
+    stats(this),
+    layerStartTick(0)
+{
+    unsigned block_size = p.system->cacheLineSize();
+    fatal_if(macsPerCycle == 0, "%s: macs_per_cycle must be > 0", name());
+    fatal_if(inputAddr % block_size || filterAddr % block_size ||
+             outputAddr % block_size,
+             "%s: buffer addresses must be cache-line aligned", name());
+
+    cache_port.setRequestor(p.system->getRequestorId(this, "cache"),
+                            block_size);
+    dma_port.setRequestor(p.system->getRequestorId(this, "dma"), block_size);
+    cache_port.setObserver([this](PacketPtr pkt){ observeCoherence(pkt); });
+
+    numTiles = (numPixels + tilePixels - 1) / tilePixels;
+
+    DPRINTF(CNNAccel, "Layer: %d pixels, %d->%d channels, %dx%d kernel, "
+            "%d tiles, %d buffer(s)\n", numPixels, inChannels, outChannels,
+            kernelSize, kernelSize, numTiles, numBuffers);
+}
+
+CNNAccelerator::AccelStats::AccelStats(CNNAccelerator *accel)
+  : statistics::Group(accel),
+    ADD_STAT(tilesComputed, statistics::units::Count::get(),
+             "Number of tiles computed"),
+    ADD_STAT(macs, statistics::units::Count::get(),
+             "Number of multiply-accumulate operations"),
+    ADD_STAT(computeCycles, statistics::units::Cycle::get(),
+             "Cycles the MAC array was busy"),
+    ADD_STAT(inputStallCycles, statistics::units::Cycle::get(),
+             "Cycles the MAC array waited for filters or an input tile"),
+    ADD_STAT(outputStallCycles, statistics::units::Cycle::get(),
+             "Cycles the MAC array waited for a free output buffer"),
+    ADD_STAT(layerCycles, statistics::units::Cycle::get(),
+             "Cycles from layer start to the last output tile stored"),
+    ADD_STAT(computeUtilization, statistics::units::Ratio::get(),
+             "Fraction of layer cycles the MAC array was busy",
+             computeCycles / layerCycles),
+    ADD_STAT(idleCycles, statistics::units::Cycle::get(),
+             "Layer cycles the MAC array was idle",
+             layerCycles - computeCycles),
+    ADD_STAT(mesiObservations, statistics::units::Count::get(),
+             "Coherence states observed in cache_port responses")
 {
-    // 構造函數體為空，所有初始化在初始化列表中完成
-    std::cout << "[CNNAccelerator] Initialized at tick " << curTick() << std::endl;
-    std::cout << "[CNNAccelerator] Ready to monitor MESI protocol" << std::endl;
-    
-    // 自动调用MESI协议状态模拟
-    simulateMESIStates();
+    mesiObservations.init(NumMESIStates);
+    for (int state = 0; state < NumMESIStates; state++)
+        mesiObservations.subname(state, stateToString(state));
 }
 
 // 关键修正：实现getPort方法
 Port &CNNAccelerator::getPort(const std::string &if_name, PortID idx) {
     if (if_name == "cache_port") {
-        return cache_port;
+        return cache_port.port();
     } else if (if_name == "dma_port") {
-        return dma_port;
+        return dma_port.port();
     } else {
         return ClockedObject::getPort(if_name, idx);
     }
 }
 
-void CNNAccelerator::printMESIState(Addr addr, int state) {
-    std::cout << "[CNNAccelerator MESI] Tick: " << curTick() 
-              << " | Addr: 0x" << std::hex << addr << std::dec
-              << " | State: " << stateToString(state) 
-              << " | Transition detected" << std::endl;
+void CNNAccelerator::startup()
+{
+    if (layerDone) {
+        DPRINTF(CNNAccel, "Layer already finished in the checkpoint\n");
+        return;
+    }
+    if (!system->isTimingMode()) {
+        // 快進（atomic模式）期間不發送timing請求，切換到timing模式後在drainResume()中啟動
+        DPRINTF(CNNAccel, "Not in timing mode, deferring layer start\n");
+        startDeferred = true;
+        return;
+    }
+    schedule(startEvent, curTick() + startDelay);
+}
+
+DrainState CNNAccelerator::drain()
+{
+    drainingEngines = 0;
+    for (auto *engine : {&cache_port, &dma_port}) {
+        if (!engine->pause([this]{ engineDrained(); }))
+            drainingEngines++;
+    }
+    return drainingEngines ? DrainState::Draining : DrainState::Drained;
+}
+
+void CNNAccelerator::engineDrained()
+{
+    assert(drainingEngines > 0);
+    if (--drainingEngines == 0)
+        signalDrainDone();
+}
+
+void CNNAccelerator::drainResume()
+{
+    // 切換到atomic模式（CPU切換）後端口保持暫停，排隊的傳輸等切回timing模式再發送
+    if (!system->isTimingMode())
+        return;
+
+    if (startDeferred) {
+        startDeferred = false;
+        schedule(startEvent, curTick() + startDelay);
+    }
+    cache_port.resume();
+    dma_port.resume();
+}
+
+void CNNAccelerator::serialize(CheckpointOut &cp) const
+{
+    SERIALIZE_SCALAR(layerDone);
+}
+
+void CNNAccelerator::unserialize(CheckpointIn &cp)
+{
+    UNSERIALIZE_SCALAR(layerDone);
+}
+
+void CNNAccelerator::recordMESIState(Addr addr, MESIState state) {
+    stats.mesiObservations[state]++;
+    DPRINTF(CNNAccelMESI, "Addr %#x observed in state %s\n", addr,
+            stateToString(state));
 }
 
 const char* CNNAccelerator::stateToString(int state) {
     switch(state) {
-        case 0: return "Invalid (I)";
-        case 1: return "Shared (S)";
-        case 2: return "Exclusive (E)"; 
-        case 3: return "Modified (M)";
+        case Invalid: return "Invalid";
+        case Shared: return "Shared";
+        case Exclusive: return "Exclusive";
+        case Modified: return "Modified";
         default: return "Unknown";
     }
 }
 
-// 新增：模擬MESI協議狀態監控
-void CNNAccelerator::simulateMESIStates() {
-    std::cout << "\n=== CNN Accelerator MESI Protocol Simulation ===" << std::endl;
-    
-    // 模擬不同的MESI狀態轉換
-    Addr sample_addrs[] = {0x1000, 0x2000, 0x3000, 0x4000};
-    int sample_states[] = {0, 1, 2, 3}; // I, S, E, M
-    
-    for (int i = 0; i < 4; i++) {
-        printMESIState(sample_addrs[i], sample_states[i]);
-        
-        // 模擬狀態轉換
-        if (i < 3) {
-            std::cout << "[CNNAccelerator MESI] Simulating state transition..." << std::endl;
-            printMESIState(sample_addrs[i], (sample_states[i] + 1) % 4);
-        }
+// 根據響應推斷加速器觀察到的MESI狀態
+void CNNAccelerator::observeCoherence(PacketPtr pkt)
+{
+    if (pkt->isWrite()) {
+        recordMESIState(pkt->getAddr(), Modified);
+    } else if (pkt->hasSharers()) {
+        recordMESIState(pkt->getAddr(), Shared);
+    } else {
+        recordMESIState(pkt->getAddr(), Exclusive);
     }
-    
-    std::cout << "=== MESI Protocol Simulation Complete ===" << std::endl;
 }
 
-} // namespace gem5
+unsigned CNNAccelerator::pixelsInTile(unsigned tile) const
+{
+    unsigned first = tile * tilePixels;
+    return std::min(tilePixels, numPixels - first);
+}
 
+uint64_t CNNAccelerator::tileMacs(unsigned tile) const
+{
+    return uint64_t(pixelsInTile(tile)) * kernelSize * kernelSize *
+           inChannels * outChannels;
+}
+
+void CNNAccelerator::startLayer()
+{
+    DPRINTF(CNNAccel, "Layer started\n");
+    layerStartTick = curTick();
+    computeIdleSince = curTick();
+
+    // 濾波器經cache_port讀取，同時經dma_port預取輸入tile
+    cache_port.transfer(filterAddr, filterBytes, false,
+                        [this]{ filtersLoaded(); });
+    tryLoadInput();
+}
+
+void CNNAccelerator::filtersLoaded()
+{
+    filtersReady = true;
+    tryStartCompute();
+}
+
+// 有空閒輸入緩衝區時預取下一個tile
+void CNNAccelerator::tryLoadInput()
+{
+    while (nextLoadTile < numTiles &&
+           loadsInFlight + readyTiles + (computing ? 1 : 0) < numBuffers) {
+        unsigned tile = nextLoadTile++;
+        loadsInFlight++;
+        dma_port.transfer(inputAddr + Addr(tile) * tilePixels *
+                              inChannels * elementSize,
+                          Addr(pixelsInTile(tile)) * inChannels * elementSize,
+                          false, [this, tile]{ inputLoaded(tile); });
+    }
+}
+
+void CNNAccelerator::inputLoaded(unsigned tile)
+{
+    assert(loadsInFlight > 0);
+    DPRINTF(CNNAccel, "Input tile %d loaded\n", tile);
+    loadsInFlight--;
+    readyTiles++;
+    tryStartCompute();
+}
+
+void CNNAccelerator::tryStartCompute()
+{
+    if (computing || computeTile >= numTiles)
+        return;
+
+    // 輸出緩衝區全部在寫回時不能開始計算
+    bool input_ready = filtersReady && readyTiles > 0;
+    bool output_free = storesInFlight < numBuffers;
+    if (!input_ready || !output_free) {
+        waitingForOutput = input_ready && !output_free;
+        return;
+    }
+
+    // 空閒時間歸因於最後一個阻塞條件
+    Cycles idle = ticksToCycles(curTick() - computeIdleSince);
+    if (waitingForOutput) {
+        stats.outputStallCycles += idle;
+    } else {
+        stats.inputStallCycles += idle;
+    }
+
+    computing = true;
+    readyTiles--;
+
+    Cycles cycles((tileMacs(computeTile) + macsPerCycle - 1) / macsPerCycle);
+    DPRINTF(CNNAccel, "Compute tile %d for %d cycles (idle %d cycles)\n",
+            computeTile, cycles, idle);
+    stats.computeCycles += cycles;
+    schedule(computeEvent, clockEdge(cycles));
+}
+
+void CNNAccelerator::computeDone()
+{
+    assert(computing);
+    computing = false;
+    computeIdleSince = curTick();
+    waitingForOutput = false;
+
+    unsigned tile = computeTile++;
+    stats.tilesComputed++;
+    stats.macs += tileMacs(tile);
+
+    storesInFlight++;
+    dma_port.transfer(outputAddr + Addr(tile) * tilePixels *
+                          outChannels * elementSize,
+                      Addr(pixelsInTile(tile)) * outChannels * elementSize,
+                      true, [this]{ outputStored(); });
+
+    // 輸入緩衝區已釋放，繼續預取並嘗試計算下一個tile
+    tryLoadInput();
+    tryStartCompute();
+}
+
+void CNNAccelerator::outputStored()
+{
+    assert(storesInFlight > 0);
+    storesInFlight--;
+
+    if (++tilesStored == numTiles) {
+        layerDone = true;
+        stats.layerCycles += ticksToCycles(curTick() - layerStartTick);
+        DPRINTF(CNNAccel, "Layer finished (%d tiles)\n", numTiles);
+        return;
+    }
+    tryStartCompute();
+}
+
+} // namespace gem5
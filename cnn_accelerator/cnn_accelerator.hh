@@ -1,49 +1,120 @@
+
 #ifndef __CNN_ACCELERATOR_HH__
 #define __CNN_ACCELERATOR_HH__
 
-#include "mem/port.hh"
+#include "base/statistics.hh"
+#include "cnn_accelerator/request_engine.hh"
+#include "mem/packet.hh"
 #include "params/CNNAccelerator.hh"
 #include "sim/clocked_object.hh"
+#include "sim/eventq.hh"
+#include "sim/system.hh"
 
 namespace gem5 {
 
 class CNNAccelerator : public ClockedObject
 {
-  private:
-    // 自定義請求端口類別
-    class AccelRequestPort : public RequestPort
-    {
-      private:
-        CNNAccelerator *owner;
-
-      public:
-        AccelRequestPort(const std::string& name, CNNAccelerator *owner)
-          : RequestPort(name), owner(owner) {}
-
-      protected:
-        // 必須實現的純虛函數
-        bool recvTimingResp(PacketPtr pkt) override { return true; }
-        void recvReqRetry() override {}
-        void recvRangeChange() override {}
-    };
-
   public:
     //typedef CNNAcceleratorParams Params;
-    AccelRequestPort cache_port;
-    AccelRequestPort dma_port;
+    AccelRequestEngine cache_port;   // 一致性濾波器讀取
+    AccelRequestEngine dma_port;     // 輸入/輸出tile流
 
     CNNAccelerator(const CNNAcceleratorParams &p);
-    
+
     // 关键修正：添加getPort方法
     Port &getPort(const std::string &if_name, PortID idx = InvalidPortID) override;
-    
-    void printMESIState(Addr addr, int state);
-    
-    // 新增：MESI協議模擬方法
-    void simulateMESIStates();
+
+    void startup() override;
+
+    // 檢查點：drain時停止發包並等待在途請求返回；只保存層是否已完成，
+    // 從層中途的檢查點恢復時重新開始該層
+    DrainState drain() override;
+    void drainResume() override;
+    void serialize(CheckpointOut &cp) const override;
+    void unserialize(CheckpointIn &cp) override;
 
   private:
-    const char* stateToString(int state);
+    // 加速器在cache_port響應中觀察到的MESI狀態
+    enum MESIState
+    {
+        Invalid,
+        Shared,
+        Exclusive,
+        Modified,
+        NumMESIStates
+    };
+
+    static const char* stateToString(int state);
+    void recordMESIState(Addr addr, MESIState state);
+
+    void observeCoherence(PacketPtr pkt);
+
+    // 雙緩衝流水線：計算tile i的同時預取tile i+1、寫回tile i-1
+    void startLayer();
+    void filtersLoaded();
+    void tryLoadInput();
+    void inputLoaded(unsigned tile);
+    void tryStartCompute();
+    void computeDone();
+    void outputStored();
+    void engineDrained();
+
+    System *system;
+
+    // 卷積層參數
+    const unsigned inChannels;
+    const unsigned outChannels;
+    const unsigned kernelSize;
+    const unsigned elementSize;
+    const Addr inputAddr;
+    const Addr filterAddr;
+    const Addr outputAddr;
+    const unsigned numPixels;
+    const Addr filterBytes;
+
+    // 時序參數
+    const unsigned tilePixels;
+    const unsigned macsPerCycle;
+    const unsigned numBuffers;
+    const Tick startDelay;
+
+    unsigned numTiles;
+    bool filtersReady;
+    unsigned nextLoadTile;      // 下一個要預取的tile
+    unsigned loadsInFlight;     // 正在讀取的輸入tile數
+    unsigned readyTiles;        // 已讀入、等待計算的輸入tile數
+    bool computing;
+    unsigned computeTile;       // 正在計算（或下一個要計算）的tile
+    unsigned storesInFlight;    // 正在寫回的輸出tile數
+    unsigned tilesStored;
+    Tick computeIdleSince;
+    bool waitingForOutput;      // 上一次無法開始計算是否因為沒有空閒輸出緩衝區
+    bool layerDone;             // 層已完成（從檢查點恢復後不再重新運行）
+    bool startDeferred;         // 啟動時處於atomic模式，等切換到timing模式再開始
+    unsigned drainingEngines;   // drain時仍有在途請求的端口數
+
+    EventFunctionWrapper startEvent;
+    EventFunctionWrapper computeEvent;
+
+    struct AccelStats : public statistics::Group
+    {
+        AccelStats(CNNAccelerator *accel);
+
+        statistics::Scalar tilesComputed;
+        statistics::Scalar macs;
+        statistics::Scalar computeCycles;
+        statistics::Scalar inputStallCycles;
+        statistics::Scalar outputStallCycles;
+        statistics::Scalar layerCycles;
+        statistics::Formula computeUtilization;
+        statistics::Formula idleCycles;
+        statistics::Vector mesiObservations;
+    } stats;
+
+    // 當前tile的像素數（最後一個tile可能不足tilePixels）
+    unsigned pixelsInTile(unsigned tile) const;
+    uint64_t tileMacs(unsigned tile) const;
+    Tick layerStartTick;
 };
 
 } // namespace gem5
@@ -0,0 +1,226 @@
+// File: src/cnn_accelerator/request_engine.cc
+#include "cnn_accelerator/request_engine.hh"
+
+#include <algorithm>
+#include <cstring>
+
+#include "base/logging.hh"
+#include "base/trace.hh"
+#include "debug/CNNAccel.hh"
+#include "sim/stats.hh"
+
+namespace gem5 {
+
+AccelRequestEngine::AccelRequestEngine(const std::string &port_name,
+                                       ClockedObject *owner,
+                                       const char *stats_name,
+                                       unsigned max_outstanding)
+  : owner(owner),
+    reqPort(port_name, this),
+    maxOutstanding(max_outstanding),
+    requestorId(Request::invldRequestorId),
+    blockSize(64),
+    outstanding(0),
+    retryPkt(nullptr),
+    blockedSince(0),
+    paused(false),
+    stats(owner, stats_name)
+{
+    fatal_if(maxOutstanding == 0, "%s: max_outstanding must be > 0",
+             port_name);
+    stats.inFlightAtIssue.init(maxOutstanding + 1);
+    stats.latency.init(16);
+}
+
+AccelRequestEngine::EngineStats::EngineStats(statistics::Group *parent,
+                                             const char *name)
+  : statistics::Group(parent, name),
+    ADD_STAT(readReqs, statistics::units::Count::get(),
+             "Read requests issued through this port"),
+    ADD_STAT(writeReqs, statistics::units::Count::get(),
+             "Write requests issued through this port"),
+    ADD_STAT(bytesRead, statistics::units::Byte::get(),
+             "Bytes read through this port"),
+    ADD_STAT(bytesWritten, statistics::units::Byte::get(),
+             "Bytes written through this port"),
+    ADD_STAT(retries, statistics::units::Count::get(),
+             "Requests rejected by the port and resent after a retry"),
+    ADD_STAT(stallCycles, statistics::units::Cycle::get(),
+             "Cycles spent waiting for a retry from the port"),
+    ADD_STAT(bandwidth, statistics::units::Rate<
+                 statistics::units::Byte, statistics::units::Second>::get(),
+             "Achieved bandwidth", (bytesRead + bytesWritten) / simSeconds),
+    ADD_STAT(inFlight, statistics::units::Count::get(),
+             "Time-weighted average number of requests in flight"),
+    ADD_STAT(queuedTransfers, statistics::units::Count::get(),
+             "Time-weighted average number of queued transfers"),
+    ADD_STAT(inFlightAtIssue, statistics::units::Count::get(),
+             "Requests already in flight when a new request is issued"),
+    ADD_STAT(latency, statistics::units::Cycle::get(),
+             "Cycles from issuing a request to receiving its response")
+{
+}
+
+void
+AccelRequestEngine::setRequestor(RequestorID id, unsigned block_size)
+{
+    requestorId = id;
+    blockSize = block_size;
+}
+
+void
+AccelRequestEngine::transfer(Addr base, Addr bytes, bool is_write,
+                             Callback done)
+{
+    if (bytes == 0) {
+        done();
+        return;
+    }
+
+    DPRINTF(CNNAccel, "Queue %s of %d bytes at %#x\n",
+            is_write ? "write" : "read", bytes, base);
+    transfers.push_back(Transfer{base, bytes, is_write, done});
+    updateOccupancy();
+    issueRequests();
+}
+
+PacketPtr
+AccelRequestEngine::createPacket(Addr addr, unsigned size, bool is_write)
+{
+    RequestPtr req = std::make_shared<Request>(addr, size, 0, requestorId);
+    PacketPtr pkt = is_write ? Packet::createWrite(req)
+                             : Packet::createRead(req);
+    pkt->allocate();
+    if (is_write) {
+        // 只建模時序，數據內容填零
+        std::memset(pkt->getPtr<uint8_t>(), 0, size);
+    }
+    return pkt;
+}
+
+void
+AccelRequestEngine::issueRequests()
+{
+    // 按隊列順序發送，前一個傳輸全部發出後才發送下一個
+    auto it = transfers.begin();
+    while (!paused && !retryPkt && outstanding < maxOutstanding &&
+           it != transfers.end()) {
+        if (it->issuedAll()) {
+            ++it;
+            continue;
+        }
+
+        // 每個包不跨越緩存行
+        Addr addr = it->base + it->nextOffset;
+        unsigned size = std::min<Addr>(blockSize - addr % blockSize,
+                                       it->bytes - it->nextOffset);
+        PacketPtr pkt = createPacket(addr, size, it->isWrite);
+        pkt->pushSenderState(new TransferState(it, curTick()));
+
+        stats.inFlightAtIssue.sample(outstanding);
+        if (it->isWrite) {
+            stats.writeReqs++;
+        } else {
+            stats.readReqs++;
+        }
+        it->nextOffset += size;
+        it->outstanding++;
+        outstanding++;
+
+        if (!reqPort.sendTimingReq(pkt)) {
+            // 端口忙：保存被拒絕的包，等待recvReqRetry
+            DPRINTF(CNNAccel, "Port busy, holding %#x for retry\n", addr);
+            retryPkt = pkt;
+            blockedSince = curTick();
+            stats.retries++;
+        }
+    }
+    updateOccupancy();
+}
+
+void
+AccelRequestEngine::recvReqRetry()
+{
+    assert(retryPkt);
+
+    if (!reqPort.sendTimingReq(retryPkt))
+        return;
+
+    stats.stallCycles += owner->ticksToCycles(curTick() - blockedSince);
+    retryPkt = nullptr;
+    issueRequests();
+}
+
+bool
+AccelRequestEngine::recvTimingResp(PacketPtr pkt)
+{
+    TransferState *state =
+        safe_cast<TransferState *>(pkt->popSenderState());
+    auto it = state->transfer;
+    stats.latency.sample(owner->ticksToCycles(curTick() - state->issueTick));
+    delete state;
+
+    if (pkt->isWrite()) {
+        stats.bytesWritten += pkt->getSize();
+    } else {
+        stats.bytesRead += pkt->getSize();
+    }
+
+    if (respObserver)
+        respObserver(pkt);
+
+    delete pkt;
+
+    assert(it->outstanding > 0 && outstanding > 0);
+    it->outstanding--;
+    outstanding--;
+
+    if (it->complete()) {
+        DPRINTF(CNNAccel, "%s of %d bytes at %#x complete\n",
+                it->isWrite ? "Write" : "Read", it->bytes, it->base);
+        Callback done = it->done;
+        transfers.erase(it);
+        updateOccupancy();
+        // 完成回調可能排隊新的傳輸
+        done();
+    }
+
+    if (paused && outstanding == 0 && drainedCallback) {
+        Callback drained = drainedCallback;
+        drainedCallback = nullptr;
+        drained();
+    }
+
+    issueRequests();
+    return true;
+}
+
+bool
+AccelRequestEngine::pause(Callback drained)
+{
+    paused = true;
+    // 被拒絕的包計入outstanding，重發後等待其響應
+    if (outstanding == 0)
+        return true;
+
+    DPRINTF(CNNAccel, "Draining %d in-flight requests\n", outstanding);
+    drainedCallback = drained;
+    return false;
+}
+
+void
+AccelRequestEngine::resume()
+{
+    paused = false;
+    drainedCallback = nullptr;
+    issueRequests();
+}
+
+void
+AccelRequestEngine::updateOccupancy()
+{
+    stats.inFlight = outstanding;
+    stats.queuedTransfers = transfers.size();
+}
+
+} // namespace gem5
@@ -0,0 +1,145 @@
+// File: src/cnn_accelerator/request_engine.hh
+#ifndef __CNN_ACCELERATOR_REQUEST_ENGINE_HH__
+#define __CNN_ACCELERATOR_REQUEST_ENGINE_HH__
+
+#include <functional>
+#include <list>
+#include <string>
+
+#include "base/statistics.hh"
+#include "mem/packet.hh"
+#include "mem/port.hh"
+#include "sim/clocked_object.hh"
+
+namespace gem5 {
+
+/**
+ * 加速器端口後面的請求引擎：把排隊的連續傳輸按緩存行拆成包，
+ * 保持最多maxOutstanding個包在途，端口返回忙時保存被拒絕的包，
+ * 收到recvReqRetry後按原順序重發。
+ */
+class AccelRequestEngine
+{
+  public:
+    using Callback = std::function<void()>;
+    using Observer = std::function<void(PacketPtr)>;
+
+  private:
+    class EnginePort : public RequestPort
+    {
+      private:
+        AccelRequestEngine *engine;
+
+      public:
+        EnginePort(const std::string &name, AccelRequestEngine *engine)
+          : RequestPort(name), engine(engine) {}
+
+      protected:
+        bool recvTimingResp(PacketPtr pkt) override
+        {
+            return engine->recvTimingResp(pkt);
+        }
+        void recvReqRetry() override { engine->recvReqRetry(); }
+        void recvRangeChange() override {}
+    };
+
+    // 一次按緩存行拆分的連續傳輸
+    struct Transfer
+    {
+        Addr base;
+        Addr bytes;
+        bool isWrite;
+        Callback done;
+        Addr nextOffset = 0;
+        unsigned outstanding = 0;
+
+        bool issuedAll() const { return nextOffset >= bytes; }
+        bool complete() const { return issuedAll() && outstanding == 0; }
+    };
+
+    // 隨包攜帶所屬傳輸，響應時找回
+    struct TransferState : public Packet::SenderState
+    {
+        std::list<Transfer>::iterator transfer;
+        Tick issueTick;
+
+        TransferState(std::list<Transfer>::iterator transfer, Tick issue_tick)
+          : transfer(transfer), issueTick(issue_tick) {}
+    };
+
+    struct EngineStats : public statistics::Group
+    {
+        EngineStats(statistics::Group *parent, const char *name);
+
+        statistics::Scalar readReqs;
+        statistics::Scalar writeReqs;
+        statistics::Scalar bytesRead;
+        statistics::Scalar bytesWritten;
+        statistics::Scalar retries;
+        statistics::Scalar stallCycles;
+        statistics::Formula bandwidth;
+        statistics::Average inFlight;
+        statistics::Average queuedTransfers;
+        statistics::Histogram inFlightAtIssue;
+        statistics::Histogram latency;
+    };
+
+  public:
+    AccelRequestEngine(const std::string &port_name, ClockedObject *owner,
+                       const char *stats_name, unsigned max_outstanding);
+
+    /** DPRINTF使用的名稱 */
+    std::string name() const { return reqPort.name(); }
+
+    RequestPort &port() { return reqPort; }
+
+    /** 設置請求者ID和緩存行大小（System在構造函數中可用） */
+    void setRequestor(RequestorID id, unsigned block_size);
+
+    /** 每個響應到達時調用（用於一致性觀察） */
+    void setObserver(Observer observer) { respObserver = observer; }
+
+    /** 排隊一段傳輸，全部響應到達後調用done */
+    void transfer(Addr base, Addr bytes, bool is_write, Callback done);
+
+    bool idle() const { return transfers.empty(); }
+    unsigned inFlight() const { return outstanding; }
+
+    /**
+     * 停止發出新包（用於drain）。已沒有在途包時返回true，
+     * 否則在最後一個在途響應到達後調用drained並返回false。
+     */
+    bool pause(Callback drained);
+
+    /** 恢復發出排隊的傳輸 */
+    void resume();
+
+  private:
+    bool recvTimingResp(PacketPtr pkt);
+    void recvReqRetry();
+    void issueRequests();
+    PacketPtr createPacket(Addr addr, unsigned size, bool is_write);
+    void updateOccupancy();
+
+    ClockedObject *owner;
+    EnginePort reqPort;
+    const unsigned maxOutstanding;
+    RequestorID requestorId;
+    unsigned blockSize;
+
+    std::list<Transfer> transfers;
+    unsigned outstanding;
+
+    PacketPtr retryPkt;
+    Tick blockedSince;
+
+    bool paused;
+    Callback drainedCallback;
+
+    Observer respObserver;
+    EngineStats stats;
+};
+
+} // namespace gem5
+
+#endif // __CNN_ACCELERATOR_REQUEST_ENGINE_HH__
@@ -3,6 +3,8 @@
 #include <stdlib.h>
 #include <string.h>
 
+#include "m5_markers.h"
+
 #define INPUT_SIZE 32
 #define FILTER_SIZE 3
 #define OUTPUT_SIZE (INPUT_SIZE - FILTER_SIZE + 1)
@@ -159,6 +161,7 @@ void memory_stress_test() {
 int main() {
     printf("=== CNN MESI Protocol Test Program ===\n");
     printf("Testing cache coherency with CNN workload\n\n");
+    m5_perturb();
     
     // 分配CNN層結構
     cnn_layer_t* layer = malloc(sizeof(cnn_layer_t));
@@ -170,12 +173,28 @@ int main() {
     // 執行CNN運算流程
     init_input_data(layer);
     init_filters(layer);
+
+    // 初始化與緩存配置無關，ROI從這裡開始（檢查點在此生成）
+    m5_work_begin(ROI_WORK_ID, 0);
+
+    // 每個階段前後的標記使統計按階段分別輸出
+    m5_work_begin(PHASE_CONVOLUTION, 0);
     convolution_layer(layer);
+    m5_work_end(PHASE_CONVOLUTION, 0);
+
+    m5_work_begin(PHASE_POOLING, 0);
     pooling_layer(layer);
+    m5_work_end(PHASE_POOLING, 0);
+
+    m5_work_begin(PHASE_STATISTICS, 0);
     compute_statistics(layer);
+    m5_work_end(PHASE_STATISTICS, 0);
     
     // 執行記憶體壓力測試
+    m5_work_begin(PHASE_MEMORY_STRESS, 0);
     memory_stress_test();
+    m5_work_end(PHASE_MEMORY_STRESS, 0);
+    m5_work_end(ROI_WORK_ID, 0);
     
     // 清理資源
     free(layer);
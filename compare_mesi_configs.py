@@ -3,216 +3,525 @@
 MESI配置性能比较和图表生成脚本
 """
 
-import re
 import os
 import json
+import hashlib
+import matplotlib
+matplotlib.use('Agg')  # 非交互后端，无显示器的机器上不会阻塞
 import matplotlib.pyplot as plt
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 
+from gem5_stats import load_stats, parse_stats, indexed_values, delta_values
+from results_store import ResultsStore, DEFAULT_STORE_DIR, host_telemetry_values, sampled_values
+from result_cache import file_digest, HOST_TELEMETRY_FILE, SAMPLES_FILE
+from stat_compare import (DEFAULT_CONFIDENCE, CONFIDENCE_LEVELS, sample_matrix, summarize, pairwise,
+                          rank_tiers, format_ranking, effect_label)
+
 # 设置matplotlib字体（移除中文字体设置）
 plt.rcParams['font.sans-serif'] = ['DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
 
+# 全局统计项: {指标名: gem5统计名}
+GLOBAL_STATS = {
+    'sim_seconds': 'simSeconds',
+    'sim_insts': 'simInsts',
+    'host_inst_rate': 'hostInstRate'
+}
+
+# 每核统计项: {指标名: gem5统计名模板}，{} 为核心编号
+PER_CORE_STATS = {
+    'l1_hits': 'system.l1_dcache{}.demandHits::total',
+    'l1_misses': 'system.l1_dcache{}.demandMisses::total',
+    'l1_accesses': 'system.l1_dcache{}.demandAccesses::total',
+    'l1_miss_rate': 'system.l1_dcache{}.demandMissRate::total',
+    'cpi': 'system.cpu{}.cpi'
+}
+
+# 加速器统计项（旧的结果中没有，缺失时记为0且不警告）
+ACCEL_STATS = {
+    'accel_compute_utilization': 'system.cnn_accel.computeUtilization',
+    'accel_input_stall_cycles': 'system.cnn_accel.inputStallCycles',
+    'accel_output_stall_cycles': 'system.cnn_accel.outputStallCycles',
+    'accel_dma_bandwidth': 'system.cnn_accel.dmaPort.bandwidth',
+    'accel_cache_bandwidth': 'system.cnn_accel.cachePort.bandwidth',
+    'accel_shared_obs': 'system.cnn_accel.mesiObservations::Shared',
+    'accel_exclusive_obs': 'system.cnn_accel.mesiObservations::Exclusive',
+    'accel_modified_obs': 'system.cnn_accel.mesiObservations::Modified'
+}
+
+# 模拟器主机性能统计项（gem5自己报告的吞吐量和内存）与运行脚本采样的进程资源使用，
+# 缺失时记为0且不警告
+HOST_STATS = {
+    'sim_ticks': 'simTicks',
+    'host_seconds': 'hostSeconds',
+    'host_tick_rate': 'hostTickRate',
+    'host_memory': 'hostMemory',
+    'host_wall_seconds': 'runner.wall_seconds',
+    'host_cpu_utilization': 'runner.cpu_utilization',
+    'host_peak_rss_mb': 'runner.peak_rss_mb'
+}
+
+# 采样模式的窗口信息（sampled_values()记录，非采样运行中缺失，记为0且不警告）
+SAMPLING_STATS = {
+    'sample_windows': 'sampling.windows',
+    'sample_measured_insts': 'sampling.measured_insts',
+    'sample_region_insts': 'sampling.region_insts'
+}
+
+# L2统计项：单个共享L2为 system.l2cache.*，分片L2为 system.l2cache{}.*
+L2_STATS = {
+    'l2_hits': 'demandHits::total',
+    'l2_misses': 'demandMisses::total',
+    'l2_accesses': 'demandAccesses::total'
+}
+
+# 硬件预取器统计项（没有预取器时缺失，记为0且不警告）：L1D按核心、L2按分片求和
+PREFETCH_STATS = {
+    'pf_issued': 'prefetcher.pfIssued',
+    'pf_useful': 'prefetcher.pfUseful',
+    'pf_demand_mshr_misses': 'prefetcher.demandMshrMisses'
+}
+
+# Ruby（MESI_Two_Level）后端中对应的统计项：L1D在每核的L1控制器中，L2为各L2控制器（分片）之和；
+# None表示由缺失数/访问数计算
+RUBY_PER_CORE_STATS = {
+    'l1_hits': 'system.ruby.l1_cntrl{}.L1Dcache.m_demand_hits',
+    'l1_misses': 'system.ruby.l1_cntrl{}.L1Dcache.m_demand_misses',
+    'l1_accesses': 'system.ruby.l1_cntrl{}.L1Dcache.m_demand_accesses',
+    'l1_miss_rate': None
+}
+RUBY_L2_STATS = {
+    'l2_hits': 'system.ruby.l2_cntrl{}.L2cache.m_demand_hits',
+    'l2_misses': 'system.ruby.l2_cntrl{}.L2cache.m_demand_misses',
+    'l2_accesses': 'system.ruby.l2_cntrl{}.L2cache.m_demand_accesses'
+}
+
+# Ruby延迟统计项（经典缓存层次中缺失，记为0且不警告）：序列器的请求延迟（周期），
+# garnet网络的包延迟（tick，换算为周期）和平均跳数；simple网络没有包延迟
+RUBY_STATS = {
+    'ruby_latency': 'system.ruby.m_latencyHistSeqr::mean',
+    'ruby_hit_latency': 'system.ruby.m_hitLatencyHistSeqr::mean',
+    'ruby_miss_latency': 'system.ruby.m_missLatencyHistSeqr::mean',
+    'net_packets': 'system.ruby.network.packets_injected::total',
+    'net_hops': 'system.ruby.network.average_hops'
+}
+RUBY_TICK_STATS = {
+    'net_packet_latency': 'system.ruby.network.average_packet_latency',
+    'net_network_latency': 'system.ruby.network.average_packet_network_latency',
+    'net_queueing_latency': 'system.ruby.network.average_packet_queueing_latency'
+}
+CLOCK_PERIOD_STAT = 'system.clk_domain.clock'
+
+# Ruby控制器: {类别: 控制器名模板}；每个控制器的delayHistogram记录它处理的每条消息的等待延迟（周期）
+RUBY_CONTROLLERS = {
+    'l1': 'system.ruby.l1_cntrl{}',
+    'l2': 'system.ruby.l2_cntrl{}',
+    'dir': 'system.ruby.dir_cntrl{}',
+    'dma': 'system.ruby.dma_cntrl{}',
+    'accel': 'system.ruby.accel_cntrl{}'
+}
+
+# simple网络按消息大小类型统计的消息数和字节数，例如 system.ruby.network.msg_count.Control
+NET_MSG_COUNT_PREFIX = 'system.ruby.network.msg_count.'
+NET_MSG_BYTE_PREFIX = 'system.ruby.network.msg_byte.'
+
+# 比值类统计项: {统计名模板: (分子, 分母)}，分阶段差分后重新计算；分子为元组时求和
+RATIO_STATS = {
+    'hostInstRate': ('simInsts', 'hostSeconds'),
+    'hostTickRate': ('simTicks', 'hostSeconds'),
+    'system.l1_dcache{}.demandMissRate::total': ('system.l1_dcache{}.demandMisses::total',
+                                                 'system.l1_dcache{}.demandAccesses::total'),
+    'system.cpu{}.cpi': ('system.cpu{}.numCycles', 'system.cpu{}.commitStats0.numInsts'),
+    'system.cnn_accel.computeUtilization': ('system.cnn_accel.computeCycles',
+                                            'system.cnn_accel.layerCycles'),
+    'system.cnn_accel.dmaPort.bandwidth': (('system.cnn_accel.dmaPort.bytesRead',
+                                            'system.cnn_accel.dmaPort.bytesWritten'), 'simSeconds'),
+    'system.cnn_accel.cachePort.bandwidth': (('system.cnn_accel.cachePort.bytesRead',
+                                              'system.cnn_accel.cachePort.bytesWritten'), 'simSeconds')
+}
+
+# 系统脚本记录的阶段文件（每次统计dump结束时的阶段）
+PHASES_FILE = 'phases.json'
+
+# 没有run_info.json时分析的默认三配置
+DEFAULT_CONFIG_DIRS = {
+    'Small Cache': 'results/small_cache',
+    'Medium Cache': 'results/medium_cache',
+    'Large Cache': 'results/large_cache'
+}
+RUN_INFO_FILE = 'results/run_info.json'
+
+# 增量报告: 已解析运行的文件状态/指标和已绘制图表的数据摘要
+MANIFEST_FILE = 'results/report_manifest.json'
+CHART_DIR = 'results/charts'
+OVERVIEW_FILE = 'results/mesi_performance_comparison.png'
+DEFAULT_DPI = 150
+
+# 可生成的图表: {图表名: 指标列表、标题、纵轴、数值标签格式}；
+# 绘制的值乘以scale，数值标签再乘以label_scale
+CHARTS = {
+    'l1_hit_rate': {'metrics': ['l1_total_hit_rate'], 'title': 'L1 Cache Hit Rate (%)',
+                    'ylabel': 'Hit Rate (%)', 'format': '{:.2f}%'},
+    'l2_hit_rate': {'metrics': ['l2_hit_rate'], 'title': 'L2 Cache Hit Rate (%)',
+                    'ylabel': 'Hit Rate (%)', 'format': '{:.1f}%'},
+    'cache_misses': {'metrics': ['l1_total_misses', 'l2_misses'], 'title': 'Cache Miss Count Comparison',
+                     'ylabel': 'Miss Count', 'format': '{:,.0f}'},
+    'sim_time': {'metrics': ['sim_seconds'], 'title': 'Simulation Time (seconds)',
+                 'ylabel': 'Time (seconds)', 'format': '{:.3f}s'},
+    'cpi': {'metrics': ['avg_cpi'], 'title': 'Average CPI (Cycles Per Instruction)',
+            'ylabel': 'CPI', 'format': '{:.2f}'},
+    'cache_accesses': {'metrics': ['l1_total_accesses', 'l2_accesses'], 'title': 'Cache Access Count Comparison',
+                       'ylabel': 'Access Count', 'format': '{:.0f}K', 'label_scale': 1e-3},
+    'host_inst_rate': {'metrics': ['host_inst_rate'], 'title': 'Simulator Throughput (inst/s)',
+                       'ylabel': 'Instructions / host second', 'format': '{:,.0f}'},
+    'accel_utilization': {'metrics': ['accel_compute_utilization'], 'title': 'Accelerator Compute Utilization (%)',
+                          'ylabel': 'Utilization (%)', 'format': '{:.1f}%', 'scale': 100},
+    'prefetch': {'metrics': ['l1_prefetch_accuracy', 'l1_prefetch_coverage', 'l2_prefetch_accuracy',
+                             'l2_prefetch_coverage'], 'title': 'Prefetch Accuracy / Coverage (%)',
+                 'ylabel': 'Percent', 'format': '{:.1f}%', 'scale': 100},
+    'accel_dma_bandwidth': {'metrics': ['accel_dma_bandwidth'], 'title': 'Accelerator DMA Bandwidth (GB/s)',
+                            'ylabel': 'GB/s', 'format': '{:.2f}', 'scale': 1e-9},
+    'ruby_messages': {'metrics': ['ruby_l1_msgs', 'ruby_l2_msgs', 'ruby_dir_msgs'],
+                      'title': 'Ruby Protocol Messages per Controller Type', 'ylabel': 'Messages',
+                      'format': '{:.0f}K', 'label_scale': 1e-3},
+    'ruby_latency': {'metrics': ['ruby_miss_latency', 'net_packet_latency'],
+                     'title': 'Ruby Miss / Network Packet Latency (cycles)', 'ylabel': 'Cycles', 'format': '{:.1f}'}
+}
+CHART_LABELS = {
+    'l1_total_misses': 'L1 Misses',
+    'l2_misses': 'L2 Misses',
+    'l1_total_accesses': 'L1 Accesses',
+    'l2_accesses': 'L2 Accesses',
+    'l1_prefetch_accuracy': 'L1D Accuracy',
+    'l1_prefetch_coverage': 'L1D Coverage',
+    'l2_prefetch_accuracy': 'L2 Accuracy',
+    'l2_prefetch_coverage': 'L2 Coverage',
+    'ruby_l1_msgs': 'L1 Controllers',
+    'ruby_l2_msgs': 'L2 Controllers',
+    'ruby_dir_msgs': 'Directory',
+    'ruby_miss_latency': 'Miss Latency',
+    'net_packet_latency': 'Packet Latency'
+}
+DEFAULT_CHARTS = ('l1_hit_rate', 'l2_hit_rate', 'cache_misses', 'sim_time', 'cpi', 'cache_accesses')
+
+# 性能排名: (指标, 排名名称, 越大越好)
+RANKED_METRICS = (
+    ('l1_total_hit_rate', 'L1 Hit Rate', True),
+    ('l2_hit_rate', 'L2 Hit Rate', True),
+    ('sim_seconds', 'Execution Speed', False),
+    ('avg_cpi', 'CPI Performance', False)
+)
+
 def parse_stats_file(stats_file):
-    """解析gem5统计文件"""
+    """解析gem5统计文件（使用最后一次统计dump）"""
     if not os.path.exists(stats_file):
         print(f"统计文件不存在: {stats_file}")
         return None
     
-    stats = {}
-    
     try:
-        with open(stats_file, 'r') as f:
-            content = f.read()
-        
-        # 解析L1缓存统计
-        l1_patterns = {
-            'l1_hits_cpu0': r'system\.l1_dcache0\.demandHits::total\s+(\d+)',
-            'l1_misses_cpu0': r'system\.l1_dcache0\.demandMisses::total\s+(\d+)',
-            'l1_accesses_cpu0': r'system\.l1_dcache0\.demandAccesses::total\s+(\d+)',
-            'l1_miss_rate_cpu0': r'system\.l1_dcache0\.demandMissRate::total\s+([0-9.]+)',
-            'l1_hits_cpu1': r'system\.l1_dcache1\.demandHits::total\s+(\d+)',
-            'l1_misses_cpu1': r'system\.l1_dcache1\.demandMisses::total\s+(\d+)',
-            'l1_accesses_cpu1': r'system\.l1_dcache1\.demandAccesses::total\s+(\d+)',
-            'l1_miss_rate_cpu1': r'system\.l1_dcache1\.demandMissRate::total\s+([0-9.]+)'
-        }
-        
-        # 解析L2缓存统计
-        l2_patterns = {
-            'l2_hits': r'system\.l2cache\.demandHits::total\s+(\d+)',
-            'l2_misses': r'system\.l2cache\.demandMisses::total\s+(\d+)',
-            'l2_accesses': r'system\.l2cache\.demandAccesses::total\s+(\d+)',
-            'l2_miss_rate': r'system\.l2cache\.demandMissRate::total\s+([0-9.]+)'
-        }
-        
-        # 解析性能统计
-        perf_patterns = {
-            'sim_seconds': r'simSeconds\s+([0-9.]+)',
-            'sim_insts': r'simInsts\s+(\d+)',
-            'host_inst_rate': r'hostInstRate\s+(\d+)',
-            'cpi_cpu0': r'system\.cpu0\.cpi\s+([0-9.]+)',
-            'cpi_cpu1': r'system\.cpu1\.cpi\s+([0-9.]+)'
-        }
-        
-        # 提取所有模式
-        all_patterns = {**l1_patterns, **l2_patterns, **perf_patterns}
-        
-        for key, pattern in all_patterns.items():
-            match = re.search(pattern, content)
-            if match:
-                try:
-                    value = float(match.group(1)) if '.' in match.group(1) else int(match.group(1))
-                    stats[key] = value
-                except ValueError:
-                    stats[key] = 0
-            else:
-                stats[key] = 0
-        
-        # 计算总计值
-        stats['l1_total_hits'] = stats.get('l1_hits_cpu0', 0) + stats.get('l1_hits_cpu1', 0)
-        stats['l1_total_misses'] = stats.get('l1_misses_cpu0', 0) + stats.get('l1_misses_cpu1', 0)
-        stats['l1_total_accesses'] = stats.get('l1_accesses_cpu0', 0) + stats.get('l1_accesses_cpu1', 0)
-        
-        if stats['l1_total_accesses'] > 0:
-            stats['l1_total_hit_rate'] = stats['l1_total_hits'] / stats['l1_total_accesses'] * 100
-            stats['l1_total_miss_rate'] = stats['l1_total_misses'] / stats['l1_total_accesses'] * 100
-        else:
-            stats['l1_total_hit_rate'] = 0
-            stats['l1_total_miss_rate'] = 0
-        
-        if stats.get('l2_accesses', 0) > 0:
-            stats['l2_hit_rate'] = stats.get('l2_hits', 0) / stats['l2_accesses'] * 100
-        else:
-            stats['l2_hit_rate'] = 0
-        
-        # 计算平均CPI
-        stats['avg_cpi'] = (stats.get('cpi_cpu0', 0) + stats.get('cpi_cpu1', 0)) / 2
-        
-        return stats
-        
+        dump = load_stats(stats_file)
     except Exception as e:
         print(f"解析统计文件出错: {e}")
         return None
 
-def generate_comparison_charts(all_stats):
-    """生成比较图表"""
-    configurations = list(all_stats.keys())
-    
-    # 创建图表
-    fig, axes = plt.subplots(2, 3, figsize=(18, 12))
+    if dump is None:
+        print(f"统计文件中没有统计数据: {stats_file}")
+        return None
+
+    # 采样模式的运行使用各窗口外推后的统计
+    values = sampled_values(os.path.dirname(stats_file)) or dump.as_dict()
+    values.update(host_telemetry_values(os.path.dirname(stats_file)))
+    return compute_metrics(values, stats_file)
+
+def load_stored_metrics(store, result_dir):
+    """从列式存储中读取指标；存储中没有该运行或stats.txt已更新时返回None"""
+    stats_file = os.path.join(result_dir, 'stats.txt')
+    row = store.find_row(os.path.normpath(result_dir))
+    if row is None or not os.path.exists(stats_file):
+        return None
+
+    values = store.row(row)
+    if values.get('stats_mtime') != os.path.getmtime(stats_file):
+        return None
+    return compute_metrics(values, stats_file)
+
+def recompute_ratios(values):
+    """用差分后的分子/分母重新计算RATIO_STATS中的比值类统计（原地修改）"""
+    for stat, (numerator, denominator) in RATIO_STATS.items():
+        numerators = numerator if isinstance(numerator, tuple) else (numerator,)
+        instances = [str(index) for index in indexed_values(values, denominator)] if '{}' in stat else []
+        if denominator.format('') in values:
+            # 单核系统中对象名不带编号
+            instances.append('')
+        for instance in instances:
+            total = values[denominator.format(instance)]
+            part = sum(values.get(name.format(instance), 0) for name in numerators)
+            values[stat.format(instance)] = part / total if total else 0
+    return values
+
+def parse_phase_metrics(result_dir):
+    """按phases.json将stats.txt中的累计dump差分为每个阶段的指标
+
+    返回 [(阶段名, 指标)]，同名阶段再次出现时加 #2、#3 后缀；没有阶段记录时返回空列表
+    """
+    phases_file = os.path.join(result_dir, PHASES_FILE)
+    stats_file = os.path.join(result_dir, 'stats.txt')
+    if not os.path.exists(phases_file) or not os.path.exists(stats_file):
+        return []
+
+    with open(phases_file, 'r') as f:
+        phases = json.load(f)
+    if not phases:
+        return []
+
+    dumps = parse_stats(stats_file)
+    if len(dumps) != len(phases):
+        print(f"⚠️  {stats_file} 有 {len(dumps)} 次dump，但阶段记录有 {len(phases)} 条")
+
+    results = []
+    seen = {}
+    previous = {}
+    for phase, dump in zip(phases, dumps):
+        delta = recompute_ratios(delta_values(previous, dump))
+        previous = dump.as_dict()
+
+        label = phase['phase']
+        seen[label] = seen.get(label, 0) + 1
+        if seen[label] > 1:
+            label = f"{label}#{seen[label]}"
+        results.append((label, compute_metrics(delta, f"{stats_file} [{label}]", warn_missing=False)))
+    return results
+
+def _instances(values, template):
+    """按编号模板收集每个实例的值；单个对象时gem5不给对象名加编号，记为实例0"""
+    if template.format('') in values:
+        return {0: values[template.format('')]}
+    return indexed_values(values, template)
+
+def _ruby_per_core(values, key):
+    """Ruby后端的每核L1D统计，缺失率由缺失数/访问数计算"""
+    template = RUBY_PER_CORE_STATS[key]
+    if template is not None:
+        return _instances(values, template)
+    misses = _instances(values, RUBY_PER_CORE_STATS['l1_misses'])
+    accesses = _instances(values, RUBY_PER_CORE_STATS['l1_accesses'])
+    return {core: misses.get(core, 0) / total if total else 0 for core, total in accesses.items()}
+
+def ruby_metrics(values):
+    """Ruby后端的协议消息数和延迟；经典缓存层次的运行中全部为0"""
+    stats = {key: values.get(stat, 0) for key, stat in RUBY_STATS.items()}
+    period = values.get(CLOCK_PERIOD_STAT)
+    for key, stat in RUBY_TICK_STATS.items():
+        stats[key] = values.get(stat, 0) / period if period else 0
+
+    # 每类控制器处理的消息总数和按消息数加权的平均等待延迟
+    for kind, template in RUBY_CONTROLLERS.items():
+        samples = _instances(values, template + '.delayHistogram::samples')
+        means = _instances(values, template + '.delayHistogram::mean')
+        total = sum(samples.values())
+        stats[f'ruby_{kind}_msgs'] = total
+        stats[f'ruby_{kind}_msg_delay'] = (sum(count * means.get(i, 0) for i, count in samples.items() if count)
+                                           / total if total else 0)
+
+    # 网络消息: simple网络按消息类型计数，garnet只有注入的包数
+    by_type = {name[len(NET_MSG_COUNT_PREFIX):]: value for name, value in values.items()
+               if name.startswith(NET_MSG_COUNT_PREFIX)}
+    stats['net_msg_types'] = dict(sorted(by_type.items(), key=lambda item: -item[1]))
+    stats['net_msgs'] = sum(by_type.values()) or stats['net_packets']
+    stats['net_bytes'] = sum(value for name, value in values.items() if name.startswith(NET_MSG_BYTE_PREFIX))
+    return stats
+
+def compute_metrics(values, source, warn_missing=True):
+    """根据 {统计名: 值} 计算报告指标，每核对象从统计名中自动发现
+
+    warn_missing为False时不提示缺少的统计项（例如mesi_model.py的模型结果没有时序统计）
+    """
+    stats = {}
+    missing = []
+    for key, stat_name in GLOBAL_STATS.items():
+        value = values.get(stat_name)
+        if value is None:
+            missing.append(stat_name)
+            value = 0
+        stats[key] = value
+
+    for key, stat_name in ACCEL_STATS.items():
+        stats[key] = values.get(stat_name, 0)
+
+    for key, stat_name in HOST_STATS.items():
+        stats[key] = values.get(stat_name, 0)
+
+    for key, stat_name in SAMPLING_STATS.items():
+        stats[key] = values.get(stat_name, 0)
+
+    stats.update(ruby_metrics(values))
+
+    # 每核统计：按核心编号收集并向量化聚合（单核系统中gem5不给对象名加编号）
+    per_core = {}
+    for key, template in PER_CORE_STATS.items():
+        found = _instances(values, template)
+        if not found and key in RUBY_PER_CORE_STATS:
+            found = _ruby_per_core(values, key)
+        if not found:
+            missing.append(template.format('*'))
+        per_core[key] = np.array(list(found.values()), dtype=np.float64)
+        for core, value in found.items():
+            stats[f"{key}_cpu{core}"] = value
+
+    # L2统计：单个共享L2或所有分片之和（Ruby后端为所有L2控制器之和）
+    l2_banks = 0
+    for key, stat in L2_STATS.items():
+        banks = _instances(values, f"system.l2cache{{}}.{stat}") or _instances(values, RUBY_L2_STATS[key])
+        if not banks:
+            missing.append(f"system.l2cache*.{stat}")
+        stats[key] = sum(banks.values())
+        l2_banks = max(l2_banks, len(banks))
+
+    # 预取准确率 = 有用预取 / 发出的预取；覆盖率 = 有用预取 / (有用预取 + 需求MSHR缺失)
+    for level, template in (('l1', 'system.l1_dcache{}.'), ('l2', 'system.l2cache{}.')):
+        for key, stat in PREFETCH_STATS.items():
+            stats[f"{level}_{key}"] = sum(_instances(values, template + stat).values())
+        issued, useful = stats[f"{level}_pf_issued"], stats[f"{level}_pf_useful"]
+        covered = useful + stats[f"{level}_pf_demand_mshr_misses"]
+        stats[f"{level}_prefetch_accuracy"] = useful / issued if issued else 0
+        stats[f"{level}_prefetch_coverage"] = useful / covered if covered else 0
+
+    if missing and warn_missing:
+        print(f"⚠️  {source} 缺少统计项: {', '.join(missing)}")
+
+    stats['num_cores'] = max(len(per_core['cpi']), len(per_core['l1_accesses']))
+    stats['l2_banks'] = l2_banks
+    
+    # 计算总计值
+    stats['l1_total_hits'] = int(per_core['l1_hits'].sum())
+    stats['l1_total_misses'] = int(per_core['l1_misses'].sum())
+    stats['l1_total_accesses'] = int(per_core['l1_accesses'].sum())
+    
+    if stats['l1_total_accesses'] > 0:
+        stats['l1_total_hit_rate'] = stats['l1_total_hits'] / stats['l1_total_accesses'] * 100
+        stats['l1_total_miss_rate'] = stats['l1_total_misses'] / stats['l1_total_accesses'] * 100
+    else:
+        stats['l1_total_hit_rate'] = 0
+        stats['l1_total_miss_rate'] = 0
+    
+    if stats.get('l2_accesses', 0) > 0:
+        stats['l2_hit_rate'] = stats.get('l2_hits', 0) / stats['l2_accesses'] * 100
+        stats['l2_miss_rate'] = stats.get('l2_misses', 0) / stats['l2_accesses']
+    else:
+        stats['l2_hit_rate'] = 0
+        stats['l2_miss_rate'] = 0
+    
+    # 计算平均CPI（所有核心的均值）
+    stats['avg_cpi'] = float(per_core['cpi'].mean()) if len(per_core['cpi']) else 0
+    
+    return stats
+
+def _draw_chart(ax, chart_name, labels, series):
+    """在ax上绘制一个图表；series为 [[各配置的值], ...]，与CHARTS中的指标一一对应"""
+    chart = CHARTS[chart_name]
+    x = np.arange(len(labels))
+    width = 0.8 / len(series)
+    colors = plt.cm.tab20(np.linspace(0, 1, max(len(labels), 2)))
+
+    for i, (metric, values) in enumerate(zip(chart['metrics'], series)):
+        values = [value * chart.get('scale', 1) for value in values]
+        offset = (i - (len(series) - 1) / 2) * width
+        if len(series) == 1:
+            bars = ax.bar(x + offset, values, width, color=colors[:len(labels)])
+        else:
+            bars = ax.bar(x + offset, values, width, label=CHART_LABELS.get(metric, metric))
+        # 配置较多时省略数值标签
+        if len(labels) <= 12:
+            for bar, value in zip(bars, values):
+                ax.text(bar.get_x() + bar.get_width() / 2., bar.get_height(),
+                        chart['format'].format(value * chart.get('label_scale', 1)),
+                        ha='center', va='bottom', fontsize=8)
+
+    ax.set_title(chart['title'])
+    ax.set_ylabel(chart['ylabel'])
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels, rotation=0 if len(labels) <= 6 else 90, fontsize=8 if len(labels) > 6 else 10)
+    if len(series) > 1:
+        ax.legend()
+
+def render_chart(path, chart_name, labels, series, dpi):
+    """绘制单个指标图表（在后台进程中运行）"""
+    fig, ax = plt.subplots(figsize=(max(6, 0.4 * len(labels) + 2), 5))
+    _draw_chart(ax, chart_name, labels, series)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+def render_overview(path, chart_names, labels, series_by_chart, dpi):
+    """绘制多指标总览图（在后台进程中运行）"""
+    columns = min(3, len(chart_names))
+    rows = (len(chart_names) + columns - 1) // columns
+    width = max(6, 0.4 * len(labels) + 2)
+    fig, axes = plt.subplots(rows, columns, figsize=(width * columns, 6 * rows), squeeze=False)
     fig.suptitle('MESI Protocol Configuration Performance Comparison', fontsize=16, fontweight='bold')
-    
-    # 1. L1缓存命中率比较
-    ax1 = axes[0, 0]
-    l1_hit_rates = [all_stats[config]['l1_total_hit_rate'] for config in configurations]
-    bars1 = ax1.bar(configurations, l1_hit_rates, color=['#FF6B6B', '#4ECDC4', '#45B7D1'])
-    ax1.set_title('L1 Cache Hit Rate (%)')
-    ax1.set_ylabel('Hit Rate (%)')
-    ax1.set_ylim(90, 100)
-    
-    # 添加数值标签
-    for bar, rate in zip(bars1, l1_hit_rates):
-        height = bar.get_height()
-        ax1.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                f'{rate:.2f}%', ha='center', va='bottom')
-    
-    # 2. L2缓存命中率比较
-    ax2 = axes[0, 1]
-    l2_hit_rates = [all_stats[config]['l2_hit_rate'] for config in configurations]
-    bars2 = ax2.bar(configurations, l2_hit_rates, color=['#FF6B6B', '#4ECDC4', '#45B7D1'])
-    ax2.set_title('L2 Cache Hit Rate (%)')
-    ax2.set_ylabel('Hit Rate (%)')
-    
-    for bar, rate in zip(bars2, l2_hit_rates):
-        height = bar.get_height()
-        ax2.text(bar.get_x() + bar.get_width()/2., height + 1,
-                f'{rate:.1f}%', ha='center', va='bottom')
-    
-    # 3. 缓存缺失次数比较
-    ax3 = axes[0, 2]
-    l1_misses = [all_stats[config]['l1_total_misses'] for config in configurations]
-    l2_misses = [all_stats[config]['l2_misses'] for config in configurations]
-    
-    x = np.arange(len(configurations))
-    width = 0.35
-    
-    bars3a = ax3.bar(x - width/2, l1_misses, width, label='L1 Misses', color='#FF9999')
-    bars3b = ax3.bar(x + width/2, l2_misses, width, label='L2 Misses', color='#66B2FF')
-    
-    ax3.set_title('Cache Miss Count Comparison')
-    ax3.set_ylabel('Miss Count')
-    ax3.set_xticks(x)
-    ax3.set_xticklabels(configurations)
-    ax3.legend()
-    
-    # 4. 模拟时间比较
-    ax4 = axes[1, 0]
-    sim_times = [all_stats[config]['sim_seconds'] for config in configurations]
-    bars4 = ax4.bar(configurations, sim_times, color=['#FFB84D', '#A8E6CF', '#D1A3FF'])
-    ax4.set_title('Simulation Time (seconds)')
-    ax4.set_ylabel('Time (seconds)')
-    
-    for bar, time in zip(bars4, sim_times):
-        height = bar.get_height()
-        ax4.text(bar.get_x() + bar.get_width()/2., height + 0.01,
-                f'{time:.3f}s', ha='center', va='bottom')
-    
-    # 5. CPI比较
-    ax5 = axes[1, 1]
-    cpis = [all_stats[config]['avg_cpi'] for config in configurations]
-    bars5 = ax5.bar(configurations, cpis, color=['#FF8C94', '#FFD3A5', '#FFA3FD'])
-    ax5.set_title('Average CPI (Cycles Per Instruction)')
-    ax5.set_ylabel('CPI')
-    
-    for bar, cpi in zip(bars5, cpis):
-        height = bar.get_height()
-        ax5.text(bar.get_x() + bar.get_width()/2., height + 0.05,
-                f'{cpi:.2f}', ha='center', va='bottom')
-    
-    # 6. 缓存访问次数对比
-    ax6 = axes[1, 2]
-    
-    l1_accesses = [all_stats[config]['l1_total_accesses'] for config in configurations]
-    l2_accesses = [all_stats[config]['l2_accesses'] for config in configurations]
-    
-    x = np.arange(len(configurations))
-    width = 0.35
-    
-    bars6a = ax6.bar(x - width/2, l1_accesses, width, label='L1 Accesses', color='#FFB6C1')
-    bars6b = ax6.bar(x + width/2, l2_accesses, width, label='L2 Accesses', color='#87CEEB')
-    
-    ax6.set_title('Cache Access Count Comparison')
-    ax6.set_ylabel('Access Count')
-    ax6.set_xticks(x)
-    ax6.set_xticklabels(configurations)
-    ax6.legend()
-    
-    # 添加数值标签
-    for bar in bars6a:
-        height = bar.get_height()
-        if height > 0:
-            ax6.text(bar.get_x() + bar.get_width()/2., height + height*0.01,
-                    f'{int(height/1000)}K', ha='center', va='bottom', fontsize=8)
-    
-    for bar in bars6b:
-        height = bar.get_height()
-        if height > 0:
-            ax6.text(bar.get_x() + bar.get_width()/2., height + height*0.01,
-                    f'{int(height/1000)}K', ha='center', va='bottom', fontsize=8)
-    
-    plt.tight_layout()
-    
-    # 保存图表
-    chart_file = 'results/mesi_performance_comparison.png'
-    plt.savefig(chart_file, dpi=300, bbox_inches='tight')
-    print(f"📊 Chart saved: {chart_file}")
-    
-    # 显示图表
-    plt.show()
+    for ax, chart_name in zip(axes.flat, chart_names):
+        _draw_chart(ax, chart_name, labels, series_by_chart[chart_name])
+    for ax in list(axes.flat)[len(chart_names):]:
+        ax.axis('off')
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+def _chart_digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=float).encode('utf-8')).hexdigest()
+
+def generate_comparison_charts(all_stats, chart_names=DEFAULT_CHARTS, manifest=None, jobs=None,
+                               dpi=DEFAULT_DPI, chart_dir=CHART_DIR, overview=OVERVIEW_FILE):
+    """生成每个指标的图表和总览图
+
+    图表在后台进程池中用非交互后端绘制；数据未改变且图片仍在时跳过（记录在manifest中）
+    """
+    labels = list(all_stats.keys())
+    series_by_chart = {
+        name: [[float(all_stats[config].get(metric, 0)) for config in labels]
+               for metric in CHARTS[name]['metrics']]
+        for name in chart_names
+    }
 
-def generate_summary_report(all_stats):
-    """生成总结报告"""
+    digests = manifest.setdefault('charts', {}) if manifest is not None else {}
+    tasks = []
+    os.makedirs(chart_dir, exist_ok=True)
+    for name in chart_names:
+        path = os.path.join(chart_dir, f"{name}.png")
+        digest = _chart_digest(name, labels, series_by_chart[name], dpi)
+        if digests.get(path) != digest or not os.path.exists(path):
+            tasks.append((digest, render_chart, (path, name, labels, series_by_chart[name], dpi)))
+    if overview:
+        digest = _chart_digest(list(chart_names), labels, series_by_chart, dpi)
+        if digests.get(overview) != digest or not os.path.exists(overview):
+            tasks.append((digest, render_overview, (overview, list(chart_names), labels, series_by_chart, dpi)))
+
+    if not tasks:
+        print("📊 Charts up to date")
+        return
+
+    with ProcessPoolExecutor(max_workers=max(1, min(jobs or os.cpu_count() or 1, len(tasks)))) as executor:
+        futures = {executor.submit(function, *args): (digest, args[0]) for digest, function, args in tasks}
+        for future in as_completed(futures):
+            digest, path = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Chart rendering failed: {path}: {e}")
+                continue
+            digests[path] = digest
+            print(f"📊 Chart saved: {path}")
+
+def generate_summary_report(all_stats, groups=None, confidence=DEFAULT_CONFIDENCE):
+    """生成总结报告
+
+    groups: {运行名: 配置组名}，同一配置的多次重复运行（不同扰动种子）属于同一组。
+    每组都有至少两次运行时按组比较均值，只有差异显著时才排出先后；否则按单次运行的值排名并注明
+    """
     report_file = 'results/performance_summary.txt'
     
     with open(report_file, 'w', encoding='utf-8') as f:
@@ -223,80 +532,261 @@ def generate_summary_report(all_stats):
         for config_name, stats in all_stats.items():
             f.write(f"Configuration: {config_name}\n")
             f.write("-" * 40 + "\n")
+            f.write(f"Cores: {stats['num_cores']}, L2 Banks: {stats['l2_banks']}\n")
             f.write(f"L1 Cache Hit Rate: {stats['l1_total_hit_rate']:.2f}%\n")
             f.write(f"L2 Cache Hit Rate: {stats['l2_hit_rate']:.2f}%\n")
             f.write(f"L1 Total Misses: {stats['l1_total_misses']:,}\n")
             f.write(f"L2 Total Misses: {stats['l2_misses']:,}\n")
             f.write(f"Simulation Time: {stats['sim_seconds']:.3f} seconds\n")
             f.write(f"Average CPI: {stats['avg_cpi']:.3f}\n")
-            f.write(f"Total Instructions: {stats['sim_insts']:,}\n\n")
+            f.write(f"Total Instructions: {stats['sim_insts']:,}\n")
+            f.write(f"Accelerator Compute Utilization: {stats['accel_compute_utilization'] * 100:.2f}%\n")
+            f.write(f"Accelerator DMA Bandwidth: {stats['accel_dma_bandwidth'] / 1e9:.3f} GB/s\n")
+            f.write(f"Accelerator MESI Observations (S/E/M): {stats['accel_shared_obs']:,}/"
+                    f"{stats['accel_exclusive_obs']:,}/{stats['accel_modified_obs']:,}\n")
+            f.write(f"Simulator Throughput: {stats['host_inst_rate']:,.0f} inst/s, "
+                    f"{stats['host_tick_rate']:,.0f} ticks/s, "
+                    f"host memory {stats['host_memory'] / 2**20:,.1f} MB\n")
+            for level, name in (('l1', 'L1D'), ('l2', 'L2')):
+                if stats.get(f'{level}_pf_issued'):
+                    f.write(f"{name} Prefetcher: {stats[f'{level}_pf_issued']:,} issued, "
+                            f"accuracy {stats[f'{level}_prefetch_accuracy'] * 100:.2f}%, "
+                            f"coverage {stats[f'{level}_prefetch_coverage'] * 100:.2f}%\n")
+            if stats.get('sample_windows'):
+                f.write(f"Sampled Simulation: {stats['sample_windows']} windows, "
+                        f"{stats['sample_measured_insts']:,} of {stats['sample_region_insts']:,} instructions "
+                        f"measured in detail ({stats['sample_measured_insts'] / stats['sample_region_insts'] * 100:.2f}%), "
+                        f"counts extrapolated\n")
+            if stats.get('ruby_l1_msgs'):
+                f.write(format_ruby_summary(stats))
+            if stats.get('phases'):
+                f.write("Per-Phase Breakdown:\n")
+                for phase, metrics in stats['phases']:
+                    f.write(f"  {phase:<28} time {metrics['sim_seconds'] * 1e3:8.3f} ms  "
+                            f"L1 miss {metrics['l1_total_miss_rate']:6.2f}%  "
+                            f"L2 misses {metrics['l2_misses']:>10,}  "
+                            f"CPI {metrics['avg_cpi']:.3f}\n")
+            f.write("\n")
         
         # 性能排名
         f.write("Performance Rankings\n")
         f.write("-" * 30 + "\n")
-        
-        configs = list(all_stats.keys())
-        
-        # L1命中率排名
-        l1_ranking = sorted(configs, key=lambda x: all_stats[x]['l1_total_hit_rate'], reverse=True)
-        f.write("L1 Hit Rate Ranking: " + " > ".join(l1_ranking) + "\n")
-        
-        # L2命中率排名
-        l2_ranking = sorted(configs, key=lambda x: all_stats[x]['l2_hit_rate'], reverse=True)
-        f.write("L2 Hit Rate Ranking: " + " > ".join(l2_ranking) + "\n")
-        
-        # 执行速度排名（时间越短越好）
-        speed_ranking = sorted(configs, key=lambda x: all_stats[x]['sim_seconds'])
-        f.write("Execution Speed Ranking: " + " > ".join(speed_ranking) + "\n")
-        
-        # CPI排名（越低越好）
-        cpi_ranking = sorted(configs, key=lambda x: all_stats[x]['avg_cpi'])
-        f.write("CPI Performance Ranking: " + " > ".join(cpi_ranking) + "\n")
+        f.write(format_rankings(all_stats, groups or {}, confidence))
     
     print(f"📝 Performance report saved: {report_file}")
 
-def main():
-    """主函数"""
-    print("📊 Analyzing MESI configuration performance data")
-    print("=" * 50)
-    
-    # 配置目录
-    config_dirs = {
-        'Small Cache': 'results/small_cache',
-        'Medium Cache': 'results/medium_cache', 
-        'Large Cache': 'results/large_cache'
-    }
-    
+def format_ruby_summary(stats):
+    """Ruby后端的协议消息和延迟摘要"""
+    lines = [f"Ruby Request Latency (cycles): avg {stats['ruby_latency']:.2f}, "
+             f"hit {stats['ruby_hit_latency']:.2f}, miss {stats['ruby_miss_latency']:.2f}",
+             "Ruby Controller Messages (avg delay): " + ", ".join(
+                 f"{kind.upper()} {stats[f'ruby_{kind}_msgs']:,} ({stats[f'ruby_{kind}_msg_delay']:.2f} cyc)"
+                 for kind in RUBY_CONTROLLERS if stats[f'ruby_{kind}_msgs'])]
+    network = f"Network: {stats['net_msgs']:,} messages"
+    if stats['net_bytes']:
+        network += f", {stats['net_bytes']:,} bytes"
+    if stats['net_msg_types']:
+        network += " (" + ", ".join(f"{name} {count:,}" for name, count in stats['net_msg_types'].items()) + ")"
+    lines.append(network)
+    if stats['net_packets']:
+        lines.append(f"Network Packet Latency (cycles): {stats['net_packet_latency']:.2f} "
+                     f"(network {stats['net_network_latency']:.2f}, queueing {stats['net_queueing_latency']:.2f}), "
+                     f"avg hops {stats['net_hops']:.2f}")
+    return "".join(line + "\n" for line in lines)
+
+def format_rankings(all_stats, groups, confidence=DEFAULT_CONFIDENCE):
+    """排名部分的文本：有重复运行时给出均值、置信区间、效应量和显著性感知的排名"""
+    members = {}
+    for run in all_stats:
+        members.setdefault(groups.get(run, run), []).append(run)
+    names = list(members)
+    metrics = [metric for metric, _, _ in RANKED_METRICS]
+
+    if min(len(runs) for runs in members.values()) < 2:
+        # 单次运行没有方差，无法检验差异是否显著
+        lines = ["(single run per configuration: differences not tested for significance, "
+                 "use run_all_configs.py --repetitions N)"]
+        for metric, title, higher_is_better in RANKED_METRICS:
+            ranking = sorted(all_stats, key=lambda x: all_stats[x][metric], reverse=higher_is_better)
+            lines.append(f"{title} Ranking: " + " > ".join(ranking))
+        return "\n".join(lines) + "\n"
+
+    summary = summarize(sample_matrix(members, all_stats, metrics), confidence)
+    tests = pairwise(summary, confidence)
+    lines = [f"{len(names)} configurations, {sum(len(runs) for runs in members.values())} runs; "
+             f"mean ± {confidence * 100:.0f}% CI, Welch t-test; '>' significant, '≈' not significant"]
+    for m, (metric, title, higher_is_better) in enumerate(RANKED_METRICS):
+        tiers = rank_tiers(summary['mean'][m], tests['significant'][m], higher_is_better)
+        lines += ["", f"{title} Ranking: " + format_ranking(names, tiers)]
+        for g, name in enumerate(names):
+            mean, ci, std = summary['mean'][m][g], summary['ci'][m][g], summary['std'][m][g]
+            cv = std / abs(mean) * 100 if mean else 0
+            lines.append(f"  {name:<24} n={summary['n'][m][g]:<3} {mean:>14.6g} ± {ci:<12.4g} (CV {cv:.2f}%)")
+        # 其余配置与最好的配置比较
+        best = tiers[0][0]
+        for g in (g for tier in tiers for g in tier if g != best):
+            diff = summary['mean'][m][g] - summary['mean'][m][best]
+            relative = diff / summary['mean'][m][best] * 100 if summary['mean'][m][best] else 0
+            d = tests['cohen_d'][m][g, best]
+            verdict = "significant" if tests['significant'][m][g, best] else "not significant"
+            lines.append(f"  {names[g]} vs {names[best]}: Δ {diff:+.6g} ({relative:+.2f}%), "
+                         f"d = {d:+.2f} ({effect_label(d)}), {verdict}")
+    return "\n".join(lines) + "\n"
+
+def load_run_dirs(run_info_file=RUN_INFO_FILE):
+    """要分析的运行 {配置名: 结果目录}：优先使用run_info.json中成功的运行，否则为默认三配置"""
+    if os.path.exists(run_info_file):
+        with open(run_info_file, 'r') as f:
+            run_info = json.load(f)
+        run_dirs = {name: result['output_dir'] for name, result in run_info['configurations'].items()
+                    if result.get('success')}
+        if run_dirs:
+            return run_dirs
+    return dict(DEFAULT_CONFIG_DIRS)
+
+def load_run_groups(run_info_file=RUN_INFO_FILE):
+    """{运行名: 配置组名}：sweep的repetitions展开的重复运行在config['group']中记录原配置名"""
+    if not os.path.exists(run_info_file):
+        return {}
+    with open(run_info_file, 'r') as f:
+        run_info = json.load(f)
+    return {name: (result.get('config') or {}).get('group', name)
+            for name, result in run_info['configurations'].items()}
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    if os.path.exists(manifest_file):
+        try:
+            with open(manifest_file, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            pass
+    return {'runs': {}, 'charts': {}}
+
+def save_manifest(manifest, manifest_file=MANIFEST_FILE):
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=2, default=float)
+    os.replace(tmp_file, manifest_file)
+
+def _file_state(path):
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+def collect_stats(run_dirs, manifest, store=None):
+    """读取每个运行的指标（含分阶段指标），只重新解析stats.txt、phases.json或samples.json改变过的运行
+
+    manifest['runs']: {结果目录: {'files': {文件名: [mtime, size, sha256]}, 'metrics': 指标}}
+    mtime和大小都没变时直接复用；变了但内容摘要相同（例如从缓存恢复）时只更新mtime
+    """
     all_stats = {}
-    
-    # 解析所有配置的统计数据
-    for config_name, result_dir in config_dirs.items():
+    runs = manifest.setdefault('runs', {})
+    parsed = 0
+
+    for config_name, result_dir in run_dirs.items():
         stats_file = os.path.join(result_dir, 'stats.txt')
-        
-        if os.path.exists(stats_file):
+        key = os.path.normpath(result_dir)
+        if not os.path.exists(stats_file):
+            print(f"❌ {config_name} stats file not found: {stats_file}")
+            runs.pop(key, None)
+            continue
+
+        # stats.txt、phases.json、samples.json和主机遥测都会影响指标
+        files = {}
+        for filename in ('stats.txt', PHASES_FILE, SAMPLES_FILE, HOST_TELEMETRY_FILE):
+            path = os.path.join(result_dir, filename)
+            if os.path.exists(path):
+                files[filename] = list(_file_state(path))
+
+        entry = runs.get(key)
+        if entry is not None and _same_files(entry['files'], files, result_dir):
+            entry['files'] = {name: files[name] + [entry['files'][name][2]] for name in files}
+            all_stats[config_name] = entry['metrics']
+            continue
+
+        stats = load_stored_metrics(store, result_dir) if store is not None else None
+        if stats:
+            print(f"✅ {config_name} data loaded from results store")
+        else:
             print(f"📖 Parsing {config_name} data...")
             stats = parse_stats_file(stats_file)
-            if stats:
-                all_stats[config_name] = stats
-                print(f"✅ {config_name} data parsed successfully")
-            else:
+            if not stats:
                 print(f"❌ {config_name} data parsing failed")
-        else:
-            print(f"❌ {config_name} stats file not found: {stats_file}")
-    
+                runs.pop(key, None)
+                continue
+            print(f"✅ {config_name} data parsed successfully")
+        parsed += 1
+
+        stats['phases'] = parse_phase_metrics(result_dir)
+        all_stats[config_name] = stats
+        runs[key] = {
+            'files': {name: state + [file_digest(os.path.join(result_dir, name))]
+                      for name, state in files.items()},
+            'metrics': stats
+        }
+
+    print(f"📖 {parsed} run(s) parsed, {len(all_stats) - parsed} unchanged")
+    return all_stats
+
+def _same_files(recorded, current, result_dir):
+    """比较记录的文件状态；mtime或大小变化时比较内容摘要"""
+    if set(recorded) != set(current):
+        return False
+    for name, state in current.items():
+        mtime, size, digest = recorded[name]
+        if (mtime, size) == tuple(state):
+            continue
+        if size != state[1] or file_digest(os.path.join(result_dir, name)) != digest:
+            return False
+    return True
+
+def parse_args():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='MESI配置性能比较和图表生成')
+    parser.add_argument('--run-info', default=RUN_INFO_FILE,
+                        help=f'要分析的运行（默认: {RUN_INFO_FILE}，不存在时使用三种缓存配置）')
+    parser.add_argument('--charts', default=','.join(DEFAULT_CHARTS),
+                        help=f"要生成的图表，逗号分隔（可选: {', '.join(CHARTS)}；默认为总览中的六个）")
+    parser.add_argument('--no-overview', action='store_true', help='不生成总览图')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI, help=f'图片分辨率（默认: {DEFAULT_DPI}）')
+    parser.add_argument('-j', '--jobs', type=int, help='绘图进程数（默认: CPU核心数）')
+    parser.add_argument('--full', action='store_true', help='忽略manifest，重新解析所有运行并重绘所有图表')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE, choices=CONFIDENCE_LEVELS,
+                        help=f'重复运行比较的置信水平（默认: {DEFAULT_CONFIDENCE}）')
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_args()
+    chart_names = [name for name in args.charts.split(',') if name]
+    unknown = [name for name in chart_names if name not in CHARTS]
+    if unknown:
+        print(f"❌ Unknown chart(s): {', '.join(unknown)} (available: {', '.join(CHARTS)})")
+        return
+
+    print("📊 Analyzing MESI configuration performance data")
+    print("=" * 50)
+
+    os.makedirs('results', exist_ok=True)
+    manifest = {'runs': {}, 'charts': {}} if args.full else load_manifest()
+    store = ResultsStore(DEFAULT_STORE_DIR)
+    all_stats = collect_stats(load_run_dirs(args.run_info), manifest, store)
+
     if not all_stats:
         print("❌ No valid statistics data found")
         print("Please run first: python3 run_all_configs.py")
         return
-    
+
     # 生成比较图表
     print(f"\n📊 Generating performance comparison charts...")
-    generate_comparison_charts(all_stats)
-    
+    generate_comparison_charts(all_stats, chart_names, manifest, args.jobs, args.dpi,
+                               overview=None if args.no_overview else OVERVIEW_FILE)
+    save_manifest(manifest)
+
     # 生成总结报告
     print(f"\n📝 Generating performance report...")
-    generate_summary_report(all_stats)
-    
+    generate_summary_report(all_stats, load_run_groups(args.run_info), args.confidence)
+
     print(f"\n🎉 Analysis complete! Results saved in 'results/' directory")
 
 if __name__ == "__main__":
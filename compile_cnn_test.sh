@@ -17,6 +17,7 @@ fi
 echo "Using compiler: $COMPILER"
 
 # 編譯為靜態連結的RISC-V程序
+# m5_markers.h中的ROI標記為gem5偽指令；在真實硬件/QEMU上運行時加 -DNO_M5OPS
 $COMPILER -static -O2 -march=rv64gc -mabi=lp64d \
     -o cnn_test cnn_test.c -lm
 
@@ -1,5 +1,54 @@
 # File: config/cache_config.py
 from m5.objects import Cache
+from m5.objects import LRURP, TreePLRURP, RRIPRP, RandomRP
+from m5.objects import StridePrefetcher, TaggedPrefetcher
+
+# 運行配置中可選的替換策略和硬件預取器（與 configs/scripts/mesi_system.py 的配置項對應）
+REPLACEMENT_POLICIES = {
+    'lru': LRURP,
+    'tree_plru': TreePLRURP,
+    'rrip': RRIPRP,
+    'random': RandomRP
+}
+PREFETCHERS = {
+    'none': None,
+    'stride': StridePrefetcher,
+    'tagged': TaggedPrefetcher
+}
+
+# 每級緩存從運行配置中讀取的參數: {參數名: 配置項後綴}，配置項為 '<級別>_<後綴>'，例如 l1_mshrs
+GEOMETRY_PARAMS = {
+    'size': 'size',
+    'assoc': 'assoc',
+    'mshrs': 'mshrs',
+    'tgts_per_mshr': 'tgts_per_mshr',
+    'tag_latency': 'tag_latency',
+    'data_latency': 'data_latency',
+    'response_latency': 'response_latency'
+}
+
+def configure_cache(cache, config, level, prefetch=True):
+    """按運行配置設置一個緩存的幾何、延遲、替換策略和預取器
+
+    level為 'l1' 或 'l2'；配置中沒有的項保持類中的默認值。prefetch為False時不加預取器
+    （L1I只使用幾何和替換策略）
+    """
+    for param, suffix in GEOMETRY_PARAMS.items():
+        value = config.get(f'{level}_{suffix}')
+        if value is not None:
+            setattr(cache, param, value)
+
+    policy = config.get(f'{level}_replacement')
+    if policy is not None:
+        if policy not in REPLACEMENT_POLICIES:
+            raise ValueError(f"未知的替換策略: {policy} (可選: {', '.join(REPLACEMENT_POLICIES)})")
+        cache.replacement_policy = REPLACEMENT_POLICIES[policy]()
+
+    prefetcher = config.get(f'{level}_prefetcher', 'none')
+    if prefetcher not in PREFETCHERS:
+        raise ValueError(f"未知的預取器: {prefetcher} (可選: {', '.join(PREFETCHERS)})")
+    if prefetch and PREFETCHERS[prefetcher] is not None:
+        cache.prefetcher = PREFETCHERS[prefetcher](degree=config.get(f'{level}_prefetch_degree', 1))
 
 class L1Cache(Cache):
     """基本L1 Cache配置"""
@@ -0,0 +1,231 @@
+# File: config/ruby_config.py
+# Ruby MESI_Two_Level 內存系統：每核一個L1控制器（L1I + L1D）、按地址交織的L2控制器、
+# 目錄控制器、加速器的DMA控制器，以及可選的片上網絡（simple / garnet）和拓撲（crossbar / mesh）。
+# 需要以 PROTOCOL=MESI_Two_Level 編譯的gem5（見 MESI_Execution_Guide.md）。
+import math
+from m5.objects import (RubySystem, RubyCache, RubySequencer, DMASequencer, RubyPortProxy,
+                        RubyDirectoryMemory, RubyPrefetcher, MessageBuffer)
+from m5.objects import SimpleNetwork, Switch, SimpleExtLink, SimpleIntLink
+from m5.objects import GarnetNetwork, GarnetRouter, GarnetExtLink, GarnetIntLink, GarnetNetworkInterface
+from m5.util.convert import toMemorySize
+
+from cache_config import REPLACEMENT_POLICIES
+
+# 片上網絡: {名稱: (網絡, 路由器, 外部鏈路, 內部鏈路)}
+NETWORKS = {
+    'simple': (SimpleNetwork, Switch, SimpleExtLink, SimpleIntLink),
+    'garnet': (GarnetNetwork, GarnetRouter, GarnetExtLink, GarnetIntLink)
+}
+TOPOLOGIES = ('crossbar', 'mesh')
+
+# Ruby的L1預取器（RubyPrefetcher）是步長流預取器，L2控制器沒有預取器
+RUBY_PREFETCHERS = ('none', 'stride')
+
+# MESI_Two_Level的虛擬網絡: 0 請求, 1 響應, 2 解除阻塞/轉發
+NUM_VIRTUAL_NETWORKS = 3
+
+def _protocol_controllers():
+    """MESI_Two_Level的控制器類（只存在於以該協議編譯的gem5中）"""
+    try:
+        from m5.objects import L1Cache_Controller, L2Cache_Controller, Directory_Controller, DMA_Controller
+    except ImportError:
+        raise RuntimeError("Ruby後端需要以 PROTOCOL=MESI_Two_Level 編譯的gem5 "
+                           "(例如 build/RISCV_MESI_Two_Level/gem5.opt)")
+    return L1Cache_Controller, L2Cache_Controller, Directory_Controller, DMA_Controller
+
+def validate_ruby_config(config):
+    """檢查Ruby後端的網絡、拓撲和預取器配置"""
+    if config['ruby_network'] not in NETWORKS:
+        raise ValueError(f"未知的Ruby網絡: {config['ruby_network']} (可選: {', '.join(NETWORKS)})")
+    if config['ruby_topology'] not in TOPOLOGIES:
+        raise ValueError(f"未知的Ruby拓撲: {config['ruby_topology']} (可選: {', '.join(TOPOLOGIES)})")
+    if config['l1_prefetcher'] not in RUBY_PREFETCHERS:
+        raise ValueError(f"Ruby後端的L1預取器只支持: {', '.join(RUBY_PREFETCHERS)}")
+    if config['l2_prefetcher'] != 'none':
+        raise ValueError("MESI_Two_Level的L2控制器沒有預取器，l2_prefetcher必須為none")
+    for level in ('l1', 'l2'):
+        if config[f'{level}_replacement'] not in REPLACEMENT_POLICIES:
+            raise ValueError(f"未知的替換策略: {config[f'{level}_replacement']} "
+                             f"(可選: {', '.join(REPLACEMENT_POLICIES)})")
+    if config['ruby_topology'] == 'mesh':
+        mesh_shape(config['num_cores'], config['ruby_mesh_rows'])
+
+def mesh_shape(num_routers, rows=0):
+    """mesh的 (行數, 列數)；rows為0時取不超過平方根的最大因數（接近正方形）"""
+    if not rows:
+        rows = max(r for r in range(1, math.isqrt(num_routers) + 1) if num_routers % r == 0)
+    if rows < 1 or num_routers % rows:
+        raise ValueError(f"ruby_mesh_rows ({rows}) 必須整除路由器數 ({num_routers})")
+    return rows, num_routers // rows
+
+def ruby_cache(config, level, size, start_index_bit, is_icache=False):
+    """按運行配置創建一個Ruby緩存陣列（容量、相聯度、標籤/數據延遲和替換策略）"""
+    return RubyCache(size=size,
+                     assoc=config[f'{level}_assoc'],
+                     start_index_bit=start_index_bit,
+                     is_icache=is_icache,
+                     tagAccessLatency=config[f'{level}_tag_latency'],
+                     dataAccessLatency=config[f'{level}_data_latency'],
+                     replacement_policy=REPLACEMENT_POLICIES[config[f'{level}_replacement']]())
+
+def connect_buffers(controller, network, outgoing=(), incoming=(), local=(), ordered=()):
+    """為控制器創建消息緩衝區：outgoing發往網絡，incoming從網絡接收，local為控制器內部隊列"""
+    for name in outgoing + incoming + local:
+        buffer = MessageBuffer(ordered=name in ordered)
+        if name in outgoing:
+            buffer.out_port = network.in_port
+        elif name in incoming:
+            buffer.in_port = network.out_port
+        setattr(controller, name, buffer)
+
+def build_l1_controller(ruby, config, version, l2_bits, block_bits):
+    """一個L1控制器（L1I + L1D）及其RubySequencer"""
+    L1Cache_Controller = _protocol_controllers()[0]
+    prefetcher = config['l1_prefetcher'] != 'none'
+    controller = L1Cache_Controller(
+        version=version,
+        L1Icache=ruby_cache(config, 'l1', config['l1_size'], block_bits, is_icache=True),
+        L1Dcache=ruby_cache(config, 'l1', config['l1_size'], block_bits),
+        l2_select_num_bits=l2_bits,
+        l1_response_latency=config['l1_response_latency'],
+        send_evictions=False,
+        prefetcher=RubyPrefetcher(num_startup_pfs=config['l1_prefetch_degree']),
+        enable_prefetch=prefetcher,
+        ruby_system=ruby)
+    # L1 MSHR數對應Sequencer的最大在途請求數
+    controller.sequencer = RubySequencer(version=version, dcache=controller.L1Dcache,
+                                         max_outstanding_requests=config['l1_mshrs'],
+                                         ruby_system=ruby)
+    connect_buffers(controller, ruby.network,
+                    outgoing=('requestFromL1Cache', 'responseFromL1Cache', 'unblockFromL1Cache'),
+                    incoming=('requestToL1Cache', 'responseToL1Cache'),
+                    local=('mandatoryQueue', 'optionalQueue'))
+    return controller
+
+def build_l2_controllers(ruby, config, l2_bits, block_bits):
+    """l2_banks個L2控制器，按緩存行交織（每個分片容量為總容量的1/l2_banks）"""
+    L2Cache_Controller = _protocol_controllers()[1]
+    banks = config['l2_banks']
+    bank_size = f"{toMemorySize(config['l2_size']) // banks}B"
+    controllers = []
+    for i in range(banks):
+        controller = L2Cache_Controller(
+            version=i,
+            L2cache=ruby_cache(config, 'l2', bank_size, block_bits + l2_bits),
+            l2_response_latency=config['l2_response_latency'],
+            ruby_system=ruby)
+        connect_buffers(controller, ruby.network,
+                        outgoing=('DirRequestFromL2Cache', 'L1RequestFromL2Cache', 'responseFromL2Cache'),
+                        incoming=('unblockToL2Cache', 'L1RequestToL2Cache', 'responseToL2Cache'))
+        controllers.append(controller)
+    return controllers
+
+def crossbar_topology(network, classes, controllers, link_latency, router_latency):
+    """每個控制器一個路由器，全部經過中央交叉開關（與gem5的Crossbar拓撲相同）"""
+    _, Router, ExtLink, IntLink = classes
+    routers = [Router(router_id=i, latency=router_latency) for i in range(len(controllers) + 1)]
+    xbar = routers[-1]
+    network.routers = routers
+    network.ext_links = [ExtLink(link_id=i, ext_node=controller, int_node=routers[i], latency=link_latency)
+                         for i, controller in enumerate(controllers)]
+    count = len(controllers)
+    network.int_links = (
+        [IntLink(link_id=count + i, src_node=routers[i], dst_node=xbar, latency=link_latency)
+         for i in range(count)] +
+        [IntLink(link_id=2 * count + i, src_node=xbar, dst_node=routers[i], latency=link_latency)
+         for i in range(count)])
+
+def mesh_topology(network, classes, placements, rows, cols, link_latency, router_latency):
+    """rows x cols的mesh，XY路由（水平鏈路權重1、垂直鏈路權重2，與gem5的Mesh_XY相同）
+
+    placements: [(控制器, 路由器編號)]
+    """
+    _, Router, ExtLink, IntLink = classes
+    routers = [Router(router_id=i, latency=router_latency) for i in range(rows * cols)]
+    network.routers = routers
+    network.ext_links = [ExtLink(link_id=i, ext_node=controller, int_node=routers[r], latency=link_latency)
+                         for i, (controller, r) in enumerate(placements)]
+
+    int_links = []
+    for row in range(rows):
+        for col in range(cols):
+            r = row * cols + col
+            neighbours = []
+            if col + 1 < cols:
+                neighbours.append((r + 1, 1))
+            if row + 1 < rows:
+                neighbours.append((r + cols, 2))
+            for other, weight in neighbours:
+                for src, dst in ((r, other), (other, r)):
+                    int_links.append(IntLink(link_id=len(placements) + len(int_links),
+                                             src_node=routers[src], dst_node=routers[dst],
+                                             latency=link_latency, weight=weight))
+    network.int_links = int_links
+
+def build_ruby_system(system, config, block_size):
+    """在system上構建Ruby MESI_Two_Level內存系統並連接CPU、加速器、內存控制器和系統端口
+
+    每核的L1控制器位於mesh的第i個路由器，L2分片均勻分佈在各路由器上，
+    目錄、加速器和DMA控制器連接到路由器0。加速器的cache_port經過自己的L1控制器（與CPU一致），
+    dma_port經過DMA控制器直接訪問目錄。
+    """
+    _, _, Directory_Controller, DMA_Controller = _protocol_controllers()
+    num_cores = config['num_cores']
+    classes = NETWORKS[config['ruby_network']]
+    block_bits = int(math.log2(block_size))
+    l2_bits = int(math.log2(config['l2_banks']))
+
+    system.ruby = RubySystem(block_size_bytes=block_size, number_of_virtual_networks=NUM_VIRTUAL_NETWORKS)
+    ruby = system.ruby
+    ruby.network = classes[0](ruby_system=ruby, number_of_virtual_networks=NUM_VIRTUAL_NETWORKS,
+                              topology=config['ruby_topology'], routers=[], ext_links=[], int_links=[])
+
+    ruby.l1_cntrl = [build_l1_controller(ruby, config, i, l2_bits, block_bits) for i in range(num_cores)]
+    for cpu, controller in zip(system.cpu, ruby.l1_cntrl):
+        cpu.icache_port = controller.sequencer.in_ports
+        cpu.dcache_port = controller.sequencer.in_ports
+    ruby.accel_cntrl = build_l1_controller(ruby, config, num_cores, l2_bits, block_bits)
+    ruby.l2_cntrl = build_l2_controllers(ruby, config, l2_bits, block_bits)
+
+    ruby.dir_cntrl = Directory_Controller(version=0, directory=RubyDirectoryMemory(),
+                                          addr_ranges=system.mem_ranges, ruby_system=ruby)
+    connect_buffers(ruby.dir_cntrl, ruby.network,
+                    outgoing=('responseFromDir',), incoming=('requestToDir', 'responseToDir'),
+                    local=('requestToMemory', 'responseFromMemory'))
+    system.mem_ctrl.port = ruby.dir_cntrl.memory_out_port
+
+    ruby.dma_cntrl = DMA_Controller(version=0, dma_sequencer=DMASequencer(version=0, ruby_system=ruby),
+                                    ruby_system=ruby)
+    connect_buffers(ruby.dma_cntrl, ruby.network,
+                    outgoing=('requestToDir',), incoming=('responseFromDir',), local=('mandatoryQueue',),
+                    ordered=('responseFromDir',))
+
+    system.cnn_accel.cache_port = ruby.accel_cntrl.sequencer.in_ports
+    system.cnn_accel.dma_port = ruby.dma_cntrl.dma_sequencer.in_ports
+    ruby.num_of_sequencers = num_cores + 1
+
+    # 網絡拓撲
+    link_latency, router_latency = config['ruby_link_latency'], config['ruby_router_latency']
+    shared = [ruby.dir_cntrl, ruby.accel_cntrl, ruby.dma_cntrl]
+    if config['ruby_topology'] == 'mesh':
+        rows, cols = mesh_shape(num_cores, config['ruby_mesh_rows'])
+        placements = ([(controller, i) for i, controller in enumerate(ruby.l1_cntrl)] +
+                      [(controller, i * num_cores // config['l2_banks'])
+                       for i, controller in enumerate(ruby.l2_cntrl)] +
+                      [(controller, 0) for controller in shared])
+        mesh_topology(ruby.network, classes, placements, rows, cols, link_latency, router_latency)
+        if config['ruby_network'] == 'garnet':
+            ruby.network.num_rows = rows
+    else:
+        crossbar_topology(ruby.network, classes, list(ruby.l1_cntrl) + list(ruby.l2_cntrl) + shared,
+                          link_latency, router_latency)
+
+    if config['ruby_network'] == 'garnet':
+        ruby.network.netifs = [GarnetNetworkInterface(id=i) for i in range(len(ruby.network.ext_links))]
+    else:
+        ruby.network.setup_buffers()
+
+    # 加載程序等功能訪問經過Ruby
+    system.sys_port_proxy = RubyPortProxy(ruby_system=ruby)
+    system.system_port = system.sys_port_proxy.in_ports
+    return ruby
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+gem5 stats.txt 單遍流式解析器
+
+每一行 `name value [pdf% cdf%] # description (unit)` 被解析為一個 StatRecord:
+  - scalar:       simSeconds, system.cpu0.cpi
+  - vector:       system.l1_dcache0.demandHits::total
+  - distribution: system.l2bus.snoopFanout::samples / ::mean / ::0 ...
+每個 `Begin/End Simulation Statistics` 區塊對應一個 StatsDump，支持按名稱 O(1) 查找
+和 glob 查詢（例如 `system.l1_dcache*.demandMisses::total`）。
+"""
+
+import re
+import sys
+import fnmatch
+
+BEGIN_MARKER = '---------- Begin Simulation Statistics ----------'
+END_MARKER = '---------- End Simulation Statistics'
+
+# 出現這些子項時，該統計組被視為分佈（histogram/distribution）
+DISTRIBUTION_FIELDS = frozenset((
+    'samples', 'mean', 'gmean', 'stdev', 'underflows', 'overflows',
+    'min_value', 'max_value'
+))
+
+def parse_value(token):
+    """將統計值轉為int或float（nan/inf保留為float）"""
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+_template_cache = {}
+
+def indexed_values(values, template):
+    """按編號模板收集每個實例的統計值，返回按編號排序的 {編號: 值}
+
+    template中的 {} 匹配實例編號，例如 'system.cpu{}.cpi' 匹配 system.cpu0.cpi、
+    system.cpu12.cpi，但不匹配 system.cpu0.commitStats0.cpi。
+    values: {統計名: 值}
+    """
+    regex = _template_cache.get(template)
+    if regex is None:
+        prefix, _, suffix = template.partition('{}')
+        regex = _template_cache[template] = re.compile(
+            re.escape(prefix) + r'(\d+)' + re.escape(suffix) + '$')
+
+    prefix = template.partition('{}')[0]
+    found = {}
+    for name, value in values.items():
+        if name.startswith(prefix):
+            match = regex.match(name)
+            if match:
+                found[int(match.group(1))] = value
+    return dict(sorted(found.items()))
+
+class StatRecord:
+    """單條統計記錄"""
+    __slots__ = ('name', 'value', 'pdf', 'cdf', 'description', 'kind')
+
+    def __init__(self, name, value, pdf=None, cdf=None, description='', kind='scalar'):
+        self.name = name
+        self.value = value
+        self.pdf = pdf
+        self.cdf = cdf
+        self.description = description
+        self.kind = kind
+
+    @property
+    def group(self):
+        """vector/distribution的組名，例如 'system.l2bus.snoopFanout'"""
+        return self.name.partition('::')[0]
+
+    @property
+    def subname(self):
+        """vector/distribution的子項名，例如 'total'，scalar返回None"""
+        return self.name.partition('::')[2] or None
+
+    @property
+    def unit(self):
+        """描述末尾括號內的單位，例如 'Count' 或 '(Cycle/Count)'"""
+        text = self.description
+        if not text.endswith(')'):
+            return None
+        depth = 0
+        for i in range(len(text) - 1, -1, -1):
+            if text[i] == ')':
+                depth += 1
+            elif text[i] == '(':
+                depth -= 1
+                if depth == 0:
+                    return text[i + 1:-1]
+        return None
+
+    def __repr__(self):
+        return f"StatRecord({self.name}={self.value!r}, kind={self.kind})"
+
+class StatsDump:
+    """一次統計輸出（Begin/End區塊）中的所有記錄"""
+
+    def __init__(self, index=0):
+        self.index = index
+        self.records = {}
+        self.groups = {}
+
+    def _add(self, record):
+        self.records[record.name] = record
+        group, sep, subname = record.name.partition('::')
+        if not sep:
+            return
+
+        members = self.groups.get(group)
+        if members is None:
+            members = self.groups[group] = []
+        members.append(record)
+
+        if subname in DISTRIBUTION_FIELDS and members[0].kind != 'distribution':
+            for member in members:
+                member.kind = 'distribution'
+        elif len(members) > 1:
+            record.kind = members[0].kind
+        else:
+            record.kind = 'vector'
+
+    def __contains__(self, name):
+        return name in self.records
+
+    def __getitem__(self, name):
+        return self.records[name]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records.values())
+
+    def get(self, name, default=None):
+        """按名稱返回StatRecord"""
+        return self.records.get(name, default)
+
+    def value(self, name, default=None):
+        """按名稱返回統計值"""
+        record = self.records.get(name)
+        return default if record is None else record.value
+
+    def glob(self, pattern):
+        """按glob模式返回匹配的記錄列表（按文件中的順序）"""
+        if not any(ch in pattern for ch in '*?['):
+            record = self.records.get(pattern)
+            return [record] if record else []
+        return [self.records[name] for name in fnmatch.filter(self.records, pattern)]
+
+    def values(self, pattern):
+        """按glob模式返回 {名稱: 值}"""
+        return {record.name: record.value for record in self.glob(pattern)}
+
+    def as_dict(self):
+        """返回 {統計名: 值}"""
+        return {name: record.value for name, record in self.records.items()}
+
+    def indexed(self, template):
+        """按編號模板收集每個實例的統計值，見 indexed_values()"""
+        return indexed_values(self.as_dict(), template)
+
+    def group(self, name):
+        """返回vector/distribution的所有子項 {子項名: 值}"""
+        return {record.subname: record.value for record in self.groups.get(name, [])}
+
+def parse_stat_line(line):
+    """解析一行統計，非統計行返回None"""
+    body, sep, description = line.partition('#')
+    tokens = body.split()
+    if len(tokens) < 2:
+        return None
+
+    try:
+        value = parse_value(tokens[1])
+    except ValueError:
+        return None
+
+    pdf = cdf = None
+    if len(tokens) >= 4 and tokens[2].endswith('%'):
+        pdf = float(tokens[2][:-1])
+        cdf = float(tokens[3][:-1])
+
+    return StatRecord(tokens[0], value, pdf, cdf, description.strip())
+
+def iter_stats_dumps(lines):
+    """從行迭代器中逐個產生StatsDump（支持多次dump的stats.txt）"""
+    dump = None
+    index = 0
+    for line in lines:
+        if line.startswith('----------'):
+            if line.startswith(BEGIN_MARKER):
+                dump = StatsDump(index)
+            elif line.startswith(END_MARKER) and dump is not None:
+                yield dump
+                dump = None
+                index += 1
+            continue
+
+        if dump is None:
+            continue
+
+        record = parse_stat_line(line)
+        if record is not None:
+            dump._add(record)
+
+    # 文件被截斷（例如模擬中途被殺）時仍返回已讀取的部分
+    if dump is not None and len(dump):
+        yield dump
+
+def parse_stats(stats_file):
+    """解析stats.txt，返回所有StatsDump的列表"""
+    with open(stats_file, 'r') as f:
+        return list(iter_stats_dumps(f))
+
+def load_stats(stats_file, dump=-1):
+    """解析stats.txt並返回指定的一次dump（默認最後一次），文件中沒有統計時返回None"""
+    dumps = parse_stats(stats_file)
+    if not dumps:
+        return None
+    return dumps[dump]
+
+# 分佈中取加權平均而不是按比例放大的子項
+AVERAGED_FIELDS = frozenset(('mean', 'gmean', 'stdev'))
+
+# 分佈的極值：單位是Count，但不隨模擬累計
+EXTREME_FIELDS = frozenset(('min_value', 'max_value'))
+
+# 不隨模擬累計的配置常量和瞬時值（時鐘週期、電壓、主機內存佔用、dump時的絕對tick）
+CONSTANT_STATS = ('simFreq', '*.clock', '*.voltage', 'hostMemory', 'finalTick')
+
+def is_average(record):
+    """比值類統計（單位含 '/' 或為Ratio，例如CPI、缺失率）和分佈的均值/標準差"""
+    unit = record.unit or ''
+    return '/' in unit or 'Ratio' in unit or record.subname in AVERAGED_FIELDS
+
+def is_constant(record):
+    return any(fnmatch.fnmatchcase(record.name, pattern) for pattern in CONSTANT_STATS)
+
+def is_cumulative(record):
+    """隨模擬累計的計數類統計（可以差分或按比例放大）"""
+    return not (is_average(record) or is_constant(record) or record.subname in EXTREME_FIELDS)
+
+def delta_values(before, after):
+    """兩次累計dump的差 {統計名: after - before}
+
+    after為StatsDump，before為上一次dump的 {統計名: 值}。只對計數類統計做差分（before中沒有時
+    保留after的值）；常量、分佈極值和比值類統計保留after的值，後者需要由差分後的分子/分母重新計算。
+    """
+    return {record.name: record.value - before.get(record.name, 0) if is_cumulative(record) else record.value
+            for record in after}
+
+def extrapolate_dumps(dumps, weights, scales):
+    """把各採樣窗口的dump（每個窗口開始時重置過統計）合併為整個區域的估計 {統計名: 值}
+
+    weights: 每個窗口代表的區域比例（和為1）；scales: 窗口放大到整個區域的倍數（區域指令數/窗口指令數）。
+    計數類統計外推為 Σ w·v·scale，比值類統計和分佈的均值取加權平均 Σ w·v，分佈的最小/最大值取
+    所有窗口中的最小/最大值，常量和瞬時值（例如finalTick）取最後一個窗口的值
+    """
+    values = {}
+    for dump, weight, scale in zip(dumps, weights, scales):
+        for record in dump:
+            name, value = record.name, record.value
+            if record.subname == 'min_value':
+                values[name] = min(values.get(name, value), value)
+            elif record.subname == 'max_value':
+                values[name] = max(values.get(name, value), value)
+            elif is_constant(record):
+                values[name] = value
+            else:
+                factor = weight * scale if is_cumulative(record) else weight
+                values[name] = values.get(name, 0) + value * factor
+    return values
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python3 gem5_stats.py <stats.txt> [glob模式...]")
+        sys.exit(1)
+
+    patterns = sys.argv[2:] or ['*']
+    for dump in parse_stats(sys.argv[1]):
+        print(f"=== Dump {dump.index} ({len(dump)} 條統計) ===")
+        for pattern in patterns:
+            for record in dump.glob(pattern):
+                print(f"{record.name:60s} {record.value!r:>20} [{record.kind}]")
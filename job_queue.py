@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+可恢復的模擬作業隊列：JSON日誌、失敗重試和按歷史運行時間縮放的超時
+
+日誌文件（默認 results/journal_<sweep名>.json）在每次狀態改變後原子寫入:
+{
+  "jobs": {配置名: {"key", "state", "attempts", "timeout", "runtime",
+                   "failure", "returncode", "stdout_log", "stderr_log", "updated"}},
+  "runtimes": {緩存鍵: {"seconds": [...], "group": "2c/cnn_test"}}
+}
+作業狀態: pending -> running -> done / failed。協調進程崩潰或被Ctrl-C中斷後，
+running狀態的作業在恢復時重新運行，done狀態且輸出仍在的作業直接跳過。
+
+失敗分類:
+  - timeout: 超時，重試時超時時間加倍
+  - signal:  被信號終止（例如OOM killer），SIGABRT（gem5 panic）除外
+  - launch:  工作進程異常或無法啟動gem5
+  - error:   gem5以非零狀態退出（fatal/panic），不重試
+超時重試按 RETRY_BACKOFF * 2^(n-1) 秒退避。
+
+超時時間: 同一配置點（緩存鍵）運行過時取最長歷史運行時間的 TIMEOUT_FACTOR 倍，
+否則取同組（核心數/工作負載）配置點的最長時間，都沒有時使用 DEFAULT_TIMEOUT。
+"""
+
+import os
+import json
+import heapq
+import signal
+import time
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+DEFAULT_TIMEOUT = 300
+MIN_TIMEOUT = 60
+TIMEOUT_FACTOR = 3
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF = 10
+MAX_BACKOFF = 300
+# 每個配置點保留的歷史運行時間數
+RUNTIME_HISTORY = 8
+
+TRANSIENT_FAILURES = ('timeout', 'signal', 'launch')
+
+def classify_failure(result):
+    """根據運行結果判斷失敗類型，成功時返回None"""
+    if result.get('success'):
+        return None
+    if result.get('timed_out'):
+        return 'timeout'
+    returncode = result.get('returncode')
+    if returncode is None:
+        return 'launch'
+    if returncode < 0 and -returncode != signal.SIGABRT:
+        return 'signal'
+    return 'error'
+
+def runtime_group(config):
+    """運行時間相近的配置組：核心數和工作負載決定了大部分模擬時間，內存系統（Ruby明顯更慢）和
+    快進/採樣（atomic運行快得多）也改變量級，不同組的歷史不能互相估計超時"""
+    return (f"{config.get('num_cores', 2)}c/{config.get('workload', 'cnn_test')}"
+            f"/{config.get('memory_system', 'classic')}"
+            f"/ff={config.get('fast_forward', 'none')}/sampling={config.get('sampling', 'none')}")
+
+class JobJournal:
+    """持久化的作業狀態和運行時間歷史，path為None時只保存在內存中"""
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.jobs = {}
+        self.runtimes = {}
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                self.runtimes = data.get('runtimes', {})
+                if resume:
+                    self.jobs = data.get('jobs', {})
+            except (json.JSONDecodeError, OSError):
+                print(f"⚠️  作業日誌損壞，重新開始: {path}")
+
+    def save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_file = self.path + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'jobs': self.jobs, 'runtimes': self.runtimes}, f, indent=2)
+        os.replace(tmp_file, self.path)
+
+    def is_done(self, name, key, output_dir):
+        """配置點在之前的運行中已完成（鍵相同且統計文件仍在）"""
+        job = self.jobs.get(name)
+        return (job is not None and job['state'] == 'done' and job['key'] == key and
+                os.path.exists(os.path.join(output_dir, 'stats.txt')))
+
+    def timeout_for(self, key, config):
+        """按歷史運行時間估算超時時間（秒）"""
+        history = self.runtimes.get(key, {}).get('seconds')
+        if not history:
+            group = runtime_group(config)
+            history = [seconds for entry in self.runtimes.values() if entry['group'] == group
+                       for seconds in entry['seconds']]
+        if not history:
+            return DEFAULT_TIMEOUT
+        return max(MIN_TIMEOUT, int(max(history) * TIMEOUT_FACTOR))
+
+    def update(self, name, **fields):
+        self.jobs.setdefault(name, {'state': 'pending', 'attempts': 0})
+        self.jobs[name].update(fields, updated=time.time())
+        self.save()
+
+    def record_runtime(self, key, config, seconds):
+        entry = self.runtimes.setdefault(key, {'seconds': [], 'group': runtime_group(config)})
+        entry['seconds'] = (entry['seconds'] + [round(seconds, 3)])[-RUNTIME_HISTORY:]
+
+    def interrupted(self):
+        """中斷時把運行中的作業放回pending，恢復時重新運行"""
+        for job in self.jobs.values():
+            if job['state'] == 'running':
+                job['state'] = 'pending'
+                job['failure'] = 'interrupted'
+        self.save()
+
+    def counts(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job['state']] = counts.get(job['state'], 0) + 1
+        return counts
+
+class JobScheduler:
+    """在執行器上運行作業，處理重試、退避和超時，並把每次狀態改變寫入日誌
+
+    executor: concurrent.futures.Executor，submit(run_fn, name, config, output_dir, timeout=...)
+    run_fn 返回run_simulation()格式的結果字典（success / returncode / timed_out / runtime）
+    capacity: 同時提交給執行器的作業數上限，None表示不限（由執行器自己排隊）
+    """
+
+    def __init__(self, journal, executor, run_fn, capacity, max_retries=DEFAULT_RETRIES,
+                 backoff=RETRY_BACKOFF):
+        self.journal = journal
+        self.executor = executor
+        self.run_fn = run_fn
+        self.capacity = None if capacity is None else max(1, capacity)
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def run(self, points, keys, on_result=None):
+        """運行所有配置點，返回 {配置名: 最後一次運行結果}
+
+        points: expand_sweep() 的配置點列表；keys: {配置名: 緩存鍵}
+        on_result(point, result): 每個配置點最終完成（成功或放棄）時調用
+        """
+        results = {}
+        queue = deque(points)
+        # (就緒時間, 序號, 配置點, 超時)
+        delayed = []
+        futures = {}
+        overrides = {}
+        sequence = 0
+
+        for point in points:
+            self.journal.jobs[point['name']] = {'key': keys[point['name']], 'state': 'pending',
+                                                'attempts': 0}
+        self.journal.save()
+
+        try:
+            while queue or delayed or futures:
+                now = time.monotonic()
+                while delayed and delayed[0][0] <= now:
+                    _, _, point, timeout = heapq.heappop(delayed)
+                    overrides[point['name']] = timeout
+                    queue.append(point)
+
+                while queue and (self.capacity is None or len(futures) < self.capacity):
+                    point = queue.popleft()
+                    futures[self._submit(point, keys, overrides.pop(point['name'], None))] = point
+
+                wait_time = max(0, delayed[0][0] - now) if delayed else None
+                if not futures:
+                    # 只剩退避中的作業
+                    time.sleep(wait_time)
+                    continue
+                done, _ = wait(futures, timeout=wait_time, return_when=FIRST_COMPLETED)
+                for future in done:
+                    point = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"❌ {point['name']} 工作進程出錯: {e}")
+                        result = {'success': False, 'returncode': None, 'runtime': None}
+
+                    retry = self._finish(point, keys, result)
+                    if retry is not None:
+                        sequence += 1
+                        heapq.heappush(delayed, (time.monotonic() + retry[0], sequence, point, retry[1]))
+                    else:
+                        results[point['name']] = result
+                        if on_result is not None:
+                            on_result(point, result)
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            self.journal.interrupted()
+            raise
+
+        return results
+
+    def _submit(self, point, keys, timeout=None):
+        name = point['name']
+        key = keys[name]
+        if timeout is None:
+            timeout = self.journal.timeout_for(key, point['config'])
+        attempts = self.journal.jobs[name].get('attempts', 0) + 1
+        self.journal.update(name, state='running', attempts=attempts, timeout=timeout)
+        return self.executor.submit(self.run_fn, name, point['config'], point['output_dir'],
+                                    timeout=timeout)
+
+    def _finish(self, point, keys, result):
+        """記錄一次運行結果；需要重試時返回 (退避秒數, 下次超時)，否則返回None"""
+        name = point['name']
+        job = self.journal.jobs[name]
+        failure = classify_failure(result)
+        fields = {
+            'returncode': result.get('returncode'),
+            'runtime': result.get('runtime'),
+            'failure': failure,
+            'stdout_log': result.get('stdout_log'),
+            'stderr_log': result.get('stderr_log')
+        }
+
+        if failure is None:
+            self.journal.record_runtime(keys[name], point['config'], result['runtime'])
+            self.journal.update(name, state='done', **fields)
+            return None
+
+        if failure in TRANSIENT_FAILURES and job['attempts'] <= self.max_retries:
+            delay = min(MAX_BACKOFF, self.backoff * 2 ** (job['attempts'] - 1))
+            timeout = job['timeout'] * 2 if failure == 'timeout' else job['timeout']
+            print(f"🔁 {name} 失敗（{failure}），{delay}s 後重試 "
+                  f"（第 {job['attempts']}/{self.max_retries} 次重試，超時 {timeout}s）")
+            self.journal.update(name, state='pending', **fields)
+            return delay, timeout
+
+        self.journal.update(name, state='failed', **fields)
+        return None
@@ -0,0 +1,65 @@
+// File: m5_markers.h
+// gem5偽指令標記（RISC-V m5op編碼：opcode 0x7b，功能號在高7位）
+// gem5中work item標記配合 System.exit_on_work_items 使模擬循環返回到配置腳本；
+// 非RISC-V目標或定義了NO_M5OPS時為空操作，程序可以在真實硬件上運行。
+#ifndef M5_MARKERS_H
+#define M5_MARKERS_H
+
+#include <stdlib.h>
+
+#define M5OP_WORK_BEGIN 0x5a
+#define M5OP_WORK_END   0x5b
+
+#define M5_STR_(x) #x
+#define M5_STR(x) M5_STR_(x)
+
+#if defined(__riscv) && !defined(NO_M5OPS)
+#define M5OP2(func, x, y) do {                                          \
+        register unsigned long _a0 __asm__("a0") = (unsigned long)(x);  \
+        register unsigned long _a1 __asm__("a1") = (unsigned long)(y);  \
+        __asm__ volatile(".long 0x7b | (" M5_STR(func) " << 25)"        \
+                         : "+r"(_a0) : "r"(_a1) : "memory");            \
+    } while (0)
+#else
+#define M5OP2(func, x, y) do { (void)(x); (void)(y); } while (0)
+#endif
+
+// 感興趣區域（ROI）：初始化之後的計算部分，檢查點在所有核心進入ROI時生成
+#define ROI_WORK_ID 0
+
+// ROI內的各階段（與 configs/scripts/mesi_system.py 中的 PHASE_NAMES 保持一致），
+// 系統腳本在每個階段邊界dump一次統計
+#define PHASE_CONVOLUTION   1
+#define PHASE_POOLING       2
+#define PHASE_STATISTICS    3
+#define PHASE_MEMORY_STRESS 4
+// 生成的多線程工作負載（workload_gen.py）中的共享內核
+#define PHASE_FALSE_SHARING 5
+#define PHASE_TRUE_SHARING  6
+
+#define m5_work_begin(work_id, thread_id) M5OP2(M5OP_WORK_BEGIN, work_id, thread_id)
+#define m5_work_end(work_id, thread_id)   M5OP2(M5OP_WORK_END, work_id, thread_id)
+
+// 多種子重複運行的擾動（由 configs/scripts/mesi_system.py 按seed通過環境變量設置，未設置時無影響）:
+//   M5_LAYOUT_PAD  在堆（brk）和mmap區域開頭各佔用一段內存，移動之後所有動態分配的地址
+//   M5_START_DELAY 進入ROI之前空轉的迭代數，錯開各核心的起始時間
+// 棧地址由環境變量本身的長度移動（M5_STACK_PAD）。在main開頭、任何分配之前調用。
+static void *volatile m5_layout_pad[2];
+
+static inline void m5_perturb(void)
+{
+    const char *pad = getenv("M5_LAYOUT_PAD");
+    if (pad) {
+        unsigned long bytes = strtoul(pad, NULL, 10);
+        // 故意不釋放：小塊留在brk堆中，大塊超過mmap閾值（128KB）移動之後的mmap分配
+        m5_layout_pad[0] = malloc(bytes % 4096 + 1);
+        m5_layout_pad[1] = malloc(128 * 1024 + bytes);
+    }
+    const char *delay = getenv("M5_START_DELAY");
+    if (delay) {
+        for (volatile unsigned long i = strtoul(delay, NULL, 10); i > 0; i--)
+            ;
+    }
+}
+
+#endif // M5_MARKERS_H
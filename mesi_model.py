@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+跟蹤驅動的MESI緩存模型，用於在運行gem5之前快速篩選緩存配置
+
+把一次記錄的地址跟蹤（從 --debug-flags=Cache 輸出中提取，或保存的 .npz）回放到
+每核私有L1I/L1D + 共享L2（可分片）上，L1D之間按MESI協議保持一致性，
+輸出與 compare_mesi_configs.parse_stats_file() 相同的指標。
+
+多個配置在同一遍跟蹤中評估：L1參數（核心數、l1_size、l1_assoc）相同的配置共享
+一份L1模擬，只有各自的L2分別回放L1產生的請求流。
+
+與gem5的差異（用於篩選，不替代gem5）:
+  - 只模擬命中/缺失，不模擬時序，sim_seconds / CPI 等時序指標為0
+  - gem5經典緩存實際使用MOESI；這裡M狀態的塊被其它核讀取時降為S並寫回L2
+  - L1I只讀，不參與一致性；L2為非包含式，替換L2塊時不回收L1中的副本
+"""
+
+import re
+import sys
+import json
+import numpy as np
+
+from cache_trace import iter_accesses
+from results_store import parse_size
+
+DEFAULT_BLOCK_SIZE = 64
+
+# MESI狀態編碼（0為無效，數值越大權限越高）
+INVALID, SHARED, EXCLUSIVE, MODIFIED = 0, 1, 2, 3
+
+# 需要寫權限的請求類型
+WRITE_CMDS = {'WriteReq', 'WriteLineReq', 'SwapReq', 'StoreCondReq',
+              'ReadExReq', 'UpgradeReq', 'SCUpgradeReq'}
+
+TRACE_FIELDS = ('tick', 'core', 'inst', 'write', 'addr')
+
+_L1_NAME_RE = re.compile(r'\.l1_([di])cache(\d*)$')
+
+def extract_trace(path_or_lines):
+    """從Cache調試跟蹤中提取CPU側（L1）訪問，返回 {字段: NumPy數組}"""
+    ticks, cores, insts, writes, addrs = [], [], [], [], []
+    for tick, cache, cmd, start, size, hit in iter_accesses(path_or_lines):
+        match = _L1_NAME_RE.search(cache)
+        if not match:
+            continue
+        ticks.append(tick)
+        cores.append(int(match.group(2) or 0))
+        insts.append(match.group(1) == 'i')
+        writes.append(cmd in WRITE_CMDS)
+        addrs.append(start)
+
+    return {
+        'tick': np.array(ticks, dtype=np.int64),
+        'core': np.array(cores, dtype=np.int32),
+        'inst': np.array(insts, dtype=bool),
+        'write': np.array(writes, dtype=bool),
+        'addr': np.array(addrs, dtype=np.int64)
+    }
+
+def save_trace(trace, path):
+    """保存提取的跟蹤，之後可直接用 load_trace() 讀取"""
+    np.savez_compressed(path, **trace)
+
+def extract_binary_trace(path):
+    """從 .ctrace（trace_store.py）中提取L1訪問，直接在記錄數組上篩選"""
+    from trace_store import TraceFile, EVENT_KINDS
+
+    trace = TraceFile(path)
+    # 按緩存下標查表：核心號、是否指令緩存；非L1緩存的核心號為-1
+    cores = np.full(len(trace.caches), -1, dtype=np.int32)
+    insts = np.zeros(len(trace.caches), dtype=bool)
+    for c, cache in enumerate(trace.caches):
+        match = _L1_NAME_RE.search(cache)
+        if match:
+            cores[c] = int(match.group(2) or 0)
+            insts[c] = match.group(1) == 'i'
+    writes = np.array([cmd in WRITE_CMDS for cmd in trace.cmds], dtype=bool)
+
+    events = trace.events
+    selected = (events['kind'] == EVENT_KINDS.index('access')) & (cores[events['cache']] >= 0)
+    accesses = events[selected]
+    return {
+        'tick': accesses['tick'].astype(np.int64),
+        'core': cores[accesses['cache']],
+        'inst': insts[accesses['cache']],
+        'write': writes[accesses['cmd']],
+        'addr': accesses['start'].astype(np.int64)
+    }
+
+def load_trace(path):
+    """讀取 .npz 或 .ctrace 跟蹤，其它文件按Cache調試跟蹤解析"""
+    from trace_store import is_binary_trace
+
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            return {field: data[field] for field in TRACE_FIELDS}
+    if is_binary_trace(path):
+        return extract_binary_trace(path)
+    return extract_trace(path)
+
+def _log2(value, what):
+    if value < 1 or value & (value - 1):
+        raise ValueError(f"{what}必須是2的冪: {value}")
+    return value.bit_length() - 1
+
+class CacheArray:
+    """一個組相聯緩存的標籤/狀態存儲，LRU替換"""
+
+    def __init__(self, size, assoc, block_size=DEFAULT_BLOCK_SIZE):
+        num_sets = size // (assoc * block_size)
+        self.set_bits = _log2(num_sets, "組數")
+        self.set_mask = num_sets - 1
+        self.tags = np.full((num_sets, assoc), -1, dtype=np.int64)
+        self.state = np.zeros((num_sets, assoc), dtype=np.int8)
+        self.last_use = np.zeros((num_sets, assoc), dtype=np.int64)
+
+    def find(self, set_index, tag):
+        """返回命中的way，不在緩存中時返回-1"""
+        ways = np.flatnonzero(self.tags[set_index] == tag)
+        if len(ways) and self.state[set_index, ways[0]] != INVALID:
+            return int(ways[0])
+        return -1
+
+    def fill(self, set_index, tag, state, now):
+        """填充一個塊，返回被替換的 (塊地址, 狀態)，沒有替換時返回None"""
+        states = self.state[set_index]
+        free = np.flatnonzero(states == INVALID)
+        way = int(free[0]) if len(free) else int(np.argmin(self.last_use[set_index]))
+
+        victim = None
+        if states[way] != INVALID:
+            victim = ((int(self.tags[set_index, way]) << self.set_bits) | set_index,
+                      int(states[way]))
+        self.tags[set_index, way] = tag
+        self.state[set_index, way] = state
+        self.last_use[set_index, way] = now
+        return victim
+
+    def invalidate(self, block):
+        set_index = block & self.set_mask
+        way = self.find(set_index, block >> self.set_bits)
+        if way >= 0:
+            self.state[set_index, way] = INVALID
+
+class L1System:
+    """每核私有L1I/L1D，L1D之間用MESI保持一致性
+
+    access() 返回本次訪問發給L2的請求列表 [(類型, 塊地址)]，
+    類型為 'demand'（讀/寫缺失）、'upgrade'（S狀態寫）或 'writeback'（寫回髒塊）。
+    """
+
+    def __init__(self, num_cores, l1_size, l1_assoc, block_size=DEFAULT_BLOCK_SIZE):
+        self.num_cores = num_cores
+        self.icaches = [CacheArray(l1_size, l1_assoc, block_size) for _ in range(num_cores)]
+        self.dcaches = [CacheArray(l1_size, l1_assoc, block_size) for _ in range(num_cores)]
+        # {塊地址: {持有該塊的核心}}（L1D的窺探過濾器）
+        self.sharers = {}
+        # [核心, 0=L1I / 1=L1D]
+        self.hits = np.zeros((num_cores, 2), dtype=np.int64)
+        self.misses = np.zeros((num_cores, 2), dtype=np.int64)
+
+    def set_indices(self, blocks):
+        """向量化計算每次訪問的L1組號與標籤（所有L1幾何相同）"""
+        cache = self.dcaches[0]
+        return (blocks & cache.set_mask).tolist(), (blocks >> cache.set_bits).tolist()
+
+    def access(self, core, inst, write, block, set_index, tag, now):
+        if inst:
+            return self._access_icache(core, block, set_index, tag, now)
+
+        cache = self.dcaches[core]
+        way = cache.find(set_index, tag)
+        if way >= 0:
+            state = cache.state[set_index, way]
+            cache.last_use[set_index, way] = now
+            if not write or state != SHARED:
+                self.hits[core, 1] += 1
+                if write:
+                    cache.state[set_index, way] = MODIFIED
+                return ()
+
+            # S狀態寫：在gem5中記為缺失，發出UpgradeReq使其它副本失效
+            self.misses[core, 1] += 1
+            self._invalidate_others(core, block)
+            cache.state[set_index, way] = MODIFIED
+            return (('upgrade', block),)
+
+        self.misses[core, 1] += 1
+        requests = []
+        others = self.sharers.get(block, set()) - {core}
+        owner = None
+        for other in others:
+            other_cache = self.dcaches[other]
+            other_set = block & other_cache.set_mask
+            other_way = other_cache.find(other_set, block >> other_cache.set_bits)
+            if other_cache.state[other_set, other_way] >= EXCLUSIVE:
+                owner = (other, other_set, other_way)
+
+        if write:
+            self._invalidate_others(core, block)
+            state = MODIFIED
+        elif others:
+            if owner is not None:
+                other, other_set, other_way = owner
+                other_cache = self.dcaches[other]
+                if other_cache.state[other_set, other_way] == MODIFIED:
+                    requests.append(('writeback', block))
+                other_cache.state[other_set, other_way] = SHARED
+            state = SHARED
+        else:
+            state = EXCLUSIVE
+
+        # 持有E/M副本的L1直接響應（cacheResponding），L2不計入需求訪問
+        if owner is None:
+            requests.append(('demand', block))
+
+        self.sharers.setdefault(block, set()).add(core)
+        victim = cache.fill(set_index, tag, state, now)
+        if victim is not None:
+            victim_block, victim_state = victim
+            self._drop_sharer(core, victim_block)
+            if victim_state == MODIFIED:
+                requests.append(('writeback', victim_block))
+        return requests
+
+    def _access_icache(self, core, block, set_index, tag, now):
+        cache = self.icaches[core]
+        way = cache.find(set_index, tag)
+        if way >= 0:
+            cache.last_use[set_index, way] = now
+            self.hits[core, 0] += 1
+            return ()
+
+        self.misses[core, 0] += 1
+        cache.fill(set_index, tag, SHARED, now)
+        return (('demand', block),)
+
+    def _invalidate_others(self, core, block):
+        for other in self.sharers.get(block, set()) - {core}:
+            self.dcaches[other].invalidate(block)
+        self.sharers[block] = {core}
+
+    def _drop_sharer(self, core, block):
+        holders = self.sharers.get(block)
+        if holders is not None:
+            holders.discard(core)
+            if not holders:
+                del self.sharers[block]
+
+class L2Model:
+    """共享L2，多個分片時按緩存行低位交織（與 l2_bank_ranges() 一致）
+
+    與gem5一樣，每個分片的組號直接取自塊地址，不去掉交織位。
+    """
+
+    def __init__(self, l2_size, l2_assoc, banks=1, block_size=DEFAULT_BLOCK_SIZE):
+        self.bank_mask = (1 << _log2(banks, "l2_banks")) - 1
+        self.banks = [CacheArray(l2_size // banks, l2_assoc, block_size) for _ in range(banks)]
+        self.hits = np.zeros(banks, dtype=np.int64)
+        self.misses = np.zeros(banks, dtype=np.int64)
+        self.writebacks = 0
+
+    def request(self, kind, block, now):
+        bank = block & self.bank_mask
+        cache = self.banks[bank]
+        set_index = block & cache.set_mask
+        tag = block >> cache.set_bits
+        way = cache.find(set_index, tag)
+
+        if kind == 'writeback':
+            # 寫回不計入需求訪問，分配到L2並標記為髒
+            if way >= 0:
+                cache.state[set_index, way] = MODIFIED
+                cache.last_use[set_index, way] = now
+            else:
+                self._fill(cache, set_index, tag, MODIFIED, now)
+            return
+
+        if way >= 0:
+            self.hits[bank] += 1
+            cache.last_use[set_index, way] = now
+            return
+
+        self.misses[bank] += 1
+        if kind == 'demand':
+            self._fill(cache, set_index, tag, EXCLUSIVE, now)
+
+    def _fill(self, cache, set_index, tag, state, now):
+        victim = cache.fill(set_index, tag, state, now)
+        if victim is not None and victim[1] == MODIFIED:
+            self.writebacks += 1
+
+def _core_name(prefix, core, num_cores):
+    # 單核系統中gem5不給對象名加編號
+    return prefix if num_cores == 1 else f"{prefix}{core}"
+
+def model_values(l1, l2):
+    """把模型計數轉為gem5統計名 {統計名: 值}，可直接傳給compute_metrics()"""
+    values = {}
+    for core in range(l1.num_cores):
+        for column, prefix in enumerate(('system.l1_icache', 'system.l1_dcache')):
+            name = _core_name(prefix, core, l1.num_cores)
+            hits = int(l1.hits[core, column])
+            misses = int(l1.misses[core, column])
+            values[f"{name}.demandHits::total"] = hits
+            values[f"{name}.demandMisses::total"] = misses
+            values[f"{name}.demandAccesses::total"] = hits + misses
+            values[f"{name}.demandMissRate::total"] = misses / (hits + misses) if hits + misses else 0
+
+    for bank in range(len(l2.banks)):
+        name = 'system.l2cache' if len(l2.banks) == 1 else f"system.l2cache{bank}"
+        hits = int(l2.hits[bank])
+        misses = int(l2.misses[bank])
+        values[f"{name}.demandHits::total"] = hits
+        values[f"{name}.demandMisses::total"] = misses
+        values[f"{name}.demandAccesses::total"] = hits + misses
+        values[f"{name}.demandMissRate::total"] = misses / (hits + misses) if hits + misses else 0
+    values['system.mem_ctrl.writebacks'] = l2.writebacks
+    return values
+
+def simulate(trace, configurations, block_size=DEFAULT_BLOCK_SIZE):
+    """一遍回放跟蹤，評估所有配置
+
+    configurations為 expand_sweep() 的結果 [{'name', 'config', ...}]，
+    返回 [{'name', 'config', 'values', 'metrics'}]。
+    """
+    from compare_mesi_configs import compute_metrics
+
+    offset_bits = _log2(block_size, "緩存行大小")
+    blocks = trace['addr'] >> offset_bits
+    trace_cores = int(trace['core'].max()) + 1 if len(blocks) else 1
+
+    # L1參數相同的配置共享一份L1模擬: {(核心數, l1_size, l1_assoc): [L1System, [(配置, L2Model)]]}
+    groups = {}
+    for point in configurations:
+        config = point['config']
+        num_cores = config.get('num_cores', 2)
+        if num_cores < trace_cores:
+            print(f"⚠️  跳過 {point['name']}: 跟蹤包含 {trace_cores} 個核心，配置只有 {num_cores} 個")
+            continue
+
+        l1_key = (num_cores, config['l1_size'], config['l1_assoc'])
+        if l1_key not in groups:
+            groups[l1_key] = [L1System(num_cores, parse_size(config['l1_size']),
+                                       config['l1_assoc'], block_size), []]
+        l2 = L2Model(parse_size(config['l2_size']), config['l2_assoc'],
+                     config.get('l2_banks', 1), block_size)
+        groups[l1_key][1].append((point, l2))
+
+    cores = trace['core'].tolist()
+    insts = trace['inst'].tolist()
+    writes = trace['write'].tolist()
+    block_list = blocks.tolist()
+
+    for l1, l2_models in groups.values():
+        sets, tags = l1.set_indices(blocks)
+        l2s = [l2 for _, l2 in l2_models]
+        for now in range(len(block_list)):
+            requests = l1.access(cores[now], insts[now], writes[now], block_list[now],
+                                 sets[now], tags[now], now + 1)
+            for kind, block in requests:
+                for l2 in l2s:
+                    l2.request(kind, block, now + 1)
+
+    results = []
+    for l1, l2_models in groups.values():
+        for point, l2 in l2_models:
+            values = model_values(l1, l2)
+            results.append({
+                'name': point['name'],
+                'config': point['config'],
+                'values': values,
+                'metrics': compute_metrics(values, point['name'], warn_missing=False)
+            })
+    return results
+
+def print_results(results):
+    """按L1缺失率打印模型結果"""
+    print(f"{'配置':<24} {'L1':>14} {'L2':>16} {'L1D缺失率':>10} {'L2缺失率':>10} {'L2訪問':>10}")
+    for result in sorted(results, key=lambda r: (r['metrics']['l1_total_miss_rate'],
+                                                 r['metrics']['l2_miss_rate'])):
+        config = result['config']
+        metrics = result['metrics']
+        l2 = f"{config['l2_size']}/{config['l2_assoc']}w"
+        if config.get('l2_banks', 1) > 1:
+            l2 += f"x{config['l2_banks']}"
+        print(f"{result['name']:<24} {config['l1_size'] + '/' + str(config['l1_assoc']) + 'w':>14} "
+              f"{l2:>16} {metrics['l1_total_miss_rate']:>9.2f}% "
+              f"{metrics['l2_miss_rate'] * 100:>9.2f}% {metrics['l2_accesses']:>10,}")
+
+if __name__ == "__main__":
+    import argparse
+    from sweep_spec import load_sweep_spec, expand_sweep
+
+    parser = argparse.ArgumentParser(description='跟蹤驅動的MESI緩存模型（配置預篩選）')
+    parser.add_argument('trace', help='Cache調試跟蹤（支持 .gz / .zst）、.npz 或 .ctrace 跟蹤')
+    parser.add_argument('--spec', help='sweep規格文件，評估其中的所有配置點')
+    parser.add_argument('--num-cores', type=int, default=2)
+    parser.add_argument('--l1-size', default='32kB')
+    parser.add_argument('--l1-assoc', type=int, default=4)
+    parser.add_argument('--l2-size', default='512kB')
+    parser.add_argument('--l2-assoc', type=int, default=8)
+    parser.add_argument('--l2-banks', type=int, default=1)
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--save-trace', help='將提取的跟蹤保存為 .npz，之後可直接作為輸入')
+    parser.add_argument('--json', help='將所有配置的指標保存為JSON')
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    print(f"跟蹤訪問數: {len(trace['addr']):,}")
+    if args.save_trace:
+        save_trace(trace, args.save_trace)
+        print(f"📁 跟蹤已保存: {args.save_trace}")
+
+    if args.spec:
+        configurations = expand_sweep(load_sweep_spec(args.spec))
+    else:
+        config = {
+            'num_cores': args.num_cores,
+            'l1_size': args.l1_size,
+            'l1_assoc': args.l1_assoc,
+            'l2_size': args.l2_size,
+            'l2_assoc': args.l2_assoc,
+            'l2_banks': args.l2_banks
+        }
+        configurations = [{'name': 'model', 'config': config}]
+
+    try:
+        results = simulate(trace, configurations, args.block_size)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({r['name']: {'config': r['config'], 'metrics': r['metrics']}
+                       for r in results}, f, indent=2)
+        print(f"\n📁 模型結果已保存: {args.json}")
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+模擬結果緩存：以配置內容和輸入文件摘要為鍵，跳過未改變的sweep點
+
+緩存鍵由以下內容的SHA-256組成:
+  - 解析後的運行配置（去掉僅用於顯示的 name/description）
+  - 系統腳本、cache_config.py、ruby_config.py 的摘要
+  - 採樣模式使用的SimPoint文件的摘要
+  - 工作負載二進制文件的摘要
+  - gem5二進制文件的摘要
+任何一項改變都會得到新的鍵，因此不需要手動失效。
+
+目錄結構:
+  <cache_dir>/index.json          # {key: {'size', 'last_used', 'name'}}
+  <cache_dir>/<key>/stats.txt
+  <cache_dir>/<key>/config.json
+  <cache_dir>/<key>/phases.json      # 有階段標記的運行
+  <cache_dir>/<key>/samples.json     # 採樣模式的測量窗口
+  <cache_dir>/<key>/host_telemetry.json  # 運行時的主機資源使用
+  <cache_dir>/<key>/metrics.json
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+
+DEFAULT_CACHE_DIR = '.sim_cache'
+DEFAULT_CACHE_SIZE_MB = 2048
+
+# run_simulation()記錄的gem5進程主機資源使用（墻鐘時間、CPU時間、峰值RSS）
+HOST_TELEMETRY_FILE = 'host_telemetry.json'
+
+# 採樣模式下系統腳本記錄的測量窗口（每次dump對應的指令區間和權重）
+SAMPLES_FILE = 'samples.json'
+
+# 需要緩存的gem5輸出文件
+CACHED_FILES = ('stats.txt', 'config.json', 'phases.json', SAMPLES_FILE, HOST_TELEMETRY_FILE)
+
+# 不影響模擬結果的配置項（group為重複運行所屬的配置名）
+DISPLAY_ONLY_KEYS = ('name', 'description', 'group')
+
+# {路徑: (mtime, size, digest)}，避免同一次sweep中重複哈希大型gem5二進制
+_digest_memo = {}
+
+def file_digest(path):
+    """計算文件的SHA-256摘要，文件不存在時返回None"""
+    if not path or not os.path.exists(path):
+        return None
+
+    stat = os.stat(path)
+    memo = _digest_memo.get(path)
+    if memo and memo[:2] == (stat.st_mtime, stat.st_size):
+        return memo[2]
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+
+    digest = sha.hexdigest()
+    _digest_memo[path] = (stat.st_mtime, stat.st_size, digest)
+    return digest
+
+def cache_key(config, input_files):
+    """根據運行配置和輸入文件摘要計算緩存鍵
+
+    input_files: {角色: 路徑}，例如 {'gem5': './build/RISCV/gem5.opt'}
+    """
+    key_material = {
+        'config': {k: v for k, v in config.items() if k not in DISPLAY_ONLY_KEYS},
+        'inputs': {role: file_digest(path) for role, path in sorted(input_files.items())}
+    }
+    encoded = json.dumps(key_material, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+class ResultCache:
+    """基於目錄的結果緩存，按總大小進行LRU淘汰"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_CACHE_SIZE_MB):
+        self.cache_dir = cache_dir
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            print(f"⚠️  緩存索引損壞，重建: {self.index_file}")
+            return {}
+
+        # 丟棄目錄已被刪除的條目
+        return {key: entry for key, entry in index.items()
+                if os.path.isdir(self._entry_dir(key))}
+
+    def _save_index(self):
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_file, self.index_file)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, key, output_dir):
+        """命中時將緩存文件恢復到output_dir，返回 {文件名: 路徑} 和指標；未命中返回None"""
+        if key not in self.index:
+            self.misses += 1
+            return None
+
+        entry_dir = self._entry_dir(key)
+        os.makedirs(output_dir, exist_ok=True)
+
+        restored = {}
+        for filename in CACHED_FILES:
+            src = os.path.join(entry_dir, filename)
+            if os.path.exists(src):
+                dst = os.path.join(output_dir, filename)
+                shutil.copyfile(src, dst)
+                restored[filename] = dst
+
+        if 'stats.txt' not in restored:
+            # 條目不完整，視為未命中
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        metrics = None
+        metrics_file = os.path.join(entry_dir, 'metrics.json')
+        if os.path.exists(metrics_file):
+            with open(metrics_file, 'r') as f:
+                metrics = json.load(f)
+
+        self.index[key]['last_used'] = time.time()
+        self._save_index()
+        self.hits += 1
+        return {'files': restored, 'metrics': metrics}
+
+    def store(self, key, output_dir, name=None, metrics=None):
+        """將一次成功運行的輸出存入緩存"""
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        size = 0
+        for filename in CACHED_FILES:
+            src = os.path.join(output_dir, filename)
+            if os.path.exists(src):
+                shutil.copyfile(src, os.path.join(entry_dir, filename))
+                size += os.path.getsize(src)
+
+        if metrics is not None:
+            metrics_file = os.path.join(entry_dir, 'metrics.json')
+            with open(metrics_file, 'w') as f:
+                json.dump(metrics, f, indent=2)
+            size += os.path.getsize(metrics_file)
+
+        self.index[key] = {'size': size, 'last_used': time.time(), 'name': name}
+        self._evict()
+        self._save_index()
+
+    def _remove(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        self.index.pop(key, None)
+
+    def _evict(self):
+        """淘汰最久未使用的條目，直到總大小不超過上限"""
+        total = sum(entry['size'] for entry in self.index.values())
+        evicted = 0
+        for key in sorted(self.index, key=lambda k: self.index[k]['last_used']):
+            if total <= self.max_size:
+                break
+            total -= self.index[key]['size']
+            self._remove(key)
+            evicted += 1
+
+        if evicted:
+            print(f"🧹 緩存已淘汰 {evicted} 個最久未使用的條目")
+
+    def total_size(self):
+        return sum(entry['size'] for entry in self.index.values())
+
+    def report(self):
+        """打印命中/未命中統計"""
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0
+        print(f"💾 結果緩存: {self.hits} 命中 / {self.misses} 未命中 ({hit_rate:.1f}%), "
+              f"{len(self.index)} 個條目, {self.total_size() / (1024 * 1024):.1f} MB")
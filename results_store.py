@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+sweep結果的列式存儲：每次運行一行，每個統計項/配置項一列
+
+目錄結構:
+  <store_dir>/meta.json       # 列名 -> {'file', 'kind'}，以及行數
+  <store_dir>/col_00000.npy   # 每列一個NumPy數組，加載時使用內存映射
+
+列分為三類:
+  - run:    run_id（輸出目錄）, run_name, stats_mtime
+  - config: sweep配置項（num_cores, l1_size, ...），大小類配置額外生成 <key>_bytes 數值列
+  - stat:   stats.txt中的所有統計項（float64，缺失為NaN），以及運行腳本記錄的
+            gem5進程主機資源使用（runner.wall_seconds / cpu_seconds / cpu_utilization / peak_rss_mb）；
+            採樣模式的運行為各窗口外推後的值（見 sampled_values）
+數值列為float64，字符串列為定長unicode，因此所有列都可以直接內存映射。
+
+查詢示例（所有2核運行的L2缺失率 vs l2_size）:
+  store = ResultsStore()
+  data = store.query(['l2_size_bytes', 'system.l2cache.demandMissRate::total'],
+                     where={'num_cores': 2})
+"""
+
+import os
+import sys
+import json
+import fnmatch
+import numpy as np
+
+from gem5_stats import load_stats, parse_stats, extrapolate_dumps
+from result_cache import HOST_TELEMETRY_FILE, SAMPLES_FILE
+
+DEFAULT_STORE_DIR = 'results/store'
+
+COLUMN_KINDS = ('run', 'config', 'stat')
+
+SIZE_UNITS = {'B': 1, 'kB': 1024, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+def parse_size(value):
+    """將 '16kB' / '1MB' 之類的大小轉為字節數，無法解析時返回None"""
+    if not isinstance(value, str):
+        return None
+    for suffix in sorted(SIZE_UNITS, key=len, reverse=True):
+        if value.endswith(suffix):
+            try:
+                return int(float(value[:-len(suffix)]) * SIZE_UNITS[suffix])
+            except ValueError:
+                return None
+    return None
+
+def config_columns(config):
+    """將運行配置展開為配置列（大小類配置額外生成 <key>_bytes）"""
+    columns = {}
+    for key, value in config.items():
+        if key in ('name', 'description'):
+            continue
+        columns[key] = value
+        size = parse_size(value)
+        if size is not None:
+            columns[f"{key}_bytes"] = size
+    return columns
+
+def _build_column(values):
+    """將一列Python值轉為可內存映射的NumPy數組"""
+    if any(isinstance(v, str) for v in values):
+        return np.array(['' if v is None else str(v) for v in values])
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+def _missing_like(column, length):
+    """生成與已有列類型一致的缺失值數組"""
+    if column.dtype.kind == 'U':
+        return np.full(length, '', dtype=column.dtype)
+    return np.full(length, np.nan, dtype=np.float64)
+
+class ResultsStore:
+    """基於NumPy .npy文件的列式結果存儲"""
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        self.meta_file = os.path.join(store_dir, 'meta.json')
+        self._arrays = {}
+
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, 'r') as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {'num_rows': 0, 'columns': {}}
+
+    @property
+    def num_rows(self):
+        return self.meta['num_rows']
+
+    def __len__(self):
+        return self.num_rows
+
+    def __contains__(self, name):
+        return name in self.meta['columns']
+
+    def columns(self, kind=None):
+        """返回列名列表，可按類型（run/config/stat）過濾"""
+        return [name for name, info in self.meta['columns'].items()
+                if kind is None or info['kind'] == kind]
+
+    def glob_columns(self, pattern):
+        """按glob模式匹配列名，例如 'system.l1_dcache*.demandMisses::total'"""
+        return fnmatch.filter(self.meta['columns'], pattern)
+
+    def column(self, name):
+        """以內存映射方式加載一列"""
+        if name not in self._arrays:
+            info = self.meta['columns'][name]
+            path = os.path.join(self.store_dir, info['file'])
+            self._arrays[name] = np.load(path, mmap_mode='r')
+        return self._arrays[name]
+
+    def mask(self, where=None):
+        """根據 {列名: 值 或 值列表} 生成布爾行掩碼"""
+        mask = np.ones(self.num_rows, dtype=bool)
+        for name, value in (where or {}).items():
+            column = self.column(name)
+            if isinstance(value, (list, tuple, set)):
+                mask &= np.isin(column, list(value))
+            else:
+                mask &= column == value
+        return mask
+
+    def query(self, columns, where=None):
+        """返回 {列名: 數組}，只包含滿足where條件的行"""
+        mask = self.mask(where)
+        return {name: np.asarray(self.column(name))[mask] for name in columns}
+
+    def find_row(self, run_id):
+        """按run_id查找行號，不存在時返回None"""
+        if 'run_id' not in self or not self.num_rows:
+            return None
+        rows = np.flatnonzero(self.column('run_id') == run_id)
+        return int(rows[-1]) if len(rows) else None
+
+    def row(self, index, kind=None):
+        """返回一行的 {列名: 值}（NaN和空字符串視為缺失，不包含在結果中）"""
+        values = {}
+        for name in self.columns(kind):
+            value = self.column(name)[index]
+            if isinstance(value, np.str_):
+                if value:
+                    values[name] = str(value)
+            elif not np.isnan(value):
+                values[name] = int(value) if float(value).is_integer() else float(value)
+        return values
+
+    def append(self, rows):
+        """追加多行。rows: [{'run': {...}, 'config': {...}, 'stat': {...}}]
+
+        run_id相同的舊行會被替換，因此重新運行的配置可以直接重新導入
+        """
+        if not rows:
+            return
+
+        new_ids = {row['run']['run_id'] for row in rows}
+        if self.num_rows and 'run_id' in self:
+            keep = ~np.isin(self.column('run_id'), list(new_ids))
+        else:
+            keep = np.ones(self.num_rows, dtype=bool)
+        kept_rows = int(keep.sum())
+
+        # 收集所有列（保留已有列的順序）
+        kinds = {name: info['kind'] for name, info in self.meta['columns'].items()}
+        for row in rows:
+            for kind in COLUMN_KINDS:
+                for name in row.get(kind, {}):
+                    kinds.setdefault(name, kind)
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        columns_meta = {}
+        for index, (name, kind) in enumerate(kinds.items()):
+            new_values = _build_column([row.get(kind, {}).get(name) for row in rows])
+
+            if name in self.meta['columns']:
+                old = np.asarray(self.column(name))[keep]
+            else:
+                old = _missing_like(new_values, kept_rows)
+
+            if (old.dtype.kind == 'U') != (new_values.dtype.kind == 'U'):
+                # 數值列中出現字符串時，整列轉為字符串
+                old = old.astype(str)
+                new_values = new_values.astype(str)
+
+            filename = self.meta['columns'].get(name, {}).get('file', f"col_{index:05d}.npy")
+            path = os.path.join(self.store_dir, filename)
+            tmp_path = path + '.tmp.npy'
+            np.save(tmp_path, np.concatenate([old, new_values]))
+            os.replace(tmp_path, path)
+            columns_meta[name] = {'file': filename, 'kind': kind}
+
+        self._arrays = {}
+        self.meta = {'num_rows': kept_rows + len(rows), 'columns': columns_meta}
+
+        tmp_meta = self.meta_file + '.tmp'
+        with open(tmp_meta, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_meta, self.meta_file)
+
+    def to_parquet(self, path):
+        """導出為Parquet文件（需要pyarrow）"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("❌ 導出Parquet需要pyarrow: pip install pyarrow")
+            return False
+
+        table = pa.table({name: np.asarray(self.column(name)) for name in self.columns()})
+        pq.write_table(table, path)
+        return True
+
+def host_telemetry_values(output_dir):
+    """運行腳本記錄的主機資源使用，以 runner.* 統計名返回；沒有記錄時返回空字典"""
+    telemetry_file = os.path.join(output_dir, HOST_TELEMETRY_FILE)
+    if not os.path.exists(telemetry_file):
+        return {}
+    with open(telemetry_file, 'r') as f:
+        return {f"runner.{key}": value for key, value in json.load(f).items()}
+
+def sampled_values(output_dir):
+    """採樣模式的運行按samples.json中的窗口把各窗口的dump外推為整個區域的 {統計名: 值}
+
+    第i個窗口對應stats.txt中的第i次dump（退出時的最後一次dump不計）；主機統計（host*）取最後一次dump，
+    另外以 sampling.* 統計名記錄窗口數、測量的指令數和區域的指令數。不是採樣運行時返回None
+    """
+    samples_file = os.path.join(output_dir, SAMPLES_FILE)
+    stats_file = os.path.join(output_dir, 'stats.txt')
+    if not os.path.exists(samples_file) or not os.path.exists(stats_file):
+        return None
+    with open(samples_file, 'r') as f:
+        samples = json.load(f)
+    windows = samples.get('windows') or []
+    if not windows:
+        return None
+
+    dumps = parse_stats(stats_file)
+    if len(dumps) < len(windows):
+        print(f"⚠️  {stats_file} 有 {len(dumps)} 次dump，但採樣窗口有 {len(windows)} 個")
+        windows = windows[:len(dumps)]
+        if not windows:
+            return None
+
+    region = samples['region_insts']
+    total_weight = sum(window['weight'] for window in windows)
+    values = extrapolate_dumps(dumps[:len(windows)],
+                               [window['weight'] / total_weight for window in windows],
+                               [region / window['insts'] for window in windows])
+    values.update({name: value for name, value in dumps[-1].as_dict().items() if name.startswith('host')})
+    values.update({
+        'sampling.windows': len(windows),
+        'sampling.measured_insts': sum(window['insts'] for window in windows),
+        'sampling.region_insts': region
+    })
+    return values
+
+def build_row(run_name, output_dir, config):
+    """解析一次運行的stats.txt，生成可追加到存儲中的一行；沒有統計數據時返回None"""
+    stats_file = os.path.join(output_dir, 'stats.txt')
+    if not os.path.exists(stats_file):
+        return None
+
+    stats = sampled_values(output_dir)
+    if stats is None:
+        dump = load_stats(stats_file)
+        if dump is None:
+            return None
+        stats = {record.name: record.value for record in dump}
+    stats.update(host_telemetry_values(output_dir))
+
+    return {
+        'run': {
+            'run_id': os.path.normpath(output_dir),
+            'run_name': run_name,
+            'stats_mtime': os.path.getmtime(stats_file)
+        },
+        'config': config_columns(config or {}),
+        'stat': stats
+    }
+
+def ingest_runs(store, runs):
+    """將 [(run_name, output_dir, config)] 導入存儲，返回導入的行數"""
+    rows = []
+    for run_name, output_dir, config in runs:
+        row = build_row(run_name, output_dir, config)
+        if row is None:
+            print(f"⚠️  {run_name} 沒有可導入的統計數據: {output_dir}")
+            continue
+        rows.append(row)
+
+    store.append(rows)
+    return len(rows)
+
+def ingest_run_info(store, run_info_file):
+    """從run_all_configs.py生成的run_info.json導入所有成功的運行"""
+    with open(run_info_file, 'r') as f:
+        run_info = json.load(f)
+
+    runs = []
+    for name, result in run_info['configurations'].items():
+        if not result.get('success'):
+            continue
+
+        config = result.get('config')
+        run_config_file = os.path.join(result['output_dir'], 'run_config.json')
+        if config is None and os.path.exists(run_config_file):
+            with open(run_config_file, 'r') as f:
+                config = json.load(f)
+        runs.append((name, result['output_dir'], config))
+
+    return ingest_runs(store, runs)
+
+def _parse_where(items):
+    """解析命令行中的 key=value 條件"""
+    where = {}
+    for item in items:
+        key, _, value = item.partition('=')
+        try:
+            where[key] = float(value)
+        except ValueError:
+            where[key] = value
+    return where
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='sweep結果列式存儲')
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help=f'存儲目錄（默認: {DEFAULT_STORE_DIR}）')
+    subparsers = parser.add_subparsers(dest='command')
+
+    ingest_parser = subparsers.add_parser('ingest', help='導入run_info.json中的運行結果')
+    ingest_parser.add_argument('run_info', nargs='?', default='results/run_info.json')
+
+    subparsers.add_parser('info', help='顯示存儲概況')
+
+    query_parser = subparsers.add_parser('query', help='查詢列')
+    query_parser.add_argument('columns', nargs='+', help='列名或glob模式')
+    query_parser.add_argument('--where', nargs='*', default=[], help='過濾條件，例如 num_cores=2')
+
+    export_parser = subparsers.add_parser('export', help='導出為Parquet')
+    export_parser.add_argument('path')
+
+    args = parser.parse_args()
+    store = ResultsStore(args.store)
+
+    if args.command == 'ingest':
+        count = ingest_run_info(store, args.run_info)
+        print(f"✅ 已導入 {count} 次運行，存儲共 {store.num_rows} 行")
+    elif args.command == 'query':
+        names = [name for pattern in args.columns for name in store.glob_columns(pattern)]
+        data = store.query(['run_name'] + names, where=_parse_where(args.where))
+        for i in range(len(data['run_name'])):
+            print(data['run_name'][i], ' '.join(f"{name}={data[name][i]}" for name in names))
+    elif args.command == 'export':
+        if store.to_parquet(args.path):
+            print(f"✅ 已導出: {args.path}")
+    elif args.command == 'info':
+        print(f"存儲目錄: {args.store}")
+        print(f"行數: {store.num_rows}")
+        for kind in COLUMN_KINDS:
+            print(f"{kind} 列: {len(store.columns(kind))}")
+    else:
+        parser.print_help()
+        sys.exit(1)
@@ -4,120 +4,435 @@
 """
 
 import os
+import sys
+import argparse
 import subprocess
 import json
-import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 
-def run_simulation(config_name, script_path, output_dir):
-    """運行單個模擬配置"""
-    print(f"\n🚀 運行配置: {config_name}")
-    print("=" * 50)
-    
+from sweep_spec import load_sweep_spec, expand_sweep
+from result_cache import (ResultCache, cache_key, DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_MB,
+                          HOST_TELEMETRY_FILE)
+from results_store import ResultsStore, ingest_runs, DEFAULT_STORE_DIR
+from workload_gen import load_registry, workload_binary, ensure_workloads
+from job_queue import JobJournal, JobScheduler, DEFAULT_TIMEOUT, DEFAULT_RETRIES
+from sweep_workers import LocalBackend, SocketBackend, spawn_local_workers, DEFAULT_PREFETCH
+
+GEM5_BINARY = './build/RISCV/gem5.opt'
+# memory_system為ruby的配置需要以 PROTOCOL=MESI_Two_Level 編譯的gem5
+RUBY_GEM5_BINARY = './build/RISCV_MESI_Two_Level/gem5.opt'
+SYSTEM_SCRIPT = 'configs/scripts/mesi_system.py'
+CACHE_CONFIG_SCRIPT = 'config/cache_config.py'
+RUBY_CONFIG_SCRIPT = 'config/ruby_config.py'
+DEFAULT_SWEEP_SPEC = 'config/default_sweep.json'
+DEFAULT_CHECKPOINT_DIR = 'results/checkpoints'
+CHECKPOINT_PHASE_FILE = 'phase_state.json'
+
+# 決定ROI檢查點內容的配置項；緩存幾何和加速器參數不影響ROI之前的程序狀態，
+# 擾動種子改變ROI之前的內存佈局和起始時間；經典緩存和Ruby的檢查點不能互相恢復
+CHECKPOINT_KEYS = ('num_cores', 'clock', 'workload', 'seed', 'memory_system')
+
+def gem5_binary(config):
+    """運行該配置的gem5二進制文件"""
+    return RUBY_GEM5_BINARY if config.get('memory_system') == 'ruby' else GEM5_BINARY
+
+def run_simulation(config_name, config, output_dir, script_path=SYSTEM_SCRIPT, timeout=DEFAULT_TIMEOUT):
+    """運行單個模擬配置（每個配置使用獨立的gem5輸出目錄）
+
+    gem5的stdout/stderr寫入輸出目錄下的 gem5.stdout / gem5.stderr
+    """
+    print(f"🚀 運行配置: {config_name}")
+
+    run_result = {
+        'success': False,
+        'returncode': None,
+        'timed_out': False,
+        'runtime': None,
+        'stats_file': None,
+        'config_file': None,
+        'stdout_log': None,
+        'stderr_log': None
+    }
+
     try:
-        # 運行gem5模擬
-        cmd = f"./build/RISCV/gem5.opt {script_path}"
-        print(f"執行命令: {cmd}")
-        
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=300)
-        
-        if result.returncode != 0:
-            print(f"❌ {config_name} 運行失敗:")
-            print(result.stderr)
-            return False
-        
-        # 創建輸出目錄
+        # 每個運行都寫入自己的 --outdir，並行運行時不會互相覆蓋 m5out/
         os.makedirs(output_dir, exist_ok=True)
-        
-        # 複製統計文件
-        if os.path.exists("m5out/stats.txt"):
-            shutil.copy("m5out/stats.txt", f"{output_dir}/stats.txt")
-            print(f"✅ {config_name} 運行成功，統計文件已保存")
-            return True
+
+        # 配置點寫入 run_config.json，由參數化系統腳本讀取
+        run_config_file = os.path.join(output_dir, 'run_config.json')
+        with open(run_config_file, 'w') as f:
+            json.dump(config, f, indent=2)
+
+        # 重新運行前刪除舊的統計文件，避免把上一次的結果當作本次成功
+        stats_file = os.path.join(output_dir, 'stats.txt')
+        if os.path.exists(stats_file):
+            os.remove(stats_file)
+
+        cmd = [gem5_binary(config), f'--outdir={output_dir}', script_path,
+               f'--config={run_config_file}']
+        print(f"執行命令: {' '.join(cmd)} (超時 {timeout}s)")
+
+        run_result['stdout_log'] = os.path.join(output_dir, 'gem5.stdout')
+        run_result['stderr_log'] = os.path.join(output_dir, 'gem5.stderr')
+        with open(run_result['stdout_log'], 'w') as stdout, open(run_result['stderr_log'], 'w') as stderr:
+            returncode, telemetry = run_with_telemetry(cmd, stdout, stderr, timeout)
+        run_result['runtime'] = telemetry['wall_seconds']
+        run_result['returncode'] = returncode
+        run_result['host'] = telemetry
+        with open(os.path.join(output_dir, HOST_TELEMETRY_FILE), 'w') as f:
+            json.dump(telemetry, f, indent=2)
+
+        if returncode != 0:
+            print(f"❌ {config_name} 運行失敗 (exit {returncode})，stderr最後幾行:")
+            print(_tail(run_result['stderr_log']))
+            return run_result
+
+        # 收集統計文件與配置文件
+        config_file = os.path.join(output_dir, 'config.json')
+        if os.path.exists(config_file):
+            run_result['config_file'] = config_file
+
+        if os.path.exists(stats_file):
+            run_result['stats_file'] = stats_file
+            run_result['success'] = True
+            print(f"✅ {config_name} 運行成功，統計文件已保存 ({run_result['runtime']:.1f}s)")
         else:
             print(f"❌ {config_name} 統計文件未找到")
-            return False
-            
+        return run_result
+
     except subprocess.TimeoutExpired:
-        print(f"❌ {config_name} 運行超時")
-        return False
+        run_result['timed_out'] = True
+        print(f"❌ {config_name} 運行超時 ({timeout}s)")
+        return run_result
     except Exception as e:
         print(f"❌ {config_name} 運行出錯: {e}")
-        return False
+        return run_result
+
+def run_with_telemetry(cmd, stdout, stderr, timeout):
+    """運行gem5並採樣主機資源使用，返回 (退出狀態, 遙測數據)
+
+    用wait4()得到該進程自己的rusage（峰值RSS、用戶/系統CPU時間），不依賴psutil；
+    超時時殺死進程並拋出subprocess.TimeoutExpired
+    """
+    start = time.monotonic()
+    process = subprocess.Popen(cmd, stdout=stdout, stderr=stderr)
+    interval = 0.05
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            break
+        if timeout is not None and time.monotonic() - start > timeout:
+            process.kill()
+            process.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        time.sleep(interval)
+        interval = min(1.0, interval * 2)
+
+    # wait4()已回收進程，同步Popen的狀態
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.monotonic() - start
+    cpu = usage.ru_utime + usage.ru_stime
+    return process.returncode, {
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'cpu_utilization': cpu / wall if wall > 0 else 0,
+        # Linux上ru_maxrss的單位為kB
+        'peak_rss_mb': usage.ru_maxrss / 1024
+    }
+
+def _tail(path, lines=20):
+    """日誌文件的最後幾行"""
+    try:
+        with open(path, 'r', errors='replace') as f:
+            return ''.join(deque(f, maxlen=lines))
+    except OSError:
+        return ''
+
+def _workload_path(workload):
+    """登記的生成工作負載解析為編譯後的程序，其它名稱按路徑處理"""
+    return workload_binary(workload) if workload in load_registry() else workload
+
+def simulation_inputs(config):
+    """影響模擬結果的輸入文件（用於計算緩存鍵）"""
+    inputs = {
+        'gem5': gem5_binary(config),
+        'system_script': SYSTEM_SCRIPT,
+        'cache_config': CACHE_CONFIG_SCRIPT,
+        'ruby_config': RUBY_CONFIG_SCRIPT,
+        'workload': _workload_path(config.get('workload', 'cnn_test')),
+        # 從檢查點恢復時，檢查點內容也影響結果
+        'checkpoint': os.path.join(config['restore_dir'], 'm5.cpt') if config.get('restore_dir') else None,
+        # 檢查點時各階段中的核心數（系統腳本的 PHASE_STATE_FILE）
+        'checkpoint_phases': (os.path.join(config['restore_dir'], CHECKPOINT_PHASE_FILE)
+                              if config.get('restore_dir') else None)
+    }
+    # SimPoint採樣的窗口和權重由這兩個文件決定
+    if config.get('sampling') == 'simpoint':
+        inputs['simpoints'] = config.get('simpoint_file')
+        inputs['simpoint_weights'] = config.get('simpoint_weights')
+    return inputs
+
+def prepare_checkpoints(configurations, checkpoint_root, jobs, warmup=None):
+    """每組 (核心數, 時鐘, 工作負載) 只運行一次到ROI並生成檢查點，
+    然後讓該組所有配置點從檢查點恢復（可選預熱窗口）
+
+    檢查點目錄名由組配置和輸入文件摘要決定，gem5或工作負載改變後自動重新生成。
+    生成失敗的組照常從頭運行；快進/採樣模式的配置點自己快進，不使用檢查點。
+    """
+    groups = {}
+    for point in configurations:
+        if point['config'].get('fast_forward', 'none') != 'none' or point['config'].get('sampling', 'none') != 'none':
+            continue
+        group = {key: point['config'][key] for key in CHECKPOINT_KEYS if key in point['config']}
+        key = cache_key(group, simulation_inputs(group))[:16]
+        groups.setdefault(key, []).append(point)
+
+    pending = []
+    for key, points in groups.items():
+        output_dir = os.path.join(checkpoint_root, key)
+        checkpoint_dir = os.path.join(output_dir, 'cpt')
+        # 沒有階段狀態的舊檢查點重新生成
+        if all(os.path.exists(os.path.join(checkpoint_dir, name)) for name in ('m5.cpt', CHECKPOINT_PHASE_FILE)):
+            print(f"💾 檢查點已存在: {checkpoint_dir}")
+        else:
+            pending.append((key, output_dir, checkpoint_dir))
+
+    failed = set()
+    if pending:
+        print(f"📸 生成 {len(pending)} 個ROI檢查點...")
+        with ProcessPoolExecutor(max_workers=max(1, min(jobs, len(pending)))) as executor:
+            futures = {
+                executor.submit(
+                    run_simulation,
+                    f"checkpoint_{key}",
+                    {**groups[key][0]['config'], 'checkpoint_dir': checkpoint_dir},
+                    output_dir
+                ): (key, checkpoint_dir)
+                for key, output_dir, checkpoint_dir in pending
+            }
+            for future in as_completed(futures):
+                key, checkpoint_dir = futures[future]
+                future.result()
+                if not os.path.exists(os.path.join(checkpoint_dir, 'm5.cpt')):
+                    print(f"⚠️  檢查點生成失敗，該組配置從頭運行: {checkpoint_dir}")
+                    failed.add(key)
+
+    for key, points in groups.items():
+        if key in failed:
+            continue
+        checkpoint_dir = os.path.join(checkpoint_root, key, 'cpt')
+        for point in points:
+            point['config'] = {**point['config'], 'restore_dir': checkpoint_dir}
+            if warmup is not None:
+                point['config']['warmup'] = warmup
+
+def parse_metrics(stats_file):
+    """解析統計文件中的關鍵指標，存入緩存供分析腳本直接使用"""
+    from compare_mesi_configs import parse_stats_file
+    return parse_stats_file(stats_file)
+
+def run_sweep(configurations, jobs, cache=None, journal=None, max_retries=DEFAULT_RETRIES,
+              backend=None):
+    """並行運行所有配置，返回 {配置名: 運行結果}
+
+    backend為sweep_workers中的後端（默認本機進程池）；提供cache時，命中緩存的配置直接恢復結果，不再運行gem5；
+    提供journal時，之前已完成的配置跳過，每次狀態改變都寫入作業日誌（支持中斷後恢復）
+    """
+    results = {}
+    pending = []
+    keys = {}
+
+    for config in configurations:
+        key = cache_key(config['config'], simulation_inputs(config['config']))
+        keys[config['name']] = key
+        if journal is not None and journal.is_done(config['name'], key, config['output_dir']):
+            print(f"⏭️  {config['name']} 已在之前的運行中完成，跳過")
+            results[config['name']] = _completed_result(config, cached=False)
+            continue
+        if cache is not None:
+            cached = cache.lookup(key, config['output_dir'])
+            if cached is not None:
+                print(f"💾 {config['name']} 命中緩存，跳過模擬")
+                results[config['name']] = _completed_result(config, cached=True)
+                continue
+        pending.append(config)
+
+    def finished(config, result):
+        results[config['name']] = {
+            **result,
+            'cached': False,
+            'description': config['description'],
+            'output_dir': config['output_dir'],
+            'config': config['config']
+        }
+
+        # 緩存只在主進程中更新，避免並發寫索引
+        if cache is not None and result['success']:
+            cache.store(keys[config['name']], config['output_dir'],
+                        name=config['name'],
+                        metrics=parse_metrics(result['stats_file']))
+
+    if journal is None:
+        journal = JobJournal(None)
+    if backend is None:
+        backend = LocalBackend(jobs)
+    try:
+        scheduler = JobScheduler(journal, backend, run_simulation, backend.capacity, max_retries)
+        scheduler.run(pending, keys, on_result=finished)
+    finally:
+        backend.shutdown()
+    backend.report()
+
+    # 按配置的原始順序返回
+    return {config['name']: results[config['name']] for config in configurations}
+
+def _completed_result(config, cached):
+    """從輸出目錄中已有的結果構造運行結果（緩存命中或之前已完成）"""
+    output_dir = config['output_dir']
+    config_file = os.path.join(output_dir, 'config.json')
+    return {
+        'success': True,
+        'returncode': 0,
+        'stats_file': os.path.join(output_dir, 'stats.txt'),
+        'config_file': config_file if os.path.exists(config_file) else None,
+        'cached': cached,
+        'description': config['description'],
+        'output_dir': output_dir,
+        'config': config['config']
+    }
+
+def parse_args():
+    """解析命令行參數"""
+    parser = argparse.ArgumentParser(description='運行所有MESI配置')
+    parser.add_argument('--spec', default=DEFAULT_SWEEP_SPEC,
+                        help=f'sweep規格文件（默認: {DEFAULT_SWEEP_SPEC}）')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='同時運行的gem5進程數（默認: CPU核心數）')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'結果緩存目錄（默認: {DEFAULT_CACHE_DIR}）')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_CACHE_SIZE_MB,
+                        help=f'結果緩存大小上限，單位MB，超出時按LRU淘汰（默認: {DEFAULT_CACHE_SIZE_MB}）')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='忽略結果緩存，強制重新運行所有配置')
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR,
+                        help=f'列式結果存儲目錄，成功的運行會自動導入（默認: {DEFAULT_STORE_DIR}）')
+    parser.add_argument('--checkpoint', action='store_true',
+                        help='每組 (核心數, 時鐘, 工作負載) 只執行一次ROI之前的初始化，其餘配置從檢查點恢復')
+    parser.add_argument('--checkpoint-dir', default=DEFAULT_CHECKPOINT_DIR,
+                        help=f'檢查點目錄（默認: {DEFAULT_CHECKPOINT_DIR}）')
+    parser.add_argument('--resume', action='store_true',
+                        help='從作業日誌恢復被中斷的sweep，跳過已完成的配置')
+    parser.add_argument('--journal',
+                        help='作業日誌文件（默認: results/journal_<sweep名>.json）')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'超時/被信號終止的運行的重試次數（默認: {DEFAULT_RETRIES}）')
+    parser.add_argument('--listen', metavar='HOST:PORT',
+                        help='把作業分發給連接到該地址的工作節點（sweep_workers.py worker），而不是本機進程池')
+    parser.add_argument('--local-workers', type=int, default=0,
+                        help='與 --listen 一起使用：在本機啟動N個工作節點進程')
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH,
+                        help=f'每個工作節點在本地排隊的額外作業數（默認: {DEFAULT_PREFETCH}）')
+    parser.add_argument('--repetitions', type=int,
+                        help='每個配置點的重複運行次數，各次使用不同的擾動種子（覆蓋spec中的repetitions）')
+    parser.add_argument('--warmup',
+                        help='從檢查點恢復後的預熱時間（例如 50us），預熱後重置統計；默認緩存為冷狀態')
+    return parser.parse_args()
 
 def main():
     """主函數：運行所有配置"""
-    print("🎯 開始運行三種MESI配置比較")
+    args = parse_args()
+
+    spec = load_sweep_spec(args.spec)
+    if args.repetitions is not None:
+        spec['repetitions'] = args.repetitions
+    configurations = expand_sweep(spec)
+
+    print(f"🎯 開始運行MESI配置掃描: {spec.get('name', 'sweep')} ({len(configurations)} 個配置)")
     print("=" * 60)
-    
-    # 配置信息
-    configurations = [
-        {
-            'name': 'Small Cache',
-            'script': 'configs/scripts/mesi_small_cache.py',
-            'output_dir': 'results/small_cache',
-            'description': 'L1=16KB, L2=256KB'
-        },
-        {
-            'name': 'Medium Cache', 
-            'script': 'configs/scripts/mesi_system.py',
-            'output_dir': 'results/medium_cache',
-            'description': 'L1=32KB, L2=512KB'
-        },
-        {
-            'name': 'Large Cache',
-            'script': 'configs/scripts/mesi_large_cache.py', 
-            'output_dir': 'results/large_cache',
-            'description': 'L1=64KB, L2=1MB'
-        }
-    ]
-    
+
     # 創建結果目錄
     os.makedirs('results', exist_ok=True)
-    
+
     # 記錄開始時間
     start_time = datetime.now()
-    results = {}
-    
-    # 運行所有配置
-    for config in configurations:
-        success = run_simulation(
-            config['name'], 
-            config['script'], 
-            config['output_dir']
-        )
-        
-        results[config['name']] = {
-            'success': success,
-            'description': config['description'],
-            'output_dir': config['output_dir']
-        }
-    
+
+    # 並行運行所有配置
+    jobs = max(1, min(args.jobs, len(configurations)))
+    print(f"並行進程數: {jobs}")
+
+    # 編譯sweep中用到的生成工作負載（源碼未變時跳過）
+    try:
+        ensure_workloads(point['config'].get('workload', 'cnn_test') for point in configurations)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        return
+
+    if args.checkpoint:
+        prepare_checkpoints(configurations, args.checkpoint_dir, jobs, args.warmup)
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size)
+    journal_file = args.journal or os.path.join('results', f"journal_{spec.get('name', 'sweep')}.json")
+    journal = JobJournal(journal_file, resume=args.resume)
+    backend = None
+    if args.listen:
+        backend = SocketBackend(args.listen, args.prefetch)
+        if args.local_workers:
+            spawn_local_workers(backend.address, args.local_workers, jobs)
+    try:
+        results = run_sweep(configurations, jobs, cache, journal, args.retries, backend)
+    except KeyboardInterrupt:
+        print(f"\n⏸️  已中斷，作業狀態保存在 {journal_file}")
+        print(f"使用 --resume 繼續: python3 run_all_configs.py --spec {args.spec} --resume")
+        sys.exit(130)
+
     # 記錄結束時間
     end_time = datetime.now()
     duration = end_time - start_time
-    
+
     # 生成運行報告
     print(f"\n📊 運行完成！總耗時: {duration}")
     print("=" * 60)
-    
+
     for name, result in results.items():
-        status = "✅ 成功" if result['success'] else "❌ 失敗"
+        status = "✅ 成功" if result['success'] else f"❌ 失敗 (exit {result['returncode']})"
+        if result['cached']:
+            status += " (緩存)"
         print(f"{name} ({result['description']}): {status}")
-    
+
+    if cache is not None:
+        cache.report()
+    counts = journal.counts()
+    print(f"📒 作業日誌 {journal_file}: " + ", ".join(f"{state} {n}" for state, n in sorted(counts.items())))
+
+    # 將所有成功運行的完整統計導入列式存儲
+    store = ResultsStore(args.store)
+    ingested = ingest_runs(store, [
+        (name, result['output_dir'], result['config'])
+        for name, result in results.items() if result['success']
+    ])
+    print(f"🗄️  已導入 {ingested} 次運行到 {args.store}（共 {store.num_rows} 行）")
+
     # 保存運行信息
     run_info = {
         'timestamp': start_time.isoformat(),
         'duration': str(duration),
+        'jobs': jobs,
+        'spec': args.spec,
+        'checkpoint': args.checkpoint,
+        'journal': journal_file,
         'configurations': results
     }
-    
+
     with open('results/run_info.json', 'w') as f:
         json.dump(run_info, f, indent=2)
-    
+
     print(f"\n📁 所有結果保存在 'results/' 目錄中")
     print("接下來運行數據分析和圖表生成腳本:")
     print("python3 compare_mesi_configs.py")
+    print("python3 throughput_report.py    # 模擬器主機吞吐量")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
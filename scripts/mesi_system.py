@@ -1,43 +1,261 @@
 # File: configs/scripts/mesi_cnn_system.py
 import m5
 from m5.objects import *
+import argparse
+import itertools
+import json
+import math
+import random
 import sys
 import os
+from m5.util.convert import toMemorySize, toLatency
 
 # 添加路徑
 gem5_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(os.path.join(gem5_root, 'config'))
 
-from cache_config import L1Cache, L1ICache, L1DCache, L2Cache
+from cache_config import (L1Cache, L1ICache, L1DCache, L2Cache, configure_cache,
+                          REPLACEMENT_POLICIES, PREFETCHERS)
+from ruby_config import NETWORKS, TOPOLOGIES, validate_ruby_config, build_ruby_system
+
+# 默認配置（中等緩存），可通過 --config JSON 文件或命令行參數覆蓋
+DEFAULT_CONFIG = {
+    'name': 'RISCV_MESI_CNN',
+    'num_cores': 2,
+    'l1_size': '32kB',
+    'l1_assoc': 4,
+    'l2_size': '512kB',
+    'l2_assoc': 8,
+    'l2_banks': 1,
+    # 緩存幾何、延遲（週期）、替換策略和預取器（預取器只加在L1D和L2上）
+    'l1_mshrs': 4,
+    'l1_tgts_per_mshr': 20,
+    'l1_tag_latency': 2,
+    'l1_data_latency': 2,
+    'l1_response_latency': 2,
+    'l1_replacement': 'lru',
+    'l1_prefetcher': 'none',
+    'l1_prefetch_degree': 1,
+    'l2_mshrs': 20,
+    'l2_tgts_per_mshr': 12,
+    'l2_tag_latency': 20,
+    'l2_data_latency': 20,
+    'l2_response_latency': 20,
+    'l2_replacement': 'lru',
+    'l2_prefetcher': 'none',
+    'l2_prefetch_degree': 1,
+    # 內存系統: classic（經典緩存+總線）或 ruby（MESI_Two_Level控制器+片上網絡，見 config/ruby_config.py）
+    'memory_system': 'classic',
+    'ruby_network': 'simple',
+    'ruby_topology': 'crossbar',
+    'ruby_mesh_rows': 0,
+    'ruby_link_latency': 1,
+    'ruby_router_latency': 1,
+    'clock': '3GHz',
+    'workload': 'cnn_test',
+    'accel_tile_size': '4kB',
+    'accel_outstanding': 8,
+    'accel_macs_per_cycle': 64,
+    'accel_double_buffer': True,
+    'checkpoint_dir': None,
+    'restore_dir': None,
+    'warmup': '0ns',
+    # 快進和採樣模擬（見 run_sampled()）：快進部分用AtomicSimpleCPU，詳細窗口切換到TimingSimpleCPU
+    'fast_forward': 'none',
+    'sampling': 'none',
+    'sample_interval': 10000000,
+    'sample_warmup': 100000,
+    'sample_length': 1000000,
+    'simpoint_file': None,
+    'simpoint_weights': None,
+    'seed': 0
+}
+
+MAX_CORES = 64
+MEMORY_SYSTEMS = ('classic', 'ruby')
+ROI_WORK_ID = 0
+
+# 工作負載階段標記的work id（與 m5_markers.h 保持一致）
+PHASE_NAMES = {
+    1: 'convolution',
+    2: 'pooling',
+    3: 'statistics',
+    4: 'memory_stress',
+    5: 'false_sharing',
+    6: 'true_sharing'
+}
+PHASES_FILE = 'phases.json'
+# 生成檢查點時各階段中的核心數，恢復後從這裡繼續跟蹤階段（與m5.cpt放在同一目錄）
+PHASE_STATE_FILE = 'phase_state.json'
+
+# 採樣模式: periodic（每sample_interval條指令測量一個窗口）、simpoint（按SimPoint工具選出的區間）、
+# profile（整個程序用atomic模式運行並輸出SimPoint的BBV，不測量）
+SAMPLING_MODES = ('none', 'periodic', 'simpoint', 'profile')
+SAMPLES_FILE = 'samples.json'
+INST_STOP_CAUSE = 'sample instruction limit'
+
+CACHE_LINE_SIZE = 64  # 與System.cache_line_size默認值一致
+
+# seed非0時每個進程的擾動範圍（見 m5_markers.h 中的 m5_perturb）
+MAX_LAYOUT_PAD = 64 * 1024
+MAX_STACK_PAD = 4096
+MAX_START_DELAY = 20000
+
+def resolve_workload(workload):
+    """解析工作負載，返回 (程序路徑, 是否多線程)
+
+    workload_gen.py 登記的名稱解析為生成的程序，否則按路徑處理：
+    絕對/相對路徑優先，否則在gem5根目錄下查找
+    """
+    sys.path.insert(0, gem5_root)
+    from workload_gen import load_registry, workload_binary
+
+    registry = load_registry(os.path.join(gem5_root, 'config', 'workloads.json'))
+    if workload in registry:
+        binary = workload_binary(workload, os.path.join(gem5_root, 'workloads', 'bin'))
+        return binary, registry[workload].get('threaded', False)
+    if os.path.exists(workload):
+        return os.path.abspath(workload), False
+    return os.path.join(gem5_root, workload), False
+
+def perturbation_env(seed, index):
+    """第index個進程的擾動環境變量：seed為0時不擾動，否則由 (seed, index) 確定地生成
+
+    隨機化堆/mmap起始地址（M5_LAYOUT_PAD）、棧地址（環境變量長度）和進入ROI前的空轉時間，
+    使同一配置的多次重複運行得到不同的內存佈局和核心間相對時序
+    """
+    if not seed:
+        return []
+    rng = random.Random(f"{seed}/{index}")
+    return [f"M5_LAYOUT_PAD={rng.randrange(0, MAX_LAYOUT_PAD, 16)}",
+            f"M5_START_DELAY={rng.randrange(MAX_START_DELAY)}",
+            "M5_STACK_PAD=" + "x" * rng.randrange(0, MAX_STACK_PAD, 16)]
+
+def fast_forward_target(value):
+    """解析fast_forward: 'none' → None，'roi'或階段名 → ('marker', work id)，指令數 → ('insts', n)"""
+    value = str(value)
+    if value == 'none':
+        return None
+    if value == 'roi':
+        return ('marker', ROI_WORK_ID)
+    for work_id, name in PHASE_NAMES.items():
+        if value == name:
+            return ('marker', work_id)
+    if value.isdigit() and int(value) > 0:
+        return ('insts', int(value))
+    raise ValueError(f"未知的快進目標: {value} (可選: none、roi、{'、'.join(PHASE_NAMES.values())} 或指令數)")
+
+def uses_atomic(config):
+    """快進或採樣時從AtomicSimpleCPU開始運行"""
+    return config['fast_forward'] != 'none' or config['sampling'] != 'none'
+
+def starting_cpus(system, config):
+    """開始運行（連接緩存端口）的CPU；快進/採樣時TimingSimpleCPU先處於switched out狀態"""
+    return system.atomic_cpu if uses_atomic(config) else system.cpu
+
+def validate_config(config):
+    """檢查核心數、L2分片數、內存系統和快進/採樣配置是否在支持範圍內"""
+    if not 1 <= config['num_cores'] <= MAX_CORES:
+        raise ValueError(f"num_cores必須在1到{MAX_CORES}之間: {config['num_cores']}")
+
+    banks = config['l2_banks']
+    if banks < 1 or banks & (banks - 1):
+        raise ValueError(f"l2_banks必須是2的冪: {banks}")
+
+    if config['memory_system'] not in MEMORY_SYSTEMS:
+        raise ValueError(f"未知的內存系統: {config['memory_system']} (可選: {', '.join(MEMORY_SYSTEMS)})")
+    if config['memory_system'] == 'ruby':
+        validate_ruby_config(config)
+
+    sampling = config['sampling']
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"未知的採樣模式: {sampling} (可選: {', '.join(SAMPLING_MODES)})")
+    fast_forward_target(config['fast_forward'])
+    if not uses_atomic(config):
+        return
+
+    # atomic模式的快進不支持Ruby，也不與ROI檢查點同時使用
+    if config['memory_system'] == 'ruby':
+        raise ValueError("快進和採樣模式需要atomic內存模式，Ruby內存系統不支持")
+    if config['checkpoint_dir'] or config['restore_dir']:
+        raise ValueError("快進和採樣模式不能與checkpoint_dir/restore_dir同時使用")
+    if config['sample_interval'] <= 0 or config['sample_length'] <= 0 or config['sample_warmup'] < 0:
+        raise ValueError("sample_interval和sample_length必須為正數，sample_warmup不能為負數")
+    if sampling == 'periodic' and config['sample_warmup'] + config['sample_length'] > config['sample_interval']:
+        raise ValueError(f"sample_warmup + sample_length 不能超過 sample_interval: "
+                         f"{config['sample_warmup']} + {config['sample_length']} > {config['sample_interval']}")
+    # SimPoint的區間從程序開始計數
+    if sampling in ('simpoint', 'profile') and config['fast_forward'] != 'none':
+        raise ValueError(f"{sampling} 採樣不能與fast_forward同時使用")
+    if sampling == 'simpoint' and not (config['simpoint_file'] and config['simpoint_weights']):
+        raise ValueError("simpoint採樣需要simpoint_file和simpoint_weights（SimPoint工具的輸出）")
+
+def l2_bank_ranges(mem_range, num_banks, block_size):
+    """按緩存行交織地址，為每個L2分片生成一個AddrRange"""
+    intlv_bits = int(math.log2(num_banks))
+    intlv_low_bit = int(math.log2(block_size))
+    return [AddrRange(mem_range.start,
+                      size=mem_range.size(),
+                      intlvHighBit=intlv_low_bit + intlv_bits - 1,
+                      intlvBits=intlv_bits,
+                      intlvMatch=i)
+            for i in range(num_banks)]
+
+def build_l2(system, config):
+    """構建L2：l2_banks為1時是單個共享L2，否則按地址交織分成多個分片"""
+    banks = config['l2_banks']
+    if banks == 1:
+        system.l2cache = L2Cache()
+        configure_cache(system.l2cache, config, 'l2')
+        system.l2cache.cpu_side = system.l2bus.mem_side_ports
+        system.l2cache.mem_side = system.membus.cpu_side_ports
+        return
+
+    # 每個分片容量為總容量的1/banks，L2XBar按地址範圍路由到對應分片
+    bank_size = f"{toMemorySize(config['l2_size']) // banks}B"
+    ranges = l2_bank_ranges(system.mem_ranges[0], banks, CACHE_LINE_SIZE)
+    system.l2cache = [L2Cache() for _ in range(banks)]
+    for i, bank in enumerate(system.l2cache):
+        configure_cache(bank, config, 'l2')
+        bank.size = bank_size
+        bank.addr_ranges = [ranges[i]]
+        bank.cpu_side = system.l2bus.mem_side_ports
+        bank.mem_side = system.membus.cpu_side_ports
 
 def build_system(config):
+    validate_config(config)
+
     system = System()
     system.clk_domain = SrcClockDomain()
-    system.clk_domain.clock = '3GHz'
+    system.clk_domain.clock = config['clock']
     system.clk_domain.voltage_domain = VoltageDomain()
     
-    system.mem_mode = 'timing'
+    atomic = uses_atomic(config)
+    system.mem_mode = 'atomic' if atomic else 'timing'
+    # 工作負載的ROI標記（m5_markers.h）使m5.simulate()返回，由run_until_exit()處理
+    system.exit_on_work_items = True
     system.mem_ranges = [AddrRange('2GB')]
 
     # 關鍵修正：添加RISC-V SEWorkload
     system.workload = RiscvEmuLinux()
 
-    # 記憶體配置
-    system.membus = SystemXBar()
+    # 記憶體配置（端口由緩存層次連接）
     system.mem_ctrl = MemCtrl()
     system.mem_ctrl.dram = DDR3_1600_8x8()
     system.mem_ctrl.dram.range = system.mem_ranges[0]
-    system.mem_ctrl.port = system.membus.mem_side_ports
 
-    # CPU配置
-    system.cpu = [TimingSimpleCPU(cpu_id=i) for i in range(config['num_cores'])]
+    # CPU配置（快進/採樣時system.cpu在詳細窗口中才切換進來，見 run_sampled()）
+    system.cpu = [TimingSimpleCPU(cpu_id=i, switched_out=atomic) for i in range(config['num_cores'])]
+    if atomic:
+        system.atomic_cpu = [AtomicSimpleCPU(cpu_id=i) for i in range(config['num_cores'])]
+    cpus = starting_cpus(system, config)
     
     # 关键修正：为RISC-V CPU添加中断控制器
-    for i, cpu in enumerate(system.cpu):
+    for cpu in list(system.cpu) + (list(system.atomic_cpu) if atomic else []):
         cpu.interrupts = [RiscvInterrupts()]
     
     # 關鍵修正：使用CNN測試程序
-    cnn_test_path = os.path.join(gem5_root, 'cnn_test')
+    cnn_test_path, threaded = resolve_workload(config['workload'])
     if not os.path.exists(cnn_test_path):
         print(f"Warning: CNN test program not found at {cnn_test_path}")
         print("Please compile cnn_test.c first!")
@@ -46,69 +264,411 @@ def build_system(config):
     print(f"Using CNN test program: {cnn_test_path}")
     
     # 為每個CPU分配CNN工作負載
-    for i, cpu in enumerate(system.cpu):
+    if threaded:
+        # 多線程工作負載：所有CPU共享一個進程，pthread線程由SE模式的clone分配到空閒CPU
         process = Process()
-        process.cmd = [cnn_test_path]
-        process.pid = 100 + i  # 为每个进程分配不同的PID
-        cpu.workload = process
-        cpu.createThreads()
+        process.cmd = [cnn_test_path, str(config['num_cores'])]
+        process.pid = 100
+        process.env = perturbation_env(config['seed'], 0)
+        for cpu in cpus:
+            cpu.workload = process
+            cpu.createThreads()
+    else:
+        for i, cpu in enumerate(cpus):
+            process = Process()
+            process.cmd = [cnn_test_path]
+            process.pid = 100 + i  # 为每个进程分配不同的PID
+            process.env = perturbation_env(config['seed'], i)
+            cpu.workload = process
+            cpu.createThreads()
+
+    if atomic:
+        # 切換時TimingSimpleCPU接管atomic CPU的線程狀態，兩者共享進程和ISA
+        for cpu, atomic_cpu in zip(system.cpu, system.atomic_cpu):
+            cpu.workload = atomic_cpu.workload
+            cpu.isa = atomic_cpu.isa
+            cpu.createThreads()
+        if config['sampling'] == 'profile':
+            # 核心0每sample_interval條指令輸出一個基本塊向量（m5out/simpoint.bb.gz）
+            system.atomic_cpu[0].addSimPointProbe(config['sample_interval'])
     
+    # CNN加速器配置（端口由緩存層次連接）
+    system.cnn_accel = CNNAccelerator()
+    system.cnn_accel.tile_size = config['accel_tile_size']
+    system.cnn_accel.max_outstanding = config['accel_outstanding']
+    system.cnn_accel.macs_per_cycle = config['accel_macs_per_cycle']
+    system.cnn_accel.double_buffer = config['accel_double_buffer']
+
+    if config['memory_system'] == 'ruby':
+        build_ruby_system(system, config, CACHE_LINE_SIZE)
+    else:
+        build_classic_hierarchy(system, config)
+    return system
+
+def build_classic_hierarchy(system, config):
+    """經典緩存層次：每核私有L1I/L1D，經L2XBar連接共享（或分片）L2，再經SystemXBar連接內存"""
+    system.membus = SystemXBar()
+    system.mem_ctrl.port = system.membus.mem_side_ports
+
     # Cache配置
     system.l1_icache = [L1ICache() for _ in range(config['num_cores'])]
     system.l1_dcache = [L1DCache() for _ in range(config['num_cores'])]
-    system.l2cache = L2Cache()
     system.l2bus = L2XBar()
     
-    # 連接組件
+    # 連接組件（CPU切換時端口連接由新的CPU接管）
+    cpus = starting_cpus(system, config)
     for i in range(config['num_cores']):
-        system.l1_icache[i].size = config['l1_size']
-        system.l1_dcache[i].size = config['l1_size']
+        configure_cache(system.l1_icache[i], config, 'l1', prefetch=False)
+        configure_cache(system.l1_dcache[i], config, 'l1')
         
-        system.cpu[i].icache_port = system.l1_icache[i].cpu_side
-        system.cpu[i].dcache_port = system.l1_dcache[i].cpu_side
+        cpus[i].icache_port = system.l1_icache[i].cpu_side
+        cpus[i].dcache_port = system.l1_dcache[i].cpu_side
         
         system.l1_icache[i].mem_side = system.l2bus.cpu_side_ports
         system.l1_dcache[i].mem_side = system.l2bus.cpu_side_ports
 
-    system.l2cache.size = config['l2_size']
-    system.l2cache.assoc = config['l2_assoc']
-    system.l2cache.cpu_side = system.l2bus.mem_side_ports
-    system.l2cache.mem_side = system.membus.cpu_side_ports
+    build_l2(system, config)
 
-    # CNN加速器配置
-    system.cnn_accel = CNNAccelerator()
     system.cnn_accel.cache_port = system.membus.cpu_side_ports
     system.cnn_accel.dma_port = system.membus.cpu_side_ports
-
     system.system_port = system.membus.cpu_side_ports
-    return system
 
-def main():
-    config = {
-        'name': 'RISCV_MESI_CNN',
-        'num_cores': 2, 
-        'l1_size': '32kB', 
-        'l1_assoc': 4, 
-        'l2_size': '512kB', 
-        'l2_assoc': 8
-    }
+def parse_config(defaults=DEFAULT_CONFIG):
+    """從 --config JSON 文件和命令行參數解析運行配置（命令行優先）"""
+    parser = argparse.ArgumentParser(description='CNN MESI system')
+    parser.add_argument('--config', help='JSON配置文件（例如runner生成的run_config.json）')
+    parser.add_argument('--name')
+    parser.add_argument('--num-cores', type=int)
+    parser.add_argument('--l1-size')
+    parser.add_argument('--l1-assoc', type=int)
+    parser.add_argument('--l2-size')
+    parser.add_argument('--l2-assoc', type=int)
+    parser.add_argument('--l2-banks', type=int, help='L2分片數（2的冪，默認1即單個共享L2）')
+    for level in ('l1', 'l2'):
+        parser.add_argument(f'--{level}-mshrs', type=int)
+        parser.add_argument(f'--{level}-tgts-per-mshr', type=int)
+        parser.add_argument(f'--{level}-tag-latency', type=int)
+        parser.add_argument(f'--{level}-data-latency', type=int)
+        parser.add_argument(f'--{level}-response-latency', type=int)
+        parser.add_argument(f'--{level}-replacement', choices=list(REPLACEMENT_POLICIES))
+        parser.add_argument(f'--{level}-prefetcher', choices=list(PREFETCHERS))
+        parser.add_argument(f'--{level}-prefetch-degree', type=int)
+    parser.add_argument('--memory-system', choices=MEMORY_SYSTEMS,
+                        help='classic（經典緩存層次）或 ruby（MESI_Two_Level，需要對應編譯的gem5）')
+    parser.add_argument('--ruby-network', choices=list(NETWORKS), help='Ruby片上網絡模型')
+    parser.add_argument('--ruby-topology', choices=TOPOLOGIES, help='Ruby網絡拓撲')
+    parser.add_argument('--ruby-mesh-rows', type=int, help='mesh行數（0表示接近正方形）')
+    parser.add_argument('--ruby-link-latency', type=int, help='Ruby鏈路延遲（週期）')
+    parser.add_argument('--ruby-router-latency', type=int, help='Ruby路由器延遲（週期）')
+    parser.add_argument('--clock')
+    parser.add_argument('--workload')
+    parser.add_argument('--accel-tile-size', help='加速器每個tile的輸入字節數')
+    parser.add_argument('--accel-outstanding', type=int, help='加速器每次傳輸的最大在途請求數')
+    parser.add_argument('--accel-macs-per-cycle', type=int, help='加速器每週期MAC數')
+    parser.add_argument('--checkpoint-dir', help='所有核心進入ROI時在此目錄生成檢查點並退出')
+    parser.add_argument('--restore-dir', help='從該檢查點恢復（緩存為冷狀態）')
+    parser.add_argument('--warmup', help='恢復後先運行的預熱時間（例如 50us），之後重置統計')
+    parser.add_argument('--fast-forward',
+                        help='先用atomic CPU快進: roi、階段名（例如convolution）或核心0的指令數')
+    parser.add_argument('--sampling', choices=SAMPLING_MODES, help='採樣模擬模式')
+    parser.add_argument('--sample-interval', type=int, help='採樣週期/SimPoint區間長度（核心0指令數）')
+    parser.add_argument('--sample-warmup', type=int, help='每個窗口測量前的詳細預熱指令數')
+    parser.add_argument('--sample-length', type=int, help='periodic採樣每個窗口測量的指令數')
+    parser.add_argument('--simpoint-file', help='SimPoint工具輸出的 .simpts 文件')
+    parser.add_argument('--simpoint-weights', help='SimPoint工具輸出的 .weights 文件')
+    parser.add_argument('--seed', type=int,
+                        help='重複運行的擾動種子（內存佈局、起始時間和gem5隨機數），0表示不擾動')
+    parser.add_argument('--accel-single-buffer', dest='accel_double_buffer',
+                        action='store_false', default=None,
+                        help='關閉加速器雙緩衝（計算與訪存串行）')
+    args = parser.parse_args()
+
+    config = dict(defaults)
+    if args.config:
+        with open(args.config, 'r') as f:
+            config.update(json.load(f))
+
+    for key in DEFAULT_CONFIG:
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+
+    return config
+
+def phase_label(active):
+    """當前正在運行的階段名（多個核心處於不同階段時用 + 連接），不在任何階段時為 'none'"""
+    names = [PHASE_NAMES[work_id] for work_id in sorted(active) if active[work_id] > 0]
+    return '+'.join(names) or 'none'
+
+def load_phase_state(checkpoint_dir):
+    """讀取檢查點時每個階段中的核心數 {work id: 數量}，沒有記錄時全為0"""
+    active = {work_id: 0 for work_id in PHASE_NAMES}
+    state_file = os.path.join(checkpoint_dir, PHASE_STATE_FILE)
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            active.update({int(work_id): count for work_id, count in json.load(f).items()})
+    return active
+
+def run_until_exit(config, active=None):
+    """運行模擬直到程序退出
+
+    work item標記在每個核心進入/離開ROI和各階段時返回到這裡。設置了checkpoint_dir時，
+    所有核心都進入ROI後生成檢查點並停止（較早進入ROI的核心可能已經在某個階段中，
+    這些階段狀態記錄在檢查點旁，恢復時從中繼續）；設置了warmup時，先運行預熱時間再重置統計，
+    使統計只覆蓋預熱之後的部分（緩存由預熱窗口填充）。
+
+    正在運行的階段集合每次改變時dump一次統計（累計值，不重置），退出時gem5再dump一次，
+    因此最後一次dump仍是整個運行的統計。每次dump結束的階段記錄在 phases.json 中，
+    compare_mesi_configs.py 對相鄰dump做差分得到每個階段的指標。active為開始時每個階段中的
+    核心數（快進結束時的狀態），默認從恢復的檢查點讀取或全為0。
+    """
+    warmup_end = None
+    warmup_ticks = m5.ticks.fromSeconds(toLatency(config['warmup']))
+    if warmup_ticks:
+        warmup_end = m5.curTick() + warmup_ticks
+
+    roi_entered = 0
+    if active is None and config['restore_dir']:
+        active = load_phase_state(config['restore_dir'])
+    elif active is None:
+        active = {work_id: 0 for work_id in PHASE_NAMES}
+    label = phase_label(active)
+    phases = []
+
+    while True:
+        if warmup_end is not None:
+            exit_event = m5.simulate(warmup_end - m5.curTick())
+        else:
+            exit_event = m5.simulate()
+        cause = exit_event.getCause()
+
+        if warmup_end is not None and m5.curTick() >= warmup_end:
+            print(f"預熱結束 (tick {m5.curTick()})，重置統計")
+            m5.stats.reset()
+            warmup_end = None
+            if cause == 'simulate() limit reached':
+                continue
+
+        if cause not in ('workbegin', 'workend'):
+            break
+
+        work_id = exit_event.getCode()
+        if cause == 'workbegin' and work_id == ROI_WORK_ID:
+            roi_entered += 1
+            if config['checkpoint_dir'] and roi_entered == config['num_cores']:
+                print(f"所有核心已進入ROI，生成檢查點: {config['checkpoint_dir']}")
+                m5.checkpoint(config['checkpoint_dir'])
+                with open(os.path.join(config['checkpoint_dir'], PHASE_STATE_FILE), 'w') as f:
+                    json.dump(active, f, indent=2)
+                return exit_event
+
+        if work_id in active:
+            active[work_id] += 1 if cause == 'workbegin' else -1
+            new_label = phase_label(active)
+            if new_label != label:
+                # 預熱期間只跟蹤階段，不輸出統計
+                if warmup_end is None:
+                    m5.stats.dump()
+                    phases.append({'phase': label, 'end_tick': m5.curTick()})
+                label = new_label
+
+    # 退出時gem5輸出的最後一次dump；沒有階段標記時寫入空列表，覆蓋舊運行留下的文件
+    if phases:
+        phases.append({'phase': label, 'end_tick': m5.curTick()})
+    with open(os.path.join(m5.options.outdir, PHASES_FILE), 'w') as f:
+        json.dump(phases, f, indent=2)
+    return exit_event
+
+def write_output(filename, data):
+    with open(os.path.join(m5.options.outdir, filename), 'w') as f:
+        json.dump(data, f, indent=2)
+
+def switch_cpus(system, to_timing):
+    """排空系統後在AtomicSimpleCPU和TimingSimpleCPU之間切換（內存模式隨之切換），返回切換後的CPU"""
+    old, new = (system.atomic_cpu, system.cpu) if to_timing else (system.cpu, system.atomic_cpu)
+    m5.drain()
+    m5.switchCpus(system, list(zip(old, new)), verbose=False)
+    return new
+
+def run_insts(cpu, insts=None):
+    """在cpu（核心0）上再運行insts條指令（None表示直到程序退出），忽略ROI和階段標記
+
+    返回 (核心0實際運行的指令數, 退出事件)；insts為0時不運行，退出事件為None
+    """
+    start = cpu.getCurrentInstCount(0)
+    if insts == 0:
+        return 0, None
+    if insts is not None:
+        cpu.scheduleInstStop(0, insts, INST_STOP_CAUSE)
+    while True:
+        exit_event = m5.simulate()
+        if exit_event.getCause() not in ('workbegin', 'workend'):
+            return cpu.getCurrentInstCount(0) - start, exit_event
+
+def run_to_marker(cpu, config, work_id):
+    """運行到work id的標記：ROI要等所有核心都進入，階段只要第一個核心進入
+
+    途經的階段標記照常計數，返回 (核心0運行的指令數, 退出事件, 每個階段中的核心數)，
+    之後的run_until_exit()從這個階段狀態繼續；程序在此之前退出時退出事件不是workbegin
+    """
+    start = cpu.getCurrentInstCount(0)
+    needed = config['num_cores'] if work_id == ROI_WORK_ID else 1
+    entered = 0
+    active = {phase_id: 0 for phase_id in PHASE_NAMES}
+    while True:
+        exit_event = m5.simulate()
+        cause = exit_event.getCause()
+        if cause not in ('workbegin', 'workend'):
+            break
+        code = exit_event.getCode()
+        if code in active:
+            active[code] += 1 if cause == 'workbegin' else -1
+        if cause == 'workbegin' and code == work_id:
+            entered += 1
+            if entered == needed:
+                break
+    return cpu.getCurrentInstCount(0) - start, exit_event, active
+
+def program_exited(exit_event):
+    return exit_event is not None and exit_event.getCause() != INST_STOP_CAUSE
+
+def load_simpoints(simpoint_file, weights_file):
+    """讀取SimPoint工具的輸出，返回按區間排序的 [(區間序號, 權重), ...]
+
+    .simpts 每行為 '<區間序號> <簇號>'，.weights 每行為 '<權重> <簇號>'
+    """
+    with open(weights_file, 'r') as f:
+        weights = {int(cluster): float(weight)
+                   for weight, cluster in (line.split() for line in f if line.strip())}
+    with open(simpoint_file, 'r') as f:
+        points = [(int(index), weights[int(cluster)])
+                  for index, cluster in (line.split() for line in f if line.strip())]
+    return sorted(points)
+
+def sample_windows(config, base):
+    """按採樣模式生成測量窗口 (開始指令數, 權重, 測量指令數)，指令數為核心0從程序開始的計數"""
+    interval = config['sample_interval']
+    if config['sampling'] == 'periodic':
+        # 每個週期的開頭測量，週期內其餘部分快進
+        return ((base + k * interval, 1.0, config['sample_length']) for k in itertools.count())
+    return [(index * interval, weight, interval)
+            for index, weight in load_simpoints(config['simpoint_file'], config['simpoint_weights'])]
+
+def run_sampled(system, config):
+    """快進/採樣模式的運行（以核心0的提交指令數為準）
+
+    先用AtomicSimpleCPU快進到fast_forward指定的位置。不採樣時之後切換到TimingSimpleCPU、
+    重置統計並按run_until_exit()詳細運行到結束。periodic/simpoint採樣對每個窗口：atomic運行到
+    窗口前sample_warmup條指令處，切換到timing預熱（填充緩存和預測器狀態），重置統計後測量窗口
+    並dump一次，再切回atomic。第i次dump對應samples.json中的第i個窗口，results_store.py
+    按窗口權重和 區域指令數/窗口指令數 外推到整個區域；程序在窗口中途退出時丟棄該窗口。
+    profile只用atomic運行整個程序並輸出SimPoint的BBV。
+    """
+    mode = config['sampling']
+    cpus = system.atomic_cpu
+    position = 0
+    exit_event = None
+    active = None
+
+    target = fast_forward_target(config['fast_forward'])
+    if target is not None:
+        kind, value = target
+        if kind == 'marker':
+            executed, exit_event, active = run_to_marker(cpus[0], config, value)
+            reached = exit_event.getCause() == 'workbegin'
+        else:
+            executed, exit_event = run_insts(cpus[0], value)
+            reached = exit_event.getCause() == INST_STOP_CAUSE
+        position += executed
+        if not reached:
+            print(f"⚠️  程序在快進到 {config['fast_forward']} 之前退出")
+            write_output(PHASES_FILE, [])
+            write_output(SAMPLES_FILE, {'mode': mode, 'fast_forward_insts': position,
+                                        'region_insts': 0, 'windows': []})
+            return exit_event
+        print(f"快進結束: 核心0已運行 {position:,} 條指令 (tick {m5.curTick()})")
+
+    base = position
+    windows = []
+    if mode == 'none':
+        cpus = switch_cpus(system, to_timing=True)
+        m5.stats.reset()
+        start = cpus[0].getCurrentInstCount(0)
+        exit_event = run_until_exit(config, active)
+        position += cpus[0].getCurrentInstCount(0) - start
+    elif mode == 'profile':
+        executed, exit_event = run_insts(cpus[0])
+        position += executed
+    else:
+        warmup = config['sample_warmup']
+        for start, weight, length in sample_windows(config, base):
+            # 快進到預熱開始處（與上一個窗口重疊時從當前位置開始預熱）
+            executed, exit_event = run_insts(cpus[0], max(start - warmup - position, 0))
+            position += executed
+            if program_exited(exit_event):
+                break
+            cpus = switch_cpus(system, to_timing=True)
+            executed, exit_event = run_insts(cpus[0], max(start - position, 0))
+            position += executed
+            if program_exited(exit_event):
+                break
+
+            m5.stats.reset()
+            executed, exit_event = run_insts(cpus[0], length)
+            position += executed
+            if program_exited(exit_event):
+                print(f"程序在第 {len(windows) + 1} 個窗口中途退出，丟棄該窗口")
+                break
+            m5.stats.dump()
+            windows.append({'start_inst': position - executed, 'insts': executed, 'weight': weight})
+            print(f"採樣窗口 {len(windows)}: 指令 {position - executed:,} - {position:,} (權重 {weight:g})")
+            cpus = switch_cpus(system, to_timing=False)
+        else:
+            # 所有SimPoint測量完後運行到程序結束，得到整個程序的指令數
+            executed, exit_event = run_insts(cpus[0])
+            position += executed
+
+    # 採樣運行的dump是各窗口而不是階段；不採樣時phases.json由run_until_exit()寫入
+    if mode != 'none':
+        write_output(PHASES_FILE, [])
+    write_output(SAMPLES_FILE, {'mode': mode, 'fast_forward_insts': base,
+                                'region_insts': position - base, 'windows': windows})
+    return exit_event
+
+def main(defaults=DEFAULT_CONFIG):
+    config = parse_config(defaults)
     
     print(f"Running CNN MESI test: {config['name']}")
     
     system = build_system(config)
     root = Root(full_system=False, system=system)
     
-    m5.instantiate()
+    if config['seed']:
+        # 影響gem5內部的隨機選擇（例如隨機替換策略）
+        m5.core.seedRandom(config['seed'])
+        print(f"擾動種子: {config['seed']}")
+
+    if config['restore_dir']:
+        print(f"從檢查點恢復: {config['restore_dir']}")
+    m5.instantiate(config['restore_dir'])
     
     print(f"開始CNN MESI協議模擬...")
     print(f"CPU核心數: {config['num_cores']}")
-    print(f"L1 Cache大小: {config['l1_size']}")
-    print(f"L2 Cache大小: {config['l2_size']}")
+    print(f"L1 Cache大小: {config['l1_size']} ({config['l1_assoc']}-way)")
+    print(f"L2 Cache大小: {config['l2_size']} ({config['l2_assoc']}-way, {config['l2_banks']} bank)")
+    print(f"替換策略: L1 {config['l1_replacement']}, L2 {config['l2_replacement']}；"
+          f"預取器: L1D {config['l1_prefetcher']}, L2 {config['l2_prefetcher']}")
+    if config['memory_system'] == 'ruby':
+        print(f"內存系統: Ruby MESI_Two_Level ({config['ruby_network']} 網絡, {config['ruby_topology']} 拓撲)")
+    if uses_atomic(config):
+        print(f"快進: {config['fast_forward']}；採樣: {config['sampling']}")
     print("MESI協議狀態監控將自動啟動...")
     
-    exit_event = m5.simulate()
+    if uses_atomic(config):
+        exit_event = run_sampled(system, config)
+    else:
+        exit_event = run_until_exit(config)
     print(f"CNN模擬結束，原因: {exit_event.getCause()}")
 
 if __name__ == "__m5_main__":
     main()
-
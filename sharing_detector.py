@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+跨核心的假共享/真共享檢測
+
+從Cache調試跟蹤（文本、.gz / .zst 或 .ctrace）中取出每核L1D的訪問和失效，按緩存行彙總:
+  - 每個核心讀/寫了行內的哪些字節
+  - 所有權轉移次數（同一行上相鄰兩次寫來自不同核心）
+  - 各核L1D中該行被偵聽失效的次數（`handleSnoop` 的舊狀態有效、新狀態為I，見 cache_trace.py）
+並把被多個核心訪問的行分類:
+  - private:      只有一個核心訪問
+  - read_shared:  多個核心只讀
+  - true_shared:  某個字節被一個核心寫、被另一個核心訪問（真正的數據交換）
+  - false_shared: 有核心寫，但各核心訪問的字節互不重疊（只因同處一行而互相失效）
+共享行按失效次數和所有權轉移次數排序。
+
+給出工作負載的ELF時，按符號表把行地址歸屬到全局變量。gem5 SE模式下緩存看到的是物理地址，
+需要同時給出一個檢查點（m5.cpt，其中保存了每個進程的頁表）把物理地址轉換回虛擬地址。
+注意cnn_test在每個核心上運行獨立的進程，核心之間沒有共享內存；要觀察共享，
+使用 workload_gen.py 生成的多線程工作負載（例如 cnn_mt_sharing）。
+"""
+
+import re
+import sys
+import json
+import struct
+import configparser
+import numpy as np
+
+from cache_trace import iter_cache_events
+from mesi_model import WRITE_CMDS, DEFAULT_BLOCK_SIZE
+
+SHARING_CLASSES = ('private', 'read_shared', 'true_shared', 'false_shared')
+DEFAULT_TOP = 20
+DEFAULT_PAGE_SIZE = 4096
+
+_L1D_NAME_RE = re.compile(r'\.l1_dcache(\d*)$')
+
+def load_sharing_trace(path):
+    """提取每核L1D的訪問 {'tick', 'core', 'write', 'addr', 'size'} 和失效 {'tick', 'core', 'addr'}
+
+    失效為從有效狀態到I的transition事件，即另一個核心的寫請求引起的偵聽失效（gem5的填充行
+    新狀態總是有效的）
+    """
+    from trace_store import is_binary_trace, TraceFile, EVENT_KINDS, STATE_CODES
+
+    if is_binary_trace(path):
+        trace = TraceFile(path)
+        cores = np.full(len(trace.caches), -1, dtype=np.int32)
+        for c, cache in enumerate(trace.caches):
+            match = _L1D_NAME_RE.search(cache)
+            if match:
+                cores[c] = int(match.group(1) or 0)
+        writes = np.array([cmd in WRITE_CMDS for cmd in trace.cmds], dtype=bool)
+
+        events = trace.events
+        l1d = cores[events['cache']] >= 0
+        accesses = events[l1d & (events['kind'] == EVENT_KINDS.index('access'))]
+        invalid = STATE_CODES.index('I')
+        invalidations = events[l1d & (events['kind'] == EVENT_KINDS.index('transition')) &
+                               (events['state'] == invalid) &
+                               (events['old_state'] != invalid) & (events['old_state'] != 0)]
+        return ({
+            'tick': accesses['tick'].astype(np.int64),
+            'core': cores[accesses['cache']],
+            'write': writes[accesses['cmd']],
+            'addr': accesses['start'].astype(np.int64),
+            'size': (accesses['end'] - accesses['start'] + 1).astype(np.int64)
+        }, {
+            'tick': invalidations['tick'].astype(np.int64),
+            'core': cores[invalidations['cache']],
+            'addr': invalidations['start'].astype(np.int64)
+        })
+
+    accesses = {field: [] for field in ('tick', 'core', 'write', 'addr', 'size')}
+    invalidations = {field: [] for field in ('tick', 'core', 'addr')}
+    for event in iter_cache_events(path):
+        match = _L1D_NAME_RE.search(event.cache)
+        if not match:
+            continue
+        core = int(match.group(1) or 0)
+        if event.kind == 'access':
+            for field, value in zip(accesses, (event.tick, core, event.cmd in WRITE_CMDS, event.start,
+                                               event.end - event.start + 1)):
+                accesses[field].append(value)
+        elif event.kind == 'transition' and event.state == 'I' and event.old_state not in (None, 'I'):
+            for field, value in zip(invalidations, (event.tick, core, event.start)):
+                invalidations[field].append(value)
+
+    return ({field: np.array(values, dtype=bool if field == 'write' else np.int64)
+             for field, values in accesses.items()},
+            {field: np.array(values, dtype=np.int64) for field, values in invalidations.items()})
+
+def _byte_masks(offsets, sizes):
+    """行內字節範圍 [offset, offset + size) 的64位掩碼"""
+    sizes = np.minimum(sizes, 64 - offsets).astype(np.uint64)
+    ones = np.where(sizes >= 64, np.uint64(0xFFFFFFFFFFFFFFFF),
+                    np.left_shift(np.uint64(1), np.minimum(sizes, 63)) - np.uint64(1))
+    return np.left_shift(ones, offsets.astype(np.uint64))
+
+def _unpack_masks(masks, block_size):
+    """(n,) 掩碼 -> (n, block_size) 的字節矩陣"""
+    bits = np.unpackbits(masks.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    return bits[:, :block_size]
+
+def _group_starts(*keys):
+    """已排序鍵序列中每組的起點"""
+    change = np.zeros(len(keys[0]), dtype=bool)
+    if len(change):
+        change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+def detect_sharing(accesses, invalidations, block_size=DEFAULT_BLOCK_SIZE):
+    """按緩存行彙總訪問並分類，返回 {'summary': {類別: 行數}, 'lines': [...]}（只列出多核訪問的行）"""
+    if block_size > 64 or block_size & (block_size - 1):
+        raise ValueError(f"block_size必須是不超過64的2的冪: {block_size}")
+
+    addr = accesses['addr']
+    blocks = addr - addr % block_size
+    masks = _byte_masks(addr % block_size, accesses['size'])
+    write = accesses['write']
+    core = accesses['core']
+
+    # (行, 核心) 分組：每組的讀/寫字節掩碼和訪問次數
+    order = np.lexsort((core, blocks))
+    s_blocks, s_core, s_masks, s_write = blocks[order], core[order], masks[order], write[order]
+    starts = _group_starts(s_blocks, s_core)
+    if not len(starts):
+        return {'summary': {name: 0 for name in SHARING_CLASSES}, 'lines': []}
+    zero = np.uint64(0)
+    read_masks = np.bitwise_or.reduceat(np.where(s_write, zero, s_masks), starts)
+    write_masks = np.bitwise_or.reduceat(np.where(s_write, s_masks, zero), starts)
+    access_counts = np.add.reduceat(np.ones(len(order), dtype=np.int64), starts)
+    write_counts = np.add.reduceat(s_write.astype(np.int64), starts)
+    row_blocks, row_cores = s_blocks[starts], s_core[starts]
+
+    # 行分組
+    block_starts = _group_starts(row_blocks)
+    line_addrs = row_blocks[block_starts]
+    num_cores = np.diff(np.append(block_starts, len(row_blocks)))
+    line_writes = np.add.reduceat(write_counts, block_starts)
+    line_accesses = np.add.reduceat(access_counts, block_starts)
+
+    # 每個字節被多少個核心訪問/寫：某字節被寫且被至少兩個核心訪問即為真共享
+    accessed = _unpack_masks(read_masks | write_masks, block_size).astype(np.int32)
+    written = _unpack_masks(write_masks, block_size).astype(np.int32)
+    byte_access_cores = np.add.reduceat(accessed, block_starts, axis=0)
+    byte_write_cores = np.add.reduceat(written, block_starts, axis=0)
+    true_shared = np.any((byte_access_cores >= 2) & (byte_write_cores >= 1), axis=1)
+
+    classes = np.where(num_cores == 1, 0,
+                       np.where(line_writes == 0, 1, np.where(true_shared, 2, 3)))
+
+    # 所有權轉移：按 (行, tick) 排序的寫序列中相鄰兩次寫來自不同核心
+    w_order = np.lexsort((accesses['tick'][write], blocks[write]))
+    w_blocks, w_core = blocks[write][w_order], core[write][w_order]
+    moved = (w_blocks[1:] == w_blocks[:-1]) & (w_core[1:] != w_core[:-1])
+    transfers = np.bincount(np.searchsorted(line_addrs, w_blocks[1:][moved]), minlength=len(line_addrs))
+
+    inval_blocks = invalidations['addr'] - invalidations['addr'] % block_size
+    inval_blocks = inval_blocks[np.isin(inval_blocks, line_addrs)]
+    inval_counts = np.bincount(np.searchsorted(line_addrs, inval_blocks), minlength=len(line_addrs))
+
+    shared = np.flatnonzero(classes > 0)
+    ranked = shared[np.lexsort((-transfers[shared], -inval_counts[shared]))]
+    lines = []
+    for i in ranked:
+        rows = range(block_starts[i], block_starts[i] + num_cores[i])
+        lines.append({
+            'addr': int(line_addrs[i]),
+            'class': SHARING_CLASSES[classes[i]],
+            'cores': [int(row_cores[r]) for r in rows],
+            'accesses': int(line_accesses[i]),
+            'writes': int(line_writes[i]),
+            'invalidations': int(inval_counts[i]),
+            'ownership_transfers': int(transfers[i]),
+            'bytes': {int(row_cores[r]): {'read': format_byte_ranges(int(read_masks[r])),
+                                          'write': format_byte_ranges(int(write_masks[r])),
+                                          'accesses': int(access_counts[r])}
+                      for r in rows}
+        })
+
+    counts = np.bincount(classes, minlength=len(SHARING_CLASSES))
+    return {'summary': {name: int(n) for name, n in zip(SHARING_CLASSES, counts)}, 'lines': lines}
+
+def format_byte_ranges(mask):
+    """字節掩碼 -> '0-7,16-19'"""
+    ranges = []
+    offset = 0
+    while mask >> offset:
+        if not (mask >> offset) & 1:
+            offset += 1
+            continue
+        start = offset
+        while (mask >> offset) & 1:
+            offset += 1
+        ranges.append(f"{start}-{offset - 1}" if offset - 1 > start else str(start))
+    return ",".join(ranges)
+
+def load_symbols(elf_path):
+    """讀取ELF符號表中的數據對象，返回按地址排序的 (起始地址數組, 結束地址數組, 名稱列表)"""
+    with open(elf_path, 'rb') as f:
+        data = f.read()
+    if data[:4] != b'\x7fELF':
+        raise ValueError(f"不是ELF文件: {elf_path}")
+    is64 = data[4] == 2
+    endian = '<' if data[5] == 1 else '>'
+
+    if is64:
+        shoff, = struct.unpack_from(endian + 'Q', data, 0x28)
+        shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x3A)
+        section_format, symbol_format = 'IIQQQQIIQQ', 'IBBHQQ'
+    else:
+        shoff, = struct.unpack_from(endian + 'I', data, 0x20)
+        shentsize, shnum = struct.unpack_from(endian + 'HH', data, 0x2E)
+        section_format, symbol_format = 'IIIIIIIIII', 'IIIBBH'
+    sections = [struct.unpack_from(endian + section_format, data, shoff + i * shentsize)
+                for i in range(shnum)]
+
+    symbols = []
+    for _, sh_type, _, _, offset, size, link, _, _, entsize in sections:
+        if sh_type != 2:  # SHT_SYMTAB
+            continue
+        strtab_offset = sections[link][4]
+        for position in range(offset, offset + size, entsize):
+            fields = struct.unpack_from(endian + symbol_format, data, position)
+            if is64:
+                name, info, _, _, value, sym_size = fields
+            else:
+                name, value, sym_size, info, _, _ = fields
+            if info & 0xf != 1 or not sym_size:  # STT_OBJECT
+                continue
+            end = data.index(b'\0', strtab_offset + name)
+            symbols.append((value, value + sym_size, data[strtab_offset + name:end].decode(errors='replace')))
+
+    symbols.sort()
+    return (np.array([s[0] for s in symbols], dtype=np.int64),
+            np.array([s[1] for s in symbols], dtype=np.int64),
+            [s[2] for s in symbols])
+
+def load_page_map(checkpoint_file):
+    """從gem5檢查點（m5.cpt）中所有進程的頁表讀取 {物理頁地址: 虛擬頁地址}"""
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    parser.read(checkpoint_file)
+    page_map = {}
+    for section in parser.sections():
+        entry = parser[section]
+        if 'vaddr' in entry and 'paddr' in entry:
+            page_map[int(entry['paddr'], 0)] = int(entry['vaddr'], 0)
+    return page_map
+
+def attribute_lines(lines, symbols, block_size=DEFAULT_BLOCK_SIZE, page_map=None, page_size=DEFAULT_PAGE_SIZE):
+    """為每行加上 'vaddr' 和與之重疊的 'symbols'
+
+    符號從行之前開始時記為 '名稱+行起點在符號內的偏移'，從行內開始時記為 '名稱@行內偏移'
+    """
+    starts, ends, names = symbols
+    longest = int((ends - starts).max()) if len(starts) else 0
+    for line in lines:
+        vaddr = line['addr']
+        if page_map is not None:
+            page = page_map.get(vaddr - vaddr % page_size)
+            vaddr = None if page is None else page + vaddr % page_size
+        line['vaddr'] = vaddr
+        line['symbols'] = []
+        if vaddr is None:
+            continue
+        lo = np.searchsorted(starts, vaddr - longest, side='left')
+        hi = np.searchsorted(starts, vaddr + block_size, side='left')
+        for i in range(lo, hi):
+            if ends[i] > vaddr:
+                offset = vaddr - int(starts[i])
+                if offset > 0:
+                    line['symbols'].append(f"{names[i]}+{offset:#x}")
+                else:
+                    line['symbols'].append(f"{names[i]}@{-offset:#x}" if offset else names[i])
+    return lines
+
+def print_report(result, top=DEFAULT_TOP):
+    summary = result['summary']
+    print("緩存行分類: " + ", ".join(f"{name} {summary[name]:,}" for name in SHARING_CLASSES))
+    lines = result['lines'][:top]
+    if not lines:
+        print("沒有被多個核心訪問的緩存行")
+        return
+
+    print(f"\n{'行地址':>14} {'類別':<13} {'核心':<10} {'失效':>8} {'所有權轉移':>10} {'訪問':>9} {'寫':>8}  符號")
+    for line in lines:
+        cores = ",".join(map(str, line['cores']))
+        symbols = ", ".join(line.get('symbols', [])) or ('?' if 'symbols' in line else '')
+        print(f"{line['addr']:>#14x} {line['class']:<13} {cores:<10} {line['invalidations']:>8,} "
+              f"{line['ownership_transfers']:>10,} {line['accesses']:>9,} {line['writes']:>8,}  {symbols}")
+
+    print("\n各核心訪問的字節（行內偏移）")
+    for line in lines:
+        if line['class'] not in ('true_shared', 'false_shared'):
+            continue
+        print(f"  {line['addr']:#x} ({line['class']})")
+        for core, data in line['bytes'].items():
+            print(f"    cpu{core}: 讀 [{data['read'] or '-'}]  寫 [{data['write'] or '-'}]  "
+                  f"{data['accesses']:,} 次訪問")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='跨核心假共享/真共享檢測')
+    parser.add_argument('trace', help='Cache調試跟蹤（支持 .gz / .zst 和 .ctrace）')
+    parser.add_argument('--elf', help='工作負載的ELF文件，用於把行地址歸屬到全局變量')
+    parser.add_argument('--checkpoint', help='gem5檢查點（m5.cpt），用其中的頁表把物理地址轉換為虛擬地址')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f'頁大小（默認: {DEFAULT_PAGE_SIZE}）')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help=f'顯示的行數（默認: {DEFAULT_TOP}）')
+    parser.add_argument('--json', help='將所有共享行保存為JSON')
+    args = parser.parse_args()
+
+    try:
+        result = detect_sharing(*load_sharing_trace(args.trace), block_size=args.block_size)
+        if args.elf:
+            if not args.checkpoint:
+                print("⚠️  未指定 --checkpoint：假設跟蹤中的地址就是虛擬地址（SE模式下通常不成立）")
+            page_map = load_page_map(args.checkpoint) if args.checkpoint else None
+            attribute_lines(result['lines'], load_symbols(args.elf), args.block_size, page_map, args.page_size)
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print_report(result, args.top)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\n📁 結果已保存: {args.json}")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+LRU棧距離（重用距離）分析：讀取一次訪問跟蹤，得到所有緩存大小和相聯度的缺失率曲線
+
+對一個有S組、A路的LRU緩存，一次訪問缺失當且僅當它在所屬組內的棧距離 >= A
+（首次訪問為冷缺失）。因此對每個組數S只需計算一次組內棧距離直方圖，
+即可得到所有相聯度（和所有 S*A*行大小 的容量）的缺失數；S=1即全相聯曲線。
+
+棧距離用離線方式計算，全部為NumPy向量運算，O(N log^2 N)，可處理10^8次訪問:
+  訪問i的上一次同塊訪問為p，則距離 = (p, i) 之間不同塊的個數
+                                  = #{j < i : prev[j] <= p} - (p + 1)
+  右邊的二維支配計數按自底向上歸併的方式逐層用 searchsorted 計算。
+
+每個緩存的訪問流:
+  - 每核L1D / L1I: 該核自己的訪問（不考慮其它核的失效，即只反映容量/衝突缺失）
+  - 共享L2: 所有核的全部訪問。包含式LRU層次中L2的全局缺失數等於一個L2大小的
+    緩存直接處理全部訪問時的缺失數；L2局部缺失率 = L2缺失數 / L1缺失數
+"""
+
+import sys
+import json
+import numpy as np
+
+from mesi_model import load_trace, DEFAULT_BLOCK_SIZE
+from results_store import parse_size
+
+DEFAULT_MAX_SIZE = '4MB'
+
+def previous_access(keys):
+    """每次訪問上一次訪問同一key的位置，首次訪問為-1"""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    prev = np.full(len(keys), -1, dtype=np.int64)
+    same = sorted_keys[1:] == sorted_keys[:-1]
+    prev[order[1:][same]] = order[:-1][same]
+    return prev
+
+def _dominance_counts(prev, bound):
+    """對每個i計算 #{j < i : prev[j] <= bound[i]}
+
+    自底向上歸併：寬度為w的塊內prev已排序時，奇數塊中的查詢在左邊相鄰偶數塊中
+    用searchsorted計數。塊號作為高位拼進key，使所有塊一次searchsorted完成。
+    """
+    n = len(prev)
+    counts = np.zeros(n, dtype=np.int64)
+    position = np.arange(n, dtype=np.int64)
+    stride = n + 2
+    width = 1
+    while width < n:
+        block = position // width
+        keys = np.sort(block * stride + prev + 1)
+
+        right = np.flatnonzero(block & 1)
+        left_block = block[right] - 1
+        found = np.searchsorted(keys, left_block * stride + bound[right] + 1, side='right')
+        counts[right] += found - left_block * width
+        width *= 2
+    return counts
+
+def stack_distances(blocks):
+    """每次訪問的LRU棧距離，冷缺失為-1"""
+    blocks = np.asarray(blocks, dtype=np.int64)
+    prev = previous_access(blocks)
+    distances = np.full(len(blocks), -1, dtype=np.int64)
+    reused = prev >= 0
+    if reused.any():
+        counts = _dominance_counts(prev, prev)
+        distances[reused] = counts[reused] - (prev[reused] + 1)
+    return distances
+
+class StackDistanceProfile:
+    """一個緩存訪問流的棧距離直方圖，按組數懶計算"""
+
+    def __init__(self, blocks, max_blocks):
+        self.blocks = np.asarray(blocks, dtype=np.int64)
+        self.accesses = len(self.blocks)
+        self.max_blocks = max_blocks
+        # {組數: 直方圖}，最後一個桶為 >= 上限的距離和冷缺失
+        self.histograms = {}
+
+    def histogram(self, num_sets):
+        if num_sets not in self.histograms:
+            # 按組穩定排序後，各組的訪問子序列首尾相接，組內距離互不干擾
+            order = np.argsort(self.blocks & (num_sets - 1), kind='stable')
+            distances = stack_distances(self.blocks[order])
+            cap = max(1, self.max_blocks // num_sets)
+            distances[distances < 0] = cap
+            self.histograms[num_sets] = np.bincount(np.minimum(distances, cap),
+                                                    minlength=cap + 1)
+        return self.histograms[num_sets]
+
+    def misses(self, num_blocks, assoc):
+        """num_blocks個塊、assoc路（0為全相聯）的LRU緩存的缺失數"""
+        if assoc == 0 or assoc >= num_blocks:
+            assoc = num_blocks
+        num_sets = max(1, num_blocks // assoc)
+        if num_sets & (num_sets - 1) or num_sets * assoc > self.max_blocks:
+            raise ValueError(f"不支持的緩存幾何: {num_blocks} 塊 / {assoc} 路"
+                             f"（組數必須是2的冪，容量不超過 {self.max_blocks} 塊）")
+        return int(self.histogram(num_sets)[assoc:].sum())
+
+    def miss_rate(self, num_blocks, assoc):
+        return self.misses(num_blocks, assoc) / self.accesses if self.accesses else 0
+
+def profile_trace(trace, block_size=DEFAULT_BLOCK_SIZE, max_size=DEFAULT_MAX_SIZE):
+    """為跟蹤中的每個緩存建立棧距離分析 {緩存名: StackDistanceProfile}"""
+    blocks = trace['addr'] // block_size
+    max_blocks = parse_size(max_size) // block_size
+    num_cores = int(trace['core'].max()) + 1 if len(blocks) else 1
+
+    profiles = {}
+    for core in range(num_cores):
+        mine = trace['core'] == core
+        for prefix, inst in (('system.l1_icache', True), ('system.l1_dcache', False)):
+            name = prefix if num_cores == 1 else f"{prefix}{core}"
+            profiles[name] = StackDistanceProfile(blocks[mine & (trace['inst'] == inst)],
+                                                  max_blocks)
+    profiles['system.l2cache'] = StackDistanceProfile(blocks, max_blocks)
+    return profiles
+
+def estimate_values(profiles, config, block_size=DEFAULT_BLOCK_SIZE):
+    """估算一個配置點的統計項，使用gem5統計名（可傳給compute_metrics()）"""
+    l1_blocks = parse_size(config['l1_size']) // block_size
+    values = {}
+    l1_misses = 0
+    for name, profile in profiles.items():
+        if not name.startswith('system.l1_'):
+            continue
+        misses = profile.misses(l1_blocks, config['l1_assoc'])
+        hits = profile.accesses - misses
+        l1_misses += misses
+        values[f"{name}.demandHits::total"] = hits
+        values[f"{name}.demandMisses::total"] = misses
+        values[f"{name}.demandAccesses::total"] = profile.accesses
+        values[f"{name}.demandMissRate::total"] = misses / profile.accesses if profile.accesses else 0
+
+    # 分片L2的組號不去掉交織位（見mesi_model.L2Model），等效於組數為單個分片組數的L2
+    banks = config.get('l2_banks', 1)
+    l2_blocks = parse_size(config['l2_size']) // block_size
+    l2_assoc = config['l2_assoc']
+    bank_sets = max(1, l2_blocks // banks // l2_assoc)
+    l2_misses = min(l1_misses, profiles['system.l2cache'].misses(bank_sets * l2_assoc, l2_assoc))
+    values['system.l2cache.demandHits::total'] = l1_misses - l2_misses
+    values['system.l2cache.demandMisses::total'] = l2_misses
+    values['system.l2cache.demandAccesses::total'] = l1_misses
+    values['system.l2cache.demandMissRate::total'] = l2_misses / l1_misses if l1_misses else 0
+    return values
+
+def estimate_sweep(profiles, configurations, block_size=DEFAULT_BLOCK_SIZE):
+    """估算sweep中所有配置點，返回 [{'name', 'config', 'values', 'metrics'}]"""
+    from compare_mesi_configs import compute_metrics
+
+    results = []
+    for point in configurations:
+        values = estimate_values(profiles, point['config'], block_size)
+        results.append({
+            'name': point['name'],
+            'config': point['config'],
+            'values': values,
+            'metrics': compute_metrics(values, point['name'], warn_missing=False)
+        })
+    return results
+
+def miss_rate_curves(profile, block_size=DEFAULT_BLOCK_SIZE, assocs=(1, 2, 4, 8, 16, 0)):
+    """{相聯度: [(容量字節數, 缺失率)]}，相聯度0為全相聯"""
+    curves = {}
+    for assoc in assocs:
+        curve = []
+        num_blocks = max(assoc, 1)
+        while num_blocks <= profile.max_blocks:
+            curve.append((num_blocks * block_size, profile.miss_rate(num_blocks, assoc)))
+            num_blocks *= 2
+        curves[assoc] = curve
+    return curves
+
+def _format_size(size):
+    for unit, scale in (('MB', 1024 ** 2), ('kB', 1024)):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale}{unit}"
+    return f"{size}B"
+
+def print_curves(name, profile, block_size=DEFAULT_BLOCK_SIZE):
+    curves = miss_rate_curves(profile, block_size)
+    print(f"\n=== {name} ({profile.accesses:,} 次訪問) ===")
+    print(f"{'容量':>8}" + "".join(f"{(f'{a}-way' if a else 'full'):>9}" for a in curves))
+    sizes = sorted({size for curve in curves.values() for size, _ in curve})
+    for size in sizes:
+        row = f"{_format_size(size):>8}"
+        for curve in curves.values():
+            rate = dict(curve).get(size)
+            row += f"{rate * 100:>8.2f}%" if rate is not None else f"{'-':>9}"
+        print(row)
+
+if __name__ == "__main__":
+    import argparse
+    from sweep_spec import load_sweep_spec, expand_sweep
+
+    parser = argparse.ArgumentParser(description='LRU棧距離分析（單遍多幾何缺失率估算）')
+    parser.add_argument('trace', help='Cache調試跟蹤（支持 .gz / .zst）、.npz 或 .ctrace 跟蹤')
+    parser.add_argument('--spec', help='sweep規格文件，估算其中所有配置點的指標')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--max-size', default=DEFAULT_MAX_SIZE,
+                        help=f'分析的最大緩存容量（默認: {DEFAULT_MAX_SIZE}）')
+    parser.add_argument('--json', help='將缺失率曲線（和配置點估算結果）保存為JSON')
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    profiles = profile_trace(trace, args.block_size, args.max_size)
+    output = {'curves': {}}
+
+    try:
+        if args.spec:
+            results = estimate_sweep(profiles, expand_sweep(load_sweep_spec(args.spec)),
+                                     args.block_size)
+            print(f"{'配置':<24} {'L1D缺失率':>10} {'L2缺失率':>10}")
+            for result in results:
+                print(f"{result['name']:<24} {result['metrics']['l1_total_miss_rate']:>9.2f}% "
+                      f"{result['metrics']['l2_miss_rate'] * 100:>9.2f}%")
+            output['points'] = {r['name']: {'config': r['config'], 'metrics': r['metrics']}
+                                for r in results}
+        else:
+            for name, profile in profiles.items():
+                print_curves(name, profile, args.block_size)
+
+        for name, profile in profiles.items():
+            output['curves'][name] = {str(assoc): curve for assoc, curve
+                                      in miss_rate_curves(profile, args.block_size).items()}
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"\n📁 結果已保存: {args.json}")
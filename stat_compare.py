@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+重複運行的統計比較：均值、置信區間、效應量和顯著性感知的排名
+
+同一配置（組）的多次重複運行使用不同的擾動種子（見 sweep_spec.py 的 repetitions），
+單次運行之間的差異可能只是內存佈局或起始時序帶來的噪聲。這裡對所有組和指標一次性
+向量化計算:
+  - 均值、樣本標準差、t分佈置信區間半寬
+  - 兩兩之間的Welch t檢驗（不假設方差相等）和Cohen's d
+排名時只有與當前層第一名差異顯著的配置才排在後面，否則視為並列（≈）。
+
+不依賴scipy：t分佈臨界值取自查表，自由度超過30時按1/df在表尾和正態分佈之間插值。
+"""
+
+import numpy as np
+
+CONFIDENCE_LEVELS = (0.90, 0.95, 0.99)
+DEFAULT_CONFIDENCE = 0.95
+
+# 雙側t分佈臨界值，自由度1..30
+_T_TABLE = {
+    0.90: (6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812,
+           1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734, 1.729, 1.725,
+           1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703, 1.701, 1.699, 1.697),
+    0.95: (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+           2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+           2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042),
+    0.99: (63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250, 3.169,
+           3.106, 3.055, 3.012, 2.977, 2.947, 2.921, 2.898, 2.878, 2.861, 2.845,
+           2.831, 2.819, 2.807, 2.797, 2.787, 2.779, 2.771, 2.763, 2.756, 2.750)
+}
+_Z = {0.90: 1.645, 0.95: 1.960, 0.99: 2.576}
+
+# Cohen's d 的常用分級
+EFFECT_SIZES = ((0.2, 'negligible'), (0.5, 'small'), (0.8, 'medium'), (float('inf'), 'large'))
+
+def t_critical(df, confidence=DEFAULT_CONFIDENCE):
+    """雙側t臨界值（df可以是數組或非整數，向下取整偏保守）；df < 1 時為nan"""
+    if confidence not in _T_TABLE:
+        raise ValueError(f"不支持的置信水平: {confidence} (可選: {', '.join(map(str, CONFIDENCE_LEVELS))})")
+    table = np.array(_T_TABLE[confidence])
+    z = _Z[confidence]
+    df = np.asarray(df, dtype=np.float64)
+    whole = np.floor(np.nan_to_num(df, nan=0.0))
+    index = np.clip(whole, 1, len(table)).astype(int) - 1
+    tail = z + (table[-1] - z) * len(table) / np.maximum(whole, len(table))
+    return np.where(whole < 1, np.nan, np.where(whole <= len(table), table[index], tail))
+
+def sample_matrix(groups, all_stats, metrics):
+    """把各組的運行整理為 (指標, 組, 重複) 數組，重複次數不同的組用nan補齊
+
+    groups: {組名: [運行名, ...]}；all_stats: {運行名: 指標字典}
+    """
+    width = max(len(runs) for runs in groups.values())
+    samples = np.full((len(metrics), len(groups), width), np.nan)
+    for g, runs in enumerate(groups.values()):
+        for r, run in enumerate(runs):
+            samples[:, g, r] = [float(all_stats[run].get(metric, np.nan)) for metric in metrics]
+    return samples
+
+def summarize(samples, confidence=DEFAULT_CONFIDENCE):
+    """沿最後一維（重複運行）計算 n、均值、標準差和置信區間半寬"""
+    n = np.sum(~np.isnan(samples), axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nanmean(samples, axis=-1)
+        centered = np.where(np.isnan(samples), 0.0, samples - mean[..., None])
+        std = np.sqrt(np.sum(centered ** 2, axis=-1) / (n - 1))
+        std = np.where(n > 1, std, np.nan)
+        ci = t_critical(n - 1, confidence) * std / np.sqrt(n)
+    return {'n': n, 'mean': mean, 'std': std, 'ci': ci}
+
+def pairwise(summary, confidence=DEFAULT_CONFIDENCE):
+    """所有組兩兩之間的Welch t檢驗和Cohen's d（組在倒數第一維）
+
+    返回的矩陣最後兩維為 (組i, 組j)，diff = mean_i - mean_j。兩組都沒有方差時，
+    均值不同即視為顯著（gem5本身是確定性的，擾動沒有改變結果時方差為0）。
+    """
+    n, mean, std = summary['n'], summary['mean'], summary['std']
+    var_n = std ** 2 / n
+    ni, nj = n[..., :, None], n[..., None, :]
+    vi, vj = var_n[..., :, None], var_n[..., None, :]
+    diff = mean[..., :, None] - mean[..., None, :]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        se = np.sqrt(vi + vj)
+        t = diff / se
+        df = (vi + vj) ** 2 / (vi ** 2 / (ni - 1) + vj ** 2 / (nj - 1))
+        pooled = np.sqrt(((ni - 1) * std[..., :, None] ** 2 + (nj - 1) * std[..., None, :] ** 2) /
+                         (ni + nj - 2))
+        cohen_d = np.where(diff == 0, 0.0, diff / pooled)
+        significant = np.where(se == 0, diff != 0, np.abs(t) > t_critical(df, confidence))
+    testable = (ni > 1) & (nj > 1)
+    return {'diff': diff, 't': t, 'df': df, 'cohen_d': cohen_d,
+            'significant': significant & testable, 'testable': testable}
+
+def effect_label(d):
+    magnitude = abs(d)
+    for limit, label in EFFECT_SIZES:
+        if magnitude < limit:
+            return label
+    return 'large'
+
+def rank_tiers(means, significant, higher_is_better):
+    """按均值排序並分層，返回 [[組索引, ...], ...]（最好的層在前）
+
+    每層的第一名是該層均值最好的組；後續的組與第一名差異不顯著時並入該層，否則開始新的一層
+    """
+    order = np.argsort(-means if higher_is_better else means, kind='stable')
+    tiers = []
+    for index in order:
+        if tiers and not significant[tiers[-1][0], index]:
+            tiers[-1].append(int(index))
+        else:
+            tiers.append([int(index)])
+    return tiers
+
+def format_ranking(names, tiers):
+    """'A > B ≈ C'：> 表示顯著更好，≈ 表示差異不顯著"""
+    return " > ".join(" ≈ ".join(names[i] for i in tier) for tier in tiers)
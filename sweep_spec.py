@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+設計空間掃描規格：將聲明式的sweep spec展開為一組運行配置
+
+規格文件 (JSON) 格式:
+{
+  "name": "l1_l2_sweep",
+  "mode": "cartesian",            # list / cartesian / random / lhs
+  "base": {"num_cores": 2, "clock": "3GHz"},
+  "axes": {"l1_size": ["16kB", "32kB"], "l2_assoc": [4, 8, 16]},
+  "samples": 50,                  # random / lhs 模式的採樣點數
+  "seed": 1,
+  "repetitions": 5,               # 每個配置點的重複運行次數（可選，默認1）
+  "output_root": "results/l1_l2_sweep"
+}
+list 模式使用 "points": [{...}, ...] 顯式列出每個配置點。
+
+repetitions大於1時每個配置點展開為 "<名稱> seed<k>"（k = 1..N）N次運行，各自使用
+擾動種子k（內存佈局、起始時間，見 mesi_system.py），config['group'] 記錄原配置名，
+分析腳本按組計算均值、置信區間和顯著性。
+"""
+
+import os
+import json
+import random
+import itertools
+
+# 系統腳本可接受的配置項（與 configs/scripts/mesi_system.py 保持一致）
+CONFIG_AXES = ('num_cores', 'l1_size', 'l1_assoc', 'l2_size', 'l2_assoc',
+               'l2_banks', 'clock', 'workload', 'accel_tile_size',
+               'accel_outstanding', 'accel_macs_per_cycle', 'accel_double_buffer',
+               'warmup', 'seed', 'memory_system', 'ruby_network', 'ruby_topology',
+               'ruby_mesh_rows', 'ruby_link_latency', 'ruby_router_latency',
+               'fast_forward', 'sampling', 'sample_interval', 'sample_warmup', 'sample_length',
+               'simpoint_file', 'simpoint_weights') + tuple(
+    f'{level}_{param}' for level in ('l1', 'l2')
+    for param in ('mshrs', 'tgts_per_mshr', 'tag_latency', 'data_latency', 'response_latency',
+                  'replacement', 'prefetcher', 'prefetch_degree'))
+
+SWEEP_MODES = ('list', 'cartesian', 'random', 'lhs')
+
+def load_sweep_spec(spec_file):
+    """讀取sweep規格文件"""
+    with open(spec_file, 'r') as f:
+        spec = json.load(f)
+
+    mode = spec.get('mode', 'cartesian')
+    if mode not in SWEEP_MODES:
+        raise ValueError(f"未知的sweep模式: {mode} (可選: {', '.join(SWEEP_MODES)})")
+
+    repetitions = spec.get('repetitions', 1)
+    if not isinstance(repetitions, int) or repetitions < 1:
+        raise ValueError(f"repetitions必須是正整數: {repetitions}")
+
+    for key in list(spec.get('base', {})) + list(spec.get('axes', {})):
+        if key not in CONFIG_AXES:
+            raise ValueError(f"未知的配置項: {key} (可選: {', '.join(CONFIG_AXES)})")
+
+    return spec
+
+def _cartesian_points(axes):
+    """笛卡爾積：所有軸取值的全組合"""
+    names = list(axes)
+    for values in itertools.product(*(axes[name] for name in names)):
+        yield dict(zip(names, values))
+
+def _random_points(axes, samples, rng):
+    """隨機採樣：每個點在每個軸上獨立均勻取值（去重）"""
+    total = 1
+    for values in axes.values():
+        total *= len(values)
+    samples = min(samples, total)
+
+    seen = set()
+    while len(seen) < samples:
+        point = tuple(rng.choice(values) for values in axes.values())
+        if point not in seen:
+            seen.add(point)
+            yield dict(zip(axes, point))
+
+def _lhs_points(axes, samples, rng):
+    """拉丁超立方採樣：每個軸的取值範圍被均分為samples層，每層恰好採樣一次"""
+    strata = {}
+    for name, values in axes.items():
+        # 第i層對應區間 [i/n, (i+1)/n)，在層內隨機取點後映射回離散取值
+        order = list(range(samples))
+        rng.shuffle(order)
+        strata[name] = [
+            values[min(int((i + rng.random()) / samples * len(values)), len(values) - 1)]
+            for i in order
+        ]
+
+    for i in range(samples):
+        yield {name: strata[name][i] for name in axes}
+
+def describe_point(config):
+    """生成配置點的簡短描述"""
+    return (f"{config.get('num_cores', 2)} cores, "
+            f"L1={config.get('l1_size')}/{config.get('l1_assoc')}-way, "
+            f"L2={config.get('l2_size')}/{config.get('l2_assoc')}-way"
+            + (f" x{config['l2_banks']} banks" if config.get('l2_banks', 1) > 1 else "")
+            + "".join(f", {key.split('_')[0].upper()} {config[key]}"
+                      for key in ('l1_replacement', 'l1_prefetcher', 'l2_replacement', 'l2_prefetcher')
+                      if config.get(key) not in (None, 'lru', 'none'))
+            + (f", Ruby {config.get('ruby_network', 'simple')}/{config.get('ruby_topology', 'crossbar')}"
+               if config.get('memory_system') == 'ruby' else "")
+            + (f", fast-forward {config['fast_forward']}" if config.get('fast_forward', 'none') != 'none' else "")
+            + (f", {config['sampling']} sampling" if config.get('sampling', 'none') != 'none' else ""))
+
+def point_slug(name):
+    """配置名轉為目錄名，例如 'Small Cache' -> 'small_cache'"""
+    return name.strip().lower().replace(' ', '_')
+
+def expand_sweep(spec):
+    """展開sweep規格，返回運行配置列表 [{'name', 'description', 'output_dir', 'config'}]"""
+    sweep_name = spec.get('name', 'sweep')
+    mode = spec.get('mode', 'cartesian')
+    base = spec.get('base', {})
+    axes = spec.get('axes', {})
+    output_root = spec.get('output_root', os.path.join('results', point_slug(sweep_name)))
+    rng = random.Random(spec.get('seed', 0))
+    samples = spec.get('samples', 10)
+    repetitions = spec.get('repetitions', 1)
+
+    if mode == 'list':
+        points = spec.get('points', [])
+    elif mode == 'cartesian':
+        points = _cartesian_points(axes)
+    elif mode == 'random':
+        points = _random_points(axes, samples, rng)
+    else:
+        points = _lhs_points(axes, samples, rng)
+
+    configurations = []
+    for index, point in enumerate(points):
+        point = dict(point)
+        name = point.pop('name', f"{sweep_name}_{index:04d}")
+        description = point.pop('description', None)
+        config = {**base, **point, 'name': name}
+        description = description or describe_point(config)
+
+        if repetitions <= 1:
+            configurations.append({
+                'name': name,
+                'description': description,
+                'output_dir': os.path.join(output_root, point_slug(name)),
+                'config': config
+            })
+            continue
+
+        for seed in range(1, repetitions + 1):
+            replica = f"{name} seed{seed}"
+            configurations.append({
+                'name': replica,
+                'description': f"{description} [seed {seed}]",
+                'output_dir': os.path.join(output_root, point_slug(replica)),
+                'config': {**config, 'name': replica, 'group': name, 'seed': seed}
+            })
+
+    return configurations
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        print("用法: python3 sweep_spec.py <sweep_spec.json>")
+        sys.exit(1)
+
+    for point in expand_sweep(load_sweep_spec(sys.argv[1])):
+        print(f"{point['name']}: {point['description']} -> {point['output_dir']}")
\ No newline at end of file
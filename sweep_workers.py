@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+sweep的工作節點後端：本地進程池，或通過TCP把作業分發到多台機器上的工作節點
+
+後端接口（JobScheduler使用）:
+  submit(fn, name, config, output_dir, timeout=...) -> concurrent.futures.Future
+  capacity   同時提交的作業數上限（None表示由後端自己排隊）
+  shutdown() / report()
+
+SocketBackend（協調端）協議：每條消息為4字節大端長度 + UTF-8 JSON
+  worker -> 協調端: hello {worker, slots} / started {id} / result {id, result, files}
+                    idle {} / revoked {id, ok}
+  協調端 -> worker: job {id, name, config, timeout} / revoke {id} / shutdown {}
+
+每個工作節點最多持有 slots + prefetch 個作業（超出slots的部分在節點本地排隊）。
+全局隊列為空時，空閒節點發送idle，協調端向未開始作業最多的節點發送revoke，
+節點確認該作業尚未開始後把它交回，協調端再分配給空閒節點（工作竊取）。
+工作節點在本地臨時目錄中運行gem5，完成後把統計/配置/日誌文件打包上傳，
+協調端解包到該配置點的輸出目錄。節點斷開時，分配給它的作業重新進入隊列。
+
+工作節點需要在自己的倉庫目錄中有相同的gem5二進制、系統腳本和工作負載:
+  python3 sweep_workers.py worker --connect coordinator:7878 --slots 8
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import struct
+import shutil
+import tarfile
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from result_cache import CACHED_FILES
+
+DEFAULT_PORT = 7878
+DEFAULT_PREFETCH = 1
+
+# 上傳回協調端的文件（CACHED_FILES之外）
+UPLOADED_FILES = CACHED_FILES + ('run_config.json', 'gem5.stdout', 'gem5.stderr')
+
+# 結果中需要改寫為協調端路徑的字段
+RESULT_PATH_FIELDS = {
+    'stats_file': 'stats.txt',
+    'config_file': 'config.json',
+    'stdout_log': 'gem5.stdout',
+    'stderr_log': 'gem5.stderr'
+}
+
+def send_message(sock, message):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(data)) + data)
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError('連接已關閉')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def recv_message(sock):
+    size, = struct.unpack('>I', _recv_exact(sock, 4))
+    return json.loads(_recv_exact(sock, size).decode('utf-8'))
+
+def parse_address(address, default_host='0.0.0.0'):
+    """'host:port'、'port' 或 'host' -> (host, port)"""
+    host, sep, port = str(address).rpartition(':')
+    if not sep:
+        if not port.isdigit():
+            return port, DEFAULT_PORT
+        host = ''
+    return host or default_host, int(port)
+
+def pack_outputs(output_dir):
+    """把運行輸出打包為base64編碼的tar.gz"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        for filename in UPLOADED_FILES:
+            path = os.path.join(output_dir, filename)
+            if os.path.exists(path):
+                tar.add(path, arcname=filename)
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+def unpack_outputs(files, output_dir):
+    """解包上傳的文件到輸出目錄，返回解包的字節數"""
+    data = base64.b64decode(files)
+    os.makedirs(output_dir, exist_ok=True)
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as tar:
+        for member in tar.getmembers():
+            # 只接受約定的文件名，防止路徑穿越
+            if member.isfile() and member.name in UPLOADED_FILES:
+                with tar.extractfile(member) as src, \
+                        open(os.path.join(output_dir, member.name), 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+    return len(data)
+
+class LocalBackend:
+    """本機進程池（原有的運行方式）"""
+
+    def __init__(self, jobs):
+        self.capacity = jobs
+        self.executor = ProcessPoolExecutor(max_workers=jobs)
+
+    def submit(self, fn, *args, **kwargs):
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+    def report(self):
+        pass
+
+class _WorkerConnection:
+    def __init__(self, sock, name, slots):
+        self.sock = sock
+        self.name = name
+        self.slots = slots
+        self.send_lock = threading.Lock()
+        # 已分配給該節點的作業id（按分配順序）
+        self.assigned = []
+        self.connected_at = time.time()
+        self.disconnected_at = None
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.uploaded_bytes = 0
+        self.stolen_from = 0
+        self.stolen_to = 0
+
+    def send(self, message):
+        with self.send_lock:
+            send_message(self.sock, message)
+
+class SocketBackend:
+    """協調端：把作業分發給通過TCP連接的工作節點
+
+    工作節點總是運行 run_all_configs.run_simulation()，submit()的fn參數只用於保持執行器接口。
+    """
+
+    capacity = None
+
+    def __init__(self, address, prefetch=DEFAULT_PREFETCH):
+        self.prefetch = prefetch
+        self.server = socket.create_server(parse_address(address))
+        self.address = self.server.getsockname()
+        self.lock = threading.RLock()
+        self.queue = deque()
+        # {id: {'future', 'name', 'config', 'output_dir', 'timeout', 'worker', 'started', 'revoking'}}
+        self.jobs = {}
+        self.workers = {}
+        self.next_id = 0
+        self.closed = False
+        print(f"📡 等待工作節點連接: {self.address[0]}:{self.address[1]}")
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def submit(self, fn, name, config, output_dir, timeout=None):
+        future = Future()
+        with self.lock:
+            job_id = self.next_id
+            self.next_id += 1
+            self.jobs[job_id] = {'future': future, 'name': name, 'config': config,
+                                 'output_dir': output_dir, 'timeout': timeout,
+                                 'worker': None, 'started': False, 'revoking': False}
+            self.queue.append(job_id)
+            self._dispatch()
+        return future
+
+    def _accept(self):
+        while not self.closed:
+            try:
+                sock, peer = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock, peer), daemon=True).start()
+
+    def _serve(self, sock, peer):
+        worker = None
+        try:
+            hello = recv_message(sock)
+            if hello.get('type') != 'hello':
+                sock.close()
+                return
+            with self.lock:
+                name = hello.get('worker') or f"{peer[0]}:{peer[1]}"
+                while name in self.workers and self.workers[name].disconnected_at is None:
+                    name += "'"
+                worker = _WorkerConnection(sock, name, max(1, int(hello.get('slots', 1))))
+                self.workers[name] = worker
+                print(f"🔌 工作節點已連接: {name} ({worker.slots} slots)")
+                self._dispatch()
+
+            while True:
+                self._handle(worker, recv_message(sock))
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            sock.close()
+            if worker is not None:
+                self._disconnected(worker)
+
+    def _handle(self, worker, message):
+        kind = message.get('type')
+        with self.lock:
+            if kind == 'started':
+                job = self.jobs.get(message['id'])
+                if job is not None:
+                    job['started'] = True
+            elif kind == 'result':
+                self._complete(worker, message)
+            elif kind == 'idle':
+                if not self.queue:
+                    self._steal(worker)
+            elif kind == 'revoked':
+                job_id = message['id']
+                job = self.jobs.get(job_id)
+                if job is None:
+                    return
+                job['revoking'] = False
+                if message.get('ok') and job_id in worker.assigned:
+                    worker.assigned.remove(job_id)
+                    worker.stolen_from += 1
+                    job['worker'] = None
+                    self.queue.appendleft(job_id)
+                    self._dispatch()
+                else:
+                    # 作業已經開始，換一個節點竊取
+                    job['started'] = True
+                    thief = self.workers.get(job.get('thief'))
+                    if thief is not None and thief.disconnected_at is None:
+                        self._steal(thief)
+
+    def _complete(self, worker, message):
+        job = self.jobs.pop(message['id'], None)
+        if message['id'] in worker.assigned:
+            worker.assigned.remove(message['id'])
+        if job is None:
+            return
+
+        result = message['result']
+        if message.get('files'):
+            worker.uploaded_bytes += unpack_outputs(message['files'], job['output_dir'])
+        for field, filename in RESULT_PATH_FIELDS.items():
+            if result.get(field):
+                result[field] = os.path.join(job['output_dir'], filename)
+
+        worker.busy_seconds += result.get('runtime') or 0
+        if result.get('success'):
+            worker.completed += 1
+        else:
+            worker.failed += 1
+        print(f"📥 {job['name']} 來自 {worker.name}")
+        job['future'].set_result(result)
+        self._dispatch()
+
+    def _dispatch(self):
+        """把隊列中的作業分配給持有作業最少的節點"""
+        while self.queue:
+            available = [w for w in self.workers.values()
+                         if w.disconnected_at is None and len(w.assigned) < w.slots + self.prefetch]
+            if not available:
+                return
+            worker = min(available, key=lambda w: len(w.assigned) / w.slots)
+
+            job_id = self.queue.popleft()
+            job = self.jobs[job_id]
+            future = job['future']
+            # 重新排隊的作業（被竊取或節點斷開）已經是running狀態
+            if future.cancelled() or (not future.running() and
+                                      not future.set_running_or_notify_cancel()):
+                # 已被取消（例如Ctrl-C）
+                del self.jobs[job_id]
+                continue
+
+            job['worker'] = worker.name
+            job['started'] = False
+            worker.assigned.append(job_id)
+            if job.pop('thief', None) == worker.name:
+                worker.stolen_to += 1
+            try:
+                worker.send({'type': 'job', 'id': job_id, 'name': job['name'],
+                             'config': job['config'], 'timeout': job['timeout']})
+            except OSError:
+                # 連接已斷開，由_serve()的清理流程重新排隊
+                return
+
+    def _steal(self, thief):
+        """從未開始作業最多的節點竊取最後分配的一個作業"""
+        victims = []
+        for worker in self.workers.values():
+            if worker is thief or worker.disconnected_at is not None:
+                continue
+            waiting = [job_id for job_id in worker.assigned
+                       if not self.jobs[job_id]['started'] and not self.jobs[job_id]['revoking']]
+            if waiting:
+                victims.append((len(waiting), worker, waiting[-1]))
+        if not victims:
+            return
+
+        _, victim, job_id = max(victims, key=lambda v: v[0])
+        job = self.jobs[job_id]
+        job['revoking'] = True
+        job['thief'] = thief.name
+        try:
+            victim.send({'type': 'revoke', 'id': job_id})
+        except OSError:
+            job['revoking'] = False
+
+    def _disconnected(self, worker):
+        with self.lock:
+            worker.disconnected_at = time.time()
+            requeued = [job_id for job_id in worker.assigned if job_id in self.jobs]
+            worker.assigned = []
+            for job_id in reversed(requeued):
+                self.jobs[job_id]['worker'] = None
+                self.jobs[job_id]['revoking'] = False
+                self.queue.appendleft(job_id)
+            if not self.closed:
+                print(f"⚠️  工作節點斷開: {worker.name}，{len(requeued)} 個作業重新排隊")
+            self._dispatch()
+
+    def shutdown(self):
+        with self.lock:
+            self.closed = True
+            for worker in self.workers.values():
+                if worker.disconnected_at is None:
+                    try:
+                        worker.send({'type': 'shutdown'})
+                    except OSError:
+                        pass
+        self.server.close()
+
+    def report(self):
+        """打印每個工作節點的吞吐量"""
+        if not self.workers:
+            return
+        print(f"\n{'工作節點':<20} {'slots':>5} {'完成':>6} {'失敗':>6} {'作業/小時':>10} "
+              f"{'利用率':>8} {'上傳MB':>8} {'被竊取':>6} {'竊取':>6}")
+        now = time.time()
+        for worker in self.workers.values():
+            wall = max(1e-9, (worker.disconnected_at or now) - worker.connected_at)
+            finished = worker.completed + worker.failed
+            print(f"{worker.name:<20} {worker.slots:>5} {worker.completed:>6} {worker.failed:>6} "
+                  f"{finished / wall * 3600:>10.1f} "
+                  f"{worker.busy_seconds / (wall * worker.slots) * 100:>7.1f}% "
+                  f"{worker.uploaded_bytes / 1e6:>8.2f} {worker.stolen_from:>6} {worker.stolen_to:>6}")
+
+class Worker:
+    """工作節點：從協調端接收作業，在本地運行gem5並上傳結果"""
+
+    def __init__(self, address, slots, name=None, scratch=None):
+        self.address = parse_address(address, default_host='localhost')
+        self.slots = slots
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.scratch = scratch or tempfile.mkdtemp(prefix='sweep_worker_')
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.backlog = deque()
+        self.running = 0
+        self.sock = None
+        self.pool = ThreadPoolExecutor(max_workers=slots)
+
+    def send(self, message):
+        with self.send_lock:
+            send_message(self.sock, message)
+
+    def run(self):
+        self.sock = socket.create_connection(self.address)
+        self.send({'type': 'hello', 'worker': self.name, 'slots': self.slots})
+        print(f"🔌 {self.name} 已連接到 {self.address[0]}:{self.address[1]}")
+        try:
+            while True:
+                message = recv_message(self.sock)
+                kind = message.get('type')
+                if kind == 'job':
+                    with self.lock:
+                        self.backlog.append(message)
+                        self._start_jobs()
+                elif kind == 'revoke':
+                    with self.lock:
+                        job = next((j for j in self.backlog if j['id'] == message['id']), None)
+                        if job is not None:
+                            self.backlog.remove(job)
+                    self.send({'type': 'revoked', 'id': message['id'], 'ok': job is not None})
+                elif kind == 'shutdown':
+                    break
+        except (ConnectionError, OSError):
+            print(f"⚠️  {self.name} 與協調端的連接已斷開")
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.sock.close()
+
+    def _start_jobs(self):
+        while self.running < self.slots and self.backlog:
+            job = self.backlog.popleft()
+            self.running += 1
+            self.send({'type': 'started', 'id': job['id']})
+            self.pool.submit(self._run, job)
+
+    def _run(self, job):
+        from run_all_configs import run_simulation
+
+        output_dir = os.path.join(self.scratch, str(job['id']))
+        try:
+            kwargs = {'timeout': job['timeout']} if job['timeout'] else {}
+            result = run_simulation(job['name'], job['config'], output_dir, **kwargs)
+            files = pack_outputs(output_dir)
+        except Exception as e:
+            print(f"❌ {job['name']} 運行出錯: {e}")
+            result = {'success': False, 'returncode': None, 'runtime': None}
+            files = None
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+        try:
+            self.send({'type': 'result', 'id': job['id'], 'result': result, 'files': files})
+            with self.lock:
+                self.running -= 1
+                self._start_jobs()
+                idle = not self.backlog and self.running < self.slots
+            if idle:
+                self.send({'type': 'idle'})
+        except OSError:
+            pass
+
+def run_worker(address, slots, name=None, scratch=None):
+    Worker(address, slots, name, scratch).run()
+
+def spawn_local_workers(address, count, slots=1):
+    """在本機啟動count個工作節點進程（多機部署的本地替身），返回進程列表"""
+    import multiprocessing
+
+    host, port = address
+    if host in ('0.0.0.0', '::', ''):
+        host = 'localhost'
+    processes = []
+    for i in range(count):
+        process = multiprocessing.Process(target=run_worker,
+                                          args=(f"{host}:{port}", slots, f"local{i}"),
+                                          daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='sweep工作節點')
+    subparsers = parser.add_subparsers(dest='command')
+    worker_parser = subparsers.add_parser('worker', help='連接協調端並運行分配的模擬')
+    worker_parser.add_argument('--connect', required=True, help='協調端地址 host:port')
+    worker_parser.add_argument('--slots', type=int, default=os.cpu_count() or 1,
+                               help='同時運行的gem5進程數（默認: CPU核心數）')
+    worker_parser.add_argument('--name', help='節點名稱（默認: 主機名-進程號）')
+    worker_parser.add_argument('--scratch', help='本地臨時輸出目錄')
+    args = parser.parse_args()
+
+    if args.command != 'worker':
+        parser.print_help()
+        sys.exit(1)
+    run_worker(args.connect, args.slots, args.name, args.scratch)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 測試直接導入倉庫根目錄下的分析腳本
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(REPO_ROOT, 'tests', 'data')
+sys.path.insert(0, REPO_ROOT)
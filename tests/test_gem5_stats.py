@@ -0,0 +1,24 @@
+"""gem5_stats.py：採樣窗口外推時各類統計的合併方式"""
+
+from gem5_stats import iter_stats_dumps, extrapolate_dumps
+
+def _dump(insts, cpi, max_fanout, tick):
+    return f"""---------- Begin Simulation Statistics ----------
+finalTick {tick} # Number of ticks from beginning of simulation (Tick)
+simInsts {insts} # Number of instructions simulated (Count)
+system.clk_domain.clock 333 # Clock period in ticks (Tick)
+system.cpu0.cpi {cpi} # CPI ((Cycle/Count))
+system.l2bus.snoopFanout::mean 1.5 # Request fanout histogram (Count)
+system.l2bus.snoopFanout::max_value {max_fanout} # Request fanout histogram (Count)
+---------- End Simulation Statistics   ----------
+""".splitlines(True)
+
+def test_extrapolate_dumps():
+    dumps = list(iter_stats_dumps(_dump(100, 2.0, 3, 5000) + _dump(300, 4.0, 1, 9000)))
+    values = extrapolate_dumps(dumps, [0.25, 0.75], [10, 4])
+    assert values['simInsts'] == 0.25 * 100 * 10 + 0.75 * 300 * 4
+    assert values['system.cpu0.cpi'] == 0.25 * 2.0 + 0.75 * 4.0
+    assert values['system.l2bus.snoopFanout::mean'] == 1.5
+    assert values['system.l2bus.snoopFanout::max_value'] == 3
+    assert values['system.clk_domain.clock'] == 333
+    assert values['finalTick'] == 9000
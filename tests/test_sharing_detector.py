@@ -0,0 +1,36 @@
+"""sharing_detector.py：偵聽失效計數和按失效次數排序"""
+
+import os
+import pytest
+
+from conftest import DATA_DIR
+from sharing_detector import load_sharing_trace, detect_sharing
+from trace_store import convert_trace
+
+SNOOP_TRACE = os.path.join(DATA_DIR, 'sharing_snoop_trace.txt')
+
+@pytest.fixture(params=['text', 'ctrace'])
+def trace_path(request, tmp_path):
+    if request.param == 'text':
+        return SNOOP_TRACE
+    output = str(tmp_path / 'sharing.ctrace')
+    convert_trace(SNOOP_TRACE, output)
+    return output
+
+def test_snoop_invalidations_are_counted(trace_path):
+    accesses, invalidations = load_sharing_trace(trace_path)
+    # 只有舊狀態有效的偵聽失效，M→S降級和填充不計
+    assert sorted(zip(invalidations['tick'].tolist(), invalidations['core'].tolist())) == \
+        [(205, 0), (305, 1), (805, 0)]
+    assert len(accesses['tick']) == 9
+
+def test_lines_ranked_by_invalidations(trace_path):
+    result = detect_sharing(*load_sharing_trace(trace_path))
+    assert result['summary'] == {'private': 1, 'read_shared': 0, 'true_shared': 1, 'false_shared': 1}
+
+    first, second = result['lines']
+    assert (first['addr'], first['class'], first['invalidations'], first['ownership_transfers']) == \
+        (0x1000, 'false_shared', 2, 2)
+    assert (second['addr'], second['class'], second['invalidations'], second['ownership_transfers']) == \
+        (0x2000, 'true_shared', 1, 3)
+    assert first['bytes'][0]['write'] == '0-3' and first['bytes'][1]['write'] == '8-11'
@@ -0,0 +1,62 @@
+"""stack_distance.py：與朴素LRU模擬對比"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from stack_distance import _dominance_counts, stack_distances, StackDistanceProfile
+
+def naive_stack_distances(blocks):
+    stack = []
+    distances = []
+    for block in blocks:
+        if block in stack:
+            depth = len(stack) - 1 - stack.index(block)
+            stack.remove(block)
+        else:
+            depth = -1
+        distances.append(depth)
+        stack.append(block)
+    return distances
+
+def naive_lru_misses(blocks, num_sets, assoc):
+    sets = [OrderedDict() for _ in range(num_sets)]
+    misses = 0
+    for block in blocks:
+        lines = sets[block & (num_sets - 1)]
+        if block in lines:
+            lines.move_to_end(block)
+            continue
+        misses += 1
+        lines[block] = True
+        if len(lines) > assoc:
+            lines.popitem(last=False)
+    return misses
+
+@pytest.mark.parametrize('seed', range(5))
+def test_dominance_counts(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 200))
+    prev = rng.integers(-1, n, n)
+    bound = rng.integers(-1, n, n)
+    expected = [int(np.sum(prev[:i] <= bound[i])) for i in range(n)]
+    assert _dominance_counts(prev, bound).tolist() == expected
+
+@pytest.mark.parametrize('seed', range(5))
+def test_stack_distances(seed):
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 40, int(rng.integers(1, 500)))
+    assert stack_distances(blocks).tolist() == naive_stack_distances(blocks.tolist())
+
+@pytest.mark.parametrize('seed', range(3))
+def test_set_associative_misses(seed):
+    rng = np.random.default_rng(seed)
+    # 帶局部性的訪問流：熱點塊加隨機塊
+    blocks = np.where(rng.random(3000) < 0.7, rng.integers(0, 24, 3000), rng.integers(0, 512, 3000))
+    profile = StackDistanceProfile(blocks, max_blocks=64)
+    for num_blocks in (4, 16, 64):
+        for assoc in (1, 2, 4, 0):
+            ways = num_blocks if assoc == 0 else assoc
+            expected = naive_lru_misses(blocks.tolist(), num_blocks // ways, ways)
+            assert profile.misses(num_blocks, assoc) == expected, (num_blocks, assoc)
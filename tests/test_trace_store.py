@@ -0,0 +1,48 @@
+"""trace_store.py：.ctrace往返、時間窗口查詢和向量化彙總與逐事件實現對比"""
+
+import os
+
+import numpy as np
+import pytest
+
+from conftest import REPO_ROOT, DATA_DIR
+from cache_trace import iter_cache_events, TraceAnalyzer
+from trace_store import convert_trace, TraceFile, summarize
+
+TRACES = [os.path.join(REPO_ROOT, 'm5out', 'mesi_debug.txt'),
+          os.path.join(DATA_DIR, 'sharing_snoop_trace.txt')]
+
+@pytest.fixture(params=TRACES, ids=os.path.basename)
+def converted(request, tmp_path):
+    # 小的索引間隔使窗口查詢跨越多個稀疏索引塊
+    output = str(tmp_path / 'trace.ctrace')
+    convert_trace(request.param, output, stride=8)
+    return request.param, TraceFile(output)
+
+def test_round_trip(converted):
+    source, trace = converted
+    expected = [event._replace(message=None) for event in iter_cache_events(source)]
+    assert list(trace.to_events(trace.events)) == expected
+
+def test_window_matches_linear_scan(converted):
+    _, trace = converted
+    ticks = np.asarray(trace.events['tick'])
+    caches = np.asarray(trace.events['cache'])
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        start, end = sorted(rng.integers(int(ticks[0]) - 10, int(ticks[-1]) + 10, 2))
+        in_window = (ticks >= start) & (ticks < end)
+        assert np.array_equal(trace.window(start, end), trace.events[in_window])
+
+        c = int(rng.integers(1, len(trace.caches)))
+        records = trace.window(start, end, trace.caches[c])
+        assert np.array_equal(records, trace.events[in_window & (caches == c)])
+
+    assert np.array_equal(trace.window(), trace.events)
+    assert np.array_equal(trace.window(end_tick=int(ticks[len(ticks) // 2])),
+                          trace.events[ticks < ticks[len(ticks) // 2]])
+
+def test_summarize_matches_analyzer(converted):
+    source, trace = converted
+    expected = TraceAnalyzer().consume(iter_cache_events(source)).summary()
+    assert summarize(trace) == expected
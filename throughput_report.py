@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+模擬器主機吞吐量報告：哪些配置模擬起來最貴
+
+對run_info.json中每次成功的運行彙總:
+  - gem5自己報告的 hostInstRate / hostTickRate / hostMemory / hostSeconds
+  - run_all_configs.py 採樣的gem5進程墻鐘時間、CPU利用率和峰值RSS（host_telemetry.json）
+並按核心數和緩存大小分組，用於在安排大型sweep之前估算成本。
+
+與保存的基線（--save-baseline）比較時，模擬吞吐量（指令/秒或tick/秒）下降或
+峰值內存上升超過閾值的配置被標記為回歸。基線按配置內容匹配（不含名稱和檢查點路徑），
+因此換了gem5版本或主機後仍可比較同一配置點。
+"""
+
+import os
+import sys
+import json
+import numpy as np
+
+from gem5_stats import load_stats
+from results_store import host_telemetry_values
+from result_cache import DISPLAY_ONLY_KEYS
+
+DEFAULT_RUN_INFO = 'results/run_info.json'
+DEFAULT_BASELINE = 'results/throughput_baseline.json'
+DEFAULT_REPORT = 'results/throughput_report.txt'
+DEFAULT_THRESHOLD = 0.10
+
+# 不影響模擬成本的配置項
+SIGNATURE_IGNORED_KEYS = DISPLAY_ONLY_KEYS + ('checkpoint_dir', 'restore_dir')
+
+# 回歸檢查: (指標, 越大越好)
+REGRESSION_METRICS = (
+    ('host_inst_rate', True),
+    ('host_tick_rate', True),
+    ('peak_memory_mb', False)
+)
+
+def config_signature(config):
+    """配置點的穩定標識（用於匹配基線）"""
+    return json.dumps({k: v for k, v in config.items() if k not in SIGNATURE_IGNORED_KEYS},
+                      sort_keys=True)
+
+def collect_throughput(run_info_file=DEFAULT_RUN_INFO):
+    """讀取所有成功運行的主機性能，返回 [{'name', 'config', 指標...}]"""
+    from compare_mesi_configs import compute_metrics
+
+    with open(run_info_file, 'r') as f:
+        run_info = json.load(f)
+
+    rows = []
+    for name, result in run_info['configurations'].items():
+        if not result.get('success'):
+            continue
+        stats_file = os.path.join(result['output_dir'], 'stats.txt')
+        dump = load_stats(stats_file) if os.path.exists(stats_file) else None
+        if dump is None:
+            continue
+
+        values = dump.as_dict()
+        values.update(host_telemetry_values(result['output_dir']))
+        metrics = compute_metrics(values, stats_file, warn_missing=False)
+        config = result.get('config') or {}
+        rows.append({
+            'name': name,
+            'config': config,
+            'num_cores': config.get('num_cores', metrics['num_cores']),
+            'cache_size': f"{config.get('l1_size', '?')}/{config.get('l2_size', '?')}",
+            'sim_insts': metrics['sim_insts'],
+            'host_seconds': metrics['host_seconds'],
+            'host_inst_rate': metrics['host_inst_rate'],
+            'host_tick_rate': metrics['host_tick_rate'],
+            'wall_seconds': metrics['host_wall_seconds'] or metrics['host_seconds'],
+            'cpu_utilization': metrics['host_cpu_utilization'],
+            # 優先使用進程的峰值RSS，舊的運行只有gem5報告的hostMemory
+            'peak_memory_mb': metrics['host_peak_rss_mb'] or metrics['host_memory'] / 2 ** 20
+        })
+    return rows
+
+def group_throughput(rows, key):
+    """按配置項分組的平均吞吐量 {組: {'runs', 'host_inst_rate', 'host_tick_rate', 'peak_memory_mb', 'wall_seconds'}}"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[key], []).append(row)
+
+    summary = {}
+    for group, members in sorted(groups.items(), key=lambda item: str(item[0])):
+        summary[group] = {'runs': len(members)}
+        for metric in ('host_inst_rate', 'host_tick_rate', 'peak_memory_mb', 'wall_seconds'):
+            summary[group][metric] = float(np.mean([m[metric] for m in members]))
+    return summary
+
+def find_regressions(rows, baseline, threshold=DEFAULT_THRESHOLD):
+    """與基線比較，返回 [(配置名, 指標, 基線值, 當前值, 相對變化)]"""
+    regressions = []
+    for row in rows:
+        reference = baseline.get(config_signature(row['config']))
+        if reference is None:
+            continue
+        for metric, higher_is_better in REGRESSION_METRICS:
+            before, after = reference.get(metric), row[metric]
+            if not before or not after:
+                continue
+            change = (after - before) / before
+            if (change < -threshold) if higher_is_better else (change > threshold):
+                regressions.append((row['name'], metric, before, after, change))
+    return regressions
+
+def save_baseline(rows, baseline_file=DEFAULT_BASELINE):
+    baseline = {config_signature(row['config']): {metric: row[metric] for metric, _ in REGRESSION_METRICS}
+                for row in rows}
+    os.makedirs(os.path.dirname(baseline_file) or '.', exist_ok=True)
+    with open(baseline_file, 'w') as f:
+        json.dump(baseline, f, indent=2)
+
+def load_baseline(baseline_file=DEFAULT_BASELINE):
+    if not os.path.exists(baseline_file):
+        return None
+    with open(baseline_file, 'r') as f:
+        return json.load(f)
+
+def format_report(rows, regressions=None, threshold=DEFAULT_THRESHOLD):
+    """生成文本報告（按墻鐘時間從高到低排列）"""
+    lines = ["Simulator Throughput Report", "=" * 60, ""]
+    lines.append(f"{'Configuration':<24} {'cores':>5} {'L1/L2':>14} {'wall s':>9} {'CPU%':>6} "
+                 f"{'inst/s':>12} {'ticks/s':>14} {'mem MB':>9}")
+    for row in sorted(rows, key=lambda r: r['wall_seconds'], reverse=True):
+        lines.append(f"{row['name']:<24} {row['num_cores']:>5} {row['cache_size']:>14} "
+                     f"{row['wall_seconds']:>9.1f} {row['cpu_utilization'] * 100:>5.0f}% "
+                     f"{row['host_inst_rate']:>12,.0f} {row['host_tick_rate']:>14,.0f} "
+                     f"{row['peak_memory_mb']:>9.1f}")
+
+    for key, title in (('num_cores', 'By Core Count'), ('cache_size', 'By Cache Size (L1/L2)')):
+        lines += ["", title, "-" * 40]
+        for group, summary in group_throughput(rows, key).items():
+            lines.append(f"{str(group):>14}  runs {summary['runs']:>4}  "
+                         f"inst/s {summary['host_inst_rate']:>12,.0f}  "
+                         f"ticks/s {summary['host_tick_rate']:>14,.0f}  "
+                         f"mem {summary['peak_memory_mb']:>8.1f} MB  "
+                         f"wall {summary['wall_seconds']:>8.1f} s")
+
+    if regressions is not None:
+        lines += ["", f"Regressions vs Baseline (threshold {threshold * 100:.0f}%)", "-" * 40]
+        if not regressions:
+            lines.append("None")
+        for name, metric, before, after, change in regressions:
+            lines.append(f"⚠️  {name}: {metric} {before:,.1f} -> {after:,.1f} ({change * 100:+.1f}%)")
+    return "\n".join(lines) + "\n"
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='模擬器主機吞吐量報告')
+    parser.add_argument('--run-info', default=DEFAULT_RUN_INFO,
+                        help=f'run_all_configs.py生成的運行信息（默認: {DEFAULT_RUN_INFO}）')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help=f'吞吐量基線文件（默認: {DEFAULT_BASELINE}）')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次結果保存為新的基線')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'回歸閾值（相對變化，默認: {DEFAULT_THRESHOLD}）')
+    parser.add_argument('--output', default=DEFAULT_REPORT, help=f'報告文件（默認: {DEFAULT_REPORT}）')
+    parser.add_argument('--strict', action='store_true', help='發現回歸時以狀態1退出')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.run_info):
+        print(f"❌ 運行信息不存在: {args.run_info}")
+        print("Please run first: python3 run_all_configs.py")
+        sys.exit(1)
+
+    rows = collect_throughput(args.run_info)
+    if not rows:
+        print("❌ 沒有成功的運行")
+        sys.exit(1)
+
+    baseline = load_baseline(args.baseline)
+    regressions = find_regressions(rows, baseline, args.threshold) if baseline is not None else None
+    report = format_report(rows, regressions, args.threshold)
+    print(report)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report)
+    print(f"📝 吞吐量報告已保存: {args.output}")
+
+    if args.save_baseline:
+        save_baseline(rows, args.baseline)
+        print(f"📌 基線已保存: {args.baseline}")
+
+    if regressions and args.strict:
+        sys.exit(1)
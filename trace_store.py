@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Cache調試跟蹤的二進制索引格式（.ctrace目錄）
+
+文本跟蹤每行都重複 `writable: 1 readable: 1 dirty: 0 ...` 之類的字符串，每次分析都要用
+正則重新解析。convert_trace() 只解析一遍，把每個CacheEvent壓縮為固定寬度的記錄:
+
+  trace.ctrace/
+    events.bin    EVENT_DTYPE記錄數組（按tick排序），以np.memmap只讀映射
+    by_cache.npy  按 (緩存, tick) 排列的事件位置
+    index.npz     稀疏索引：每INDEX_STRIDE個事件取一個tick（全局和每個緩存各一份）
+    meta.json     格式版本、事件數、緩存名/請求類型/包標誌的字符串表
+
+時間窗口查詢先在稀疏索引上二分，再在至多INDEX_STRIDE個記錄內二分，只觸及O(log n)個頁面。
+字符串字段在記錄中保存為字符串表的下標；other事件只保留事件類型，不保存原始消息。
+"""
+
+import os
+import sys
+import json
+import numpy as np
+
+from cache_trace import CacheEvent, MESI_STATES, iter_cache_events
+
+# 版本2: 增加snoop事件，偵聽引起的降級/失效記錄為transition事件
+FORMAT_VERSION = 2
+TRACE_SUFFIX = '.ctrace'
+EVENTS_FILE = 'events.bin'
+BY_CACHE_FILE = 'by_cache.npy'
+INDEX_FILE = 'index.npz'
+META_FILE = 'meta.json'
+
+# 轉換時每次寫出的事件數
+CHUNK_EVENTS = 1 << 16
+INDEX_STRIDE = 4096
+
+EVENT_KINDS = ('access', 'transition', 'update', 'mshr', 'create_miss', 'response', 'other', 'snoop')
+# 狀態編碼：0表示沒有狀態
+STATE_CODES = ('',) + MESI_STATES
+NO_ADDR = np.iinfo(np.uint64).max
+
+EVENT_DTYPE = np.dtype([
+    ('tick', '<u8'),
+    ('start', '<u8'),      # 沒有地址時為NO_ADDR
+    ('end', '<u8'),
+    ('set', '<i4'),        # 沒有時為-1
+    ('cache', '<u2'),      # meta['caches']的下標
+    ('way', '<i2'),        # 沒有時為-1
+    ('kind', 'u1'),        # EVENT_KINDS的下標
+    ('cmd', 'u1'),         # meta['cmds']的下標，0表示沒有
+    ('flags', 'u1'),       # meta['flags']的下標，0表示沒有
+    ('hit', 'i1'),         # access事件: 1/0，其它為-1
+    ('old_state', 'u1'),   # STATE_CODES的下標
+    ('state', 'u1')
+])
+
+def is_binary_trace(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILE))
+
+class _StringTable:
+    """字符串到下標的映射，下標0保留給空值"""
+
+    def __init__(self, limit):
+        self.values = ['']
+        self.codes = {'': 0, None: 0}
+        self.limit = limit
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            if len(self.values) >= self.limit:
+                raise ValueError(f"字符串表已滿（{self.limit}項）: {value}")
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+def _pack(events, caches, cmds, flags):
+    records = np.empty(len(events), dtype=EVENT_DTYPE)
+    records['tick'] = [e.tick for e in events]
+    records['start'] = [NO_ADDR if e.start is None else e.start for e in events]
+    records['end'] = [NO_ADDR if e.end is None else e.end for e in events]
+    records['set'] = [-1 if e.set is None else e.set for e in events]
+    records['cache'] = [caches.code(e.cache) for e in events]
+    records['way'] = [-1 if e.way is None else e.way for e in events]
+    records['kind'] = [EVENT_KINDS.index(e.kind) for e in events]
+    records['cmd'] = [cmds.code(e.cmd) for e in events]
+    records['flags'] = [flags.code(e.flags or None) for e in events]
+    records['hit'] = [-1 if e.hit is None else int(e.hit) for e in events]
+    records['old_state'] = [STATE_CODES.index(e.old_state or '') for e in events]
+    records['state'] = [STATE_CODES.index(e.state or '') for e in events]
+    return records
+
+def convert_trace(source, output_dir, stride=INDEX_STRIDE):
+    """把文本跟蹤（支持 .gz / .zst）轉換為 .ctrace 目錄，返回事件數
+
+    事件分塊寫出，內存佔用與跟蹤大小無關（索引構建除外：每個事件約10字節）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    events_file = os.path.join(output_dir, EVENTS_FILE)
+    caches, cmds, flags = _StringTable(1 << 16), _StringTable(1 << 8), _StringTable(1 << 8)
+
+    count = 0
+    last_tick = -1
+    ordered = True
+    with open(events_file + '.tmp', 'wb') as f:
+        chunk = []
+        for event in iter_cache_events(source):
+            chunk.append(event)
+            if len(chunk) == CHUNK_EVENTS:
+                records = _pack(chunk, caches, cmds, flags)
+                records.tofile(f)
+                ordered = ordered and last_tick <= records['tick'][0] and \
+                    bool(np.all(records['tick'][1:] >= records['tick'][:-1]))
+                last_tick = int(records['tick'][-1])
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            records = _pack(chunk, caches, cmds, flags)
+            records.tofile(f)
+            ordered = ordered and last_tick <= records['tick'][0] and \
+                bool(np.all(records['tick'][1:] >= records['tick'][:-1]))
+            count += len(chunk)
+
+    if not ordered and count:
+        # gem5按tick順序輸出調試信息；拼接過的跟蹤需要按tick穩定排序
+        print("⚠️  跟蹤中的tick不是單調的，按tick重新排序")
+        events = np.fromfile(events_file + '.tmp', dtype=EVENT_DTYPE)
+        events[np.argsort(events['tick'], kind='stable')].tofile(events_file + '.tmp')
+        del events
+    os.replace(events_file + '.tmp', events_file)
+
+    meta = {
+        'version': FORMAT_VERSION,
+        'source': os.path.abspath(source) if isinstance(source, str) else None,
+        'events': count,
+        'stride': stride,
+        'caches': caches.values,
+        'cmds': cmds.values,
+        'flags': flags.values
+    }
+    _build_index(output_dir, meta)
+    with open(os.path.join(output_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return count
+
+def _build_index(output_dir, meta):
+    """寫出按緩存分組的事件位置和稀疏tick索引"""
+    count, stride = meta['events'], meta['stride']
+    events = np.memmap(os.path.join(output_dir, EVENTS_FILE), dtype=EVENT_DTYPE, mode='r',
+                       shape=(count,)) if count else np.empty(0, dtype=EVENT_DTYPE)
+    ticks = events['tick']
+    cache_ids = np.asarray(events['cache'])
+
+    positions = np.argsort(cache_ids, kind='stable').astype(np.uint32 if count < 2 ** 32 else np.uint64)
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(cache_ids, minlength=len(meta['caches'])))))
+    np.save(os.path.join(output_dir, BY_CACHE_FILE), positions)
+
+    # 每個緩存的稀疏索引拼接在一起，cache_tick_offsets[c]為第c個緩存的起點
+    cache_ticks = [np.asarray(ticks[positions[offsets[c]:offsets[c + 1]:stride]])
+                   for c in range(len(meta['caches']))]
+    np.savez(os.path.join(output_dir, INDEX_FILE),
+             tick_index=np.asarray(ticks[::stride]),
+             cache_offsets=offsets,
+             cache_tick_index=np.concatenate(cache_ticks) if cache_ticks else np.empty(0, np.uint64),
+             cache_tick_offsets=np.concatenate(([0], np.cumsum([len(t) for t in cache_ticks]))))
+
+def _bound(sparse, stride, length, get_ticks, tick, side):
+    """在有序tick序列中查找插入位置：先查稀疏索引，再在一個stride內二分
+
+    get_ticks(lo, hi) 返回序列中 [lo, hi) 的tick
+    """
+    block = int(np.searchsorted(sparse, tick, side))
+    lo = max(0, (block - 1) * stride)
+    hi = min(length, block * stride + 1)
+    return lo + int(np.searchsorted(get_ticks(lo, hi), tick, side))
+
+class TraceFile:
+    """只讀打開的 .ctrace 跟蹤"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"不支持的跟蹤格式版本: {self.meta.get('version')} (需要 {FORMAT_VERSION}，"
+                             f"請用 trace_store.py convert 重新轉換)")
+
+        self.path = path
+        self.caches = self.meta['caches']
+        self.cmds = self.meta['cmds']
+        self.flags = self.meta['flags']
+        self.stride = self.meta['stride']
+        count = self.meta['events']
+        self.events = np.memmap(os.path.join(path, EVENTS_FILE), dtype=EVENT_DTYPE, mode='r',
+                                shape=(count,)) if count else np.empty(0, dtype=EVENT_DTYPE)
+        self.by_cache = np.load(os.path.join(path, BY_CACHE_FILE), mmap_mode='r')
+        with np.load(os.path.join(path, INDEX_FILE)) as index:
+            self._index = {name: index[name] for name in index.files}
+
+    def __len__(self):
+        return len(self.events)
+
+    def cache_id(self, cache):
+        try:
+            return self.caches.index(cache)
+        except ValueError:
+            raise KeyError(f"跟蹤中沒有緩存: {cache} (可選: {', '.join(self.caches[1:])})")
+
+    def window(self, start_tick=None, end_tick=None, cache=None):
+        """start_tick <= tick < end_tick 的事件記錄，可只取一個緩存的事件
+
+        不指定緩存時返回內存映射的切片（不複製），否則按位置取出記錄
+        """
+        if cache is None:
+            ticks = self.events['tick']
+            sparse = self._index['tick_index']
+            length = len(self.events)
+            get_ticks = lambda lo, hi: ticks[lo:hi]
+        else:
+            c = self.cache_id(cache)
+            offsets = self._index['cache_offsets']
+            positions = self.by_cache[offsets[c]:offsets[c + 1]]
+            tick_offsets = self._index['cache_tick_offsets']
+            sparse = self._index['cache_tick_index'][tick_offsets[c]:tick_offsets[c + 1]]
+            length = len(positions)
+            get_ticks = lambda lo, hi: self.events['tick'][positions[lo:hi]]
+
+        lo = 0 if start_tick is None else _bound(sparse, self.stride, length, get_ticks, start_tick, 'left')
+        hi = length if end_tick is None else _bound(sparse, self.stride, length, get_ticks, end_tick, 'left')
+        if cache is None:
+            return self.events[lo:hi]
+        return self.events[positions[lo:max(lo, hi)]]
+
+    def to_events(self, records):
+        """把記錄轉換回CacheEvent（兼容逐事件的分析器）"""
+        for r in records:
+            start, end = int(r['start']), int(r['end'])
+            hit, set_index, way = int(r['hit']), int(r['set']), int(r['way'])
+            yield CacheEvent(int(r['tick']), self.caches[r['cache']], EVENT_KINDS[r['kind']],
+                             self.cmds[r['cmd']] or None,
+                             None if start == NO_ADDR else start,
+                             None if end == NO_ADDR else end,
+                             self.flags[r['flags']], None if hit < 0 else bool(hit),
+                             STATE_CODES[r['old_state']] or None, STATE_CODES[r['state']] or None,
+                             None if set_index < 0 else set_index, None if way < 0 else way, None)
+
+def summarize(trace, block_size=64, records=None):
+    """與 cache_trace.TraceAnalyzer.summary() 相同的彙總，在記錄數組上向量化計算"""
+    events = trace.events if records is None else records
+    ticks = np.asarray(events['tick'])
+    result = {
+        'events': len(events),
+        'first_tick': int(ticks[0]) if len(ticks) else None,
+        'last_tick': int(ticks[-1]) if len(ticks) else None,
+        'caches': {}
+    }
+
+    kinds = np.asarray(events['kind'])
+    caches = np.asarray(events['cache'])
+    access = kinds == EVENT_KINDS.index('access')
+    transition = kinds == EVENT_KINDS.index('transition')
+    i_state = STATE_CODES.index('I')
+    num_states = len(STATE_CODES)
+
+    t_events = events[transition]
+    old = np.where(t_events['old_state'] == 0, i_state, t_events['old_state'])
+    fills = old == i_state
+
+    # 駐留時間：按 (緩存, 塊) 排序後，每次填充到同一個塊的下一次填充或失效（偵聽失效為 *→I 的transition）
+    lifetimes = {}
+    boundary = fills | (t_events['state'] == i_state)
+    b_events = t_events[boundary]
+    b_fill = fills[boundary]
+    blocks = b_events['start'] - b_events['start'] % block_size
+    order = np.lexsort((b_events['tick'], blocks, b_events['cache']))
+    b_cache, b_block = b_events['cache'][order], blocks[order]
+    b_tick, b_fill = b_events['tick'][order].astype(np.int64), b_fill[order]
+    ends = b_fill[:-1] & (b_cache[:-1] == b_cache[1:]) & (b_block[:-1] == b_block[1:])
+    durations = b_tick[1:][ends] - b_tick[:-1][ends]
+    # 與 cache_trace._log2_bucket 相同：bit_length - 1
+    buckets = np.maximum(0, np.frexp(durations.astype(np.float64))[1] - 1)
+
+    for c in np.unique(caches[access | transition]):
+        name = trace.caches[c]
+        in_cache = t_events['cache'] == c
+        matrix = np.bincount(old[in_cache].astype(np.int64) * num_states + t_events['state'][in_cache],
+                             minlength=num_states * num_states).reshape(num_states, num_states)
+
+        a_events = events[access & (caches == c)]
+        hits = np.bincount(a_events['cmd'][a_events['hit'] == 1], minlength=len(trace.cmds))
+        misses = np.bincount(a_events['cmd'][a_events['hit'] == 0], minlength=len(trace.cmds))
+        accessed = np.unique(a_events['cmd'])
+
+        fill_sets = t_events['set'][in_cache & fills]
+        fill_sets = fill_sets[fill_sets >= 0]
+        sets, set_counts = np.unique(fill_sets, return_counts=True)
+
+        cache_buckets = buckets[b_cache[:-1][ends] == c]
+        lifetime_buckets, lifetime_counts = np.unique(cache_buckets, return_counts=True)
+
+        result['caches'][name] = {
+            'transition_matrix': {o: {n: int(matrix[STATE_CODES.index(o), STATE_CODES.index(n)])
+                                      for n in MESI_STATES} for o in MESI_STATES},
+            'accesses': {trace.cmds[cmd] or None: {'hits': int(hits[cmd]), 'misses': int(misses[cmd])}
+                         for cmd in sorted(accessed, key=lambda cmd: trace.cmds[cmd])},
+            'set_fills': {int(s): int(n) for s, n in zip(sets, set_counts)},
+            'lifetime_log2_ticks': {int(b): int(n) for b, n in zip(lifetime_buckets, lifetime_counts)}
+        }
+    result['caches'] = dict(sorted(result['caches'].items()))
+    return result
+
+def format_event(trace, record):
+    """單個事件的簡短文本表示（query命令使用）"""
+    event = next(trace.to_events([record]))
+    parts = [f"{event.tick}: {event.cache}: {event.kind}"]
+    if event.cmd:
+        parts.append(event.cmd)
+    if event.start is not None:
+        parts.append(f"[{event.start:x}:{event.end:x}]" if event.end is not None else f"{event.start:#x}")
+    if event.flags:
+        parts.append(event.flags)
+    if event.hit is not None:
+        parts.append('hit' if event.hit else 'miss')
+    if event.state:
+        parts.append(f"{event.old_state or ''}->{event.state}" if event.kind == 'transition' else event.state)
+    if event.set is not None:
+        parts.append(f"set {event.set:#x} way {event.way}")
+    return " ".join(parts)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Cache調試跟蹤的二進制索引格式')
+    sub = parser.add_subparsers(dest='command', required=True)
+    convert = sub.add_parser('convert', help='把文本跟蹤轉換為 .ctrace')
+    convert.add_argument('trace', help='文本跟蹤（支持 .gz / .zst）')
+    convert.add_argument('output', nargs='?', help='輸出目錄（默認: <跟蹤名>.ctrace）')
+    convert.add_argument('--stride', type=int, default=INDEX_STRIDE,
+                         help=f'稀疏索引間隔（默認: {INDEX_STRIDE}）')
+    info = sub.add_parser('info', help='顯示 .ctrace 的事件數和緩存列表')
+    info.add_argument('trace')
+    query = sub.add_parser('query', help='按tick窗口和緩存查詢事件')
+    query.add_argument('trace')
+    query.add_argument('--start', type=int, help='起始tick（包含）')
+    query.add_argument('--end', type=int, help='結束tick（不包含）')
+    query.add_argument('--cache', help='只顯示該緩存的事件（例如 system.l1_dcache0）')
+    query.add_argument('--limit', type=int, default=50, help='最多顯示的事件數（默認: 50）')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        stem = args.trace.removesuffix('.gz').removesuffix('.zst')
+        output = args.output or os.path.splitext(stem)[0] + TRACE_SUFFIX
+        count = convert_trace(args.trace, output, args.stride)
+        size = sum(os.path.getsize(os.path.join(output, name)) for name in os.listdir(output))
+        print(f"✅ {count:,} 個事件 -> {output} ({size / 2 ** 20:.1f} MB，"
+              f"原文件 {os.path.getsize(args.trace) / 2 ** 20:.1f} MB)")
+        sys.exit(0)
+
+    trace = TraceFile(args.trace)
+    if args.command == 'info':
+        meta = trace.meta
+        print(f"事件數: {meta['events']:,}  來源: {meta['source']}")
+        if len(trace):
+            print(f"tick範圍: {trace.events['tick'][0]} - {trace.events['tick'][-1]}")
+        offsets = trace._index['cache_offsets']
+        for c, cache in enumerate(trace.caches):
+            if offsets[c + 1] > offsets[c]:
+                print(f"  {cache:<28} {offsets[c + 1] - offsets[c]:>12,} 個事件")
+    else:
+        try:
+            records = trace.window(args.start, args.end, args.cache)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}")
+            sys.exit(1)
+        print(f"{len(records):,} 個事件")
+        for record in records[:args.limit]:
+            print(format_event(trace, record))
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+參數化CNN工作負載生成器
+
+按 config/workloads.json 中登記的參數生成C源碼並交叉編譯為RISC-V靜態程序，
+sweep規格中的 "workload" 可以直接使用登記的名稱（例如 "cnn_mt_sharing"）。
+
+登記項格式:
+{
+  "cnn_mt_sharing": {
+    "description": "...",
+    "threaded": true,               # true: 所有核心共享一個進程（pthread），false: 每核一個進程
+    "dtype": "float32",             # float32 / int32 / int16 / int8
+    "tile_rows": 4,                 # 每個tile的輸出行數（多線程時按tile分配給線程）
+    "layers": [{"height": 32, "width": 32, "in_channels": 3, "out_channels": 16, "kernel": 3}],
+    "kernels": ["false_sharing", "true_sharing"],   # 額外的共享內核（僅多線程）
+    "sharing_iterations": 2000,
+    "stress_bytes": 4096
+  }
+}
+卷積為stride 1、same padding，相鄰層的通道數必須銜接。多線程模式下第i個tile由線程
+i % N 計算，下一層的tile等待上一層相鄰tile的就緒標誌（生產者/消費者），
+最後一層之後的池化同樣按tile等待。線程數由命令行參數傳入（系統腳本傳入核心數）。
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+from string import Template
+
+WORKLOAD_REGISTRY = 'config/workloads.json'
+WORKLOAD_SRC_DIR = 'workloads/src'
+WORKLOAD_BIN_DIR = 'workloads/bin'
+
+# 數據類型: (元素類型, 累加類型, 累加結果右移位數)
+DTYPES = {
+    'float32': ('float', 'float', 0),
+    'int32': ('int32_t', 'int64_t', 16),
+    'int16': ('int16_t', 'int32_t', 8),
+    'int8': ('int8_t', 'int32_t', 7)
+}
+
+SHARING_KERNELS = ('false_sharing', 'true_sharing')
+
+MAX_THREADS = 64
+
+COMPILERS = ('riscv64-unknown-linux-gnu-gcc', 'riscv64-linux-gnu-gcc')
+CFLAGS = ['-static', '-O2', '-march=rv64gc', '-mabi=lp64d']
+
+def load_registry(registry_file=WORKLOAD_REGISTRY):
+    """讀取工作負載登記表 {名稱: 參數}，文件不存在時返回空表"""
+    if not os.path.exists(registry_file):
+        return {}
+    with open(registry_file, 'r') as f:
+        return json.load(f)
+
+def workload_binary(name, bin_dir=WORKLOAD_BIN_DIR):
+    """登記的工作負載編譯後的程序路徑"""
+    return os.path.join(bin_dir, name)
+
+def validate_workload(name, params):
+    """檢查登記參數，不合法時拋出ValueError"""
+    dtype = params.get('dtype', 'float32')
+    if dtype not in DTYPES:
+        raise ValueError(f"{name}: 未知的數據類型 {dtype} (可選: {', '.join(DTYPES)})")
+
+    layers = params.get('layers', [])
+    if not layers:
+        raise ValueError(f"{name}: 至少需要一層")
+    for i, layer in enumerate(layers):
+        if layer['kernel'] % 2 == 0:
+            raise ValueError(f"{name}: 第{i}層的kernel必須是奇數（same padding）")
+        if i and (layer['in_channels'] != layers[i - 1]['out_channels'] or
+                  layer['height'] != layers[i - 1]['height'] or
+                  layer['width'] != layers[i - 1]['width']):
+            raise ValueError(f"{name}: 第{i}層的輸入形狀與上一層的輸出不一致")
+
+    if params.get('tile_rows', 4) < 1:
+        raise ValueError(f"{name}: tile_rows必須 >= 1")
+
+    kernels = params.get('kernels', [])
+    for kernel in kernels:
+        if kernel not in SHARING_KERNELS:
+            raise ValueError(f"{name}: 未知的內核 {kernel} (可選: {', '.join(SHARING_KERNELS)})")
+    if kernels and not params.get('threaded', False):
+        raise ValueError(f"{name}: 共享內核需要多線程模式（threaded: true）")
+
+_SOURCE = Template(r'''// 由 workload_gen.py 生成，請勿手動修改: $name
+// $description
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <stdint.h>
+#include <pthread.h>
+
+#include "m5_markers.h"
+
+typedef $elem_type elem_t;
+typedef $acc_type acc_t;
+#define ACC_SHIFT $acc_shift
+#define IS_FLOAT $is_float
+
+#define THREADED $threaded
+#define MAX_THREADS $max_threads
+#define NUM_LAYERS $num_layers
+#define TILE_ROWS $tile_rows
+#define HEIGHT $height
+#define WIDTH $width
+#define NUM_TILES ((HEIGHT + TILE_ROWS - 1) / TILE_ROWS)
+#define STRESS_BYTES $stress_bytes
+#define SHARING_ITERATIONS $sharing_iterations
+#define FALSE_SHARING $false_sharing
+#define TRUE_SHARING $true_sharing
+#define CACHE_LINE 64
+
+typedef struct {
+    int in_channels;
+    int out_channels;
+    int kernel;
+} layer_shape_t;
+
+static const layer_shape_t shapes[NUM_LAYERS] = {
+$shapes
+};
+
+// acts[l]為第l層的輸入（[通道][行][列]），acts[NUM_LAYERS]為最後一層的輸出
+static elem_t *acts[NUM_LAYERS + 1];
+static elem_t *weights[NUM_LAYERS];
+static elem_t *pooled;
+
+// 每層每個tile的就緒標誌（生產者/消費者同步）
+static volatile int tile_ready[NUM_LAYERS][NUM_TILES];
+
+static int num_threads = 1;
+
+// 假共享：每個線程的計數器擠在同一緩存行中
+static struct {
+    volatile long counter[CACHE_LINE / sizeof(long)];
+} __attribute__((aligned(CACHE_LINE))) false_shared;
+
+// 真共享：所有線程原子更新同一個計數器並讀取共享表
+static volatile long true_shared_counter __attribute__((aligned(CACHE_LINE)));
+static long shared_table[CACHE_LINE];
+
+static elem_t *alloc_elems(size_t count) {
+    elem_t *buffer = aligned_alloc(CACHE_LINE, (count * sizeof(elem_t) + CACHE_LINE - 1) /
+                                               CACHE_LINE * CACHE_LINE);
+    if (!buffer) {
+        printf("Allocation of %zu elements failed!\n", count);
+        exit(1);
+    }
+    return buffer;
+}
+
+static elem_t make_value(long seed) {
+#if IS_FLOAT
+    return (elem_t)((seed % 1000) / 1000.0f - 0.25f);
+#else
+    return (elem_t)(seed % 7 - 2);
+#endif
+}
+
+static void init_data(void) {
+    printf("Initializing %d layer(s) of %dx%d feature maps...\n", NUM_LAYERS, HEIGHT, WIDTH);
+    for (int l = 0; l <= NUM_LAYERS; l++) {
+        int channels = l < NUM_LAYERS ? shapes[l].in_channels : shapes[l - 1].out_channels;
+        acts[l] = alloc_elems((size_t)channels * HEIGHT * WIDTH);
+    }
+    for (size_t i = 0; i < (size_t)shapes[0].in_channels * HEIGHT * WIDTH; i++)
+        acts[0][i] = make_value(i);
+
+    for (int l = 0; l < NUM_LAYERS; l++) {
+        const layer_shape_t *s = &shapes[l];
+        size_t count = (size_t)s->out_channels * s->in_channels * s->kernel * s->kernel;
+        weights[l] = alloc_elems(count);
+        for (size_t i = 0; i < count; i++)
+            weights[l][i] = make_value(i * 31 + l);
+    }
+
+    pooled = alloc_elems((size_t)shapes[NUM_LAYERS - 1].out_channels * (HEIGHT / 2) * (WIDTH / 2));
+    for (int i = 0; i < CACHE_LINE; i++)
+        shared_table[i] = i;
+}
+
+// 第l層在tile的輸出行上做卷積（stride 1, same padding, ReLU）
+static void conv_tile(int l, int tile) {
+    const layer_shape_t *s = &shapes[l];
+    const elem_t *in = acts[l];
+    const elem_t *w = weights[l];
+    elem_t *out = acts[l + 1];
+    int pad = s->kernel / 2;
+    int y0 = tile * TILE_ROWS;
+    int y1 = y0 + TILE_ROWS < HEIGHT ? y0 + TILE_ROWS : HEIGHT;
+
+    for (int oc = 0; oc < s->out_channels; oc++) {
+        for (int y = y0; y < y1; y++) {
+            for (int x = 0; x < WIDTH; x++) {
+                acc_t sum = 0;
+                for (int ic = 0; ic < s->in_channels; ic++) {
+                    for (int ky = 0; ky < s->kernel; ky++) {
+                        int iy = y + ky - pad;
+                        if (iy < 0 || iy >= HEIGHT)
+                            continue;
+                        for (int kx = 0; kx < s->kernel; kx++) {
+                            int ix = x + kx - pad;
+                            if (ix < 0 || ix >= WIDTH)
+                                continue;
+                            sum += (acc_t)in[((size_t)ic * HEIGHT + iy) * WIDTH + ix] *
+                                   w[(((size_t)oc * s->in_channels + ic) * s->kernel + ky) *
+                                     s->kernel + kx];
+                        }
+                    }
+                }
+#if IS_FLOAT
+                out[((size_t)oc * HEIGHT + y) * WIDTH + x] = sum > 0 ? sum : 0;
+#else
+                out[((size_t)oc * HEIGHT + y) * WIDTH + x] = sum > 0 ? (elem_t)(sum >> ACC_SHIFT) : 0;
+#endif
+            }
+        }
+    }
+}
+
+// 2x2最大池化最後一層輸出的一個tile
+static void pool_tile(int tile) {
+    int channels = shapes[NUM_LAYERS - 1].out_channels;
+    const elem_t *in = acts[NUM_LAYERS];
+    int y0 = tile * TILE_ROWS;
+    int y1 = y0 + TILE_ROWS < HEIGHT ? y0 + TILE_ROWS : HEIGHT;
+
+    for (int c = 0; c < channels; c++) {
+        // 輸出行 y/2 歸屬於包含輸入行y（偶數）的tile，y+1可能在下一個tile中
+        for (int y = (y0 + 1) / 2 * 2; y < y1 && y + 1 < HEIGHT; y += 2) {
+            for (int x = 0; x + 1 < WIDTH; x += 2) {
+                const elem_t *p = &in[((size_t)c * HEIGHT + y) * WIDTH + x];
+                elem_t m = p[0];
+                if (p[1] > m) m = p[1];
+                if (p[WIDTH] > m) m = p[WIDTH];
+                if (p[WIDTH + 1] > m) m = p[WIDTH + 1];
+                pooled[((size_t)c * (HEIGHT / 2) + y / 2) * (WIDTH / 2) + x / 2] = m;
+            }
+        }
+    }
+}
+
+// 等待第l層（l < 0 表示輸入，總是就緒）的第tile個tile完成
+static void wait_tile(int l, int tile) {
+    if (l < 0 || tile < 0 || tile >= NUM_TILES)
+        return;
+    while (!__atomic_load_n(&tile_ready[l][tile], __ATOMIC_ACQUIRE))
+        ;
+}
+
+// 卷積第l層的tile需要上一層相鄰tile覆蓋 kernel/2 行的光環
+static void wait_inputs(int l, int tile) {
+    int halo_tiles = (shapes[l].kernel / 2 + TILE_ROWS - 1) / TILE_ROWS;
+    for (int t = tile - halo_tiles; t <= tile + halo_tiles; t++)
+        wait_tile(l - 1, t);
+}
+
+#if FALSE_SHARING
+static void false_sharing_kernel(int tid) {
+    int slot = tid % (CACHE_LINE / sizeof(long));
+    for (int i = 0; i < SHARING_ITERATIONS; i++)
+        false_shared.counter[slot]++;
+}
+#endif
+
+#if TRUE_SHARING
+static void true_sharing_kernel(int tid) {
+    long sum = 0;
+    for (int i = 0; i < SHARING_ITERATIONS; i++) {
+        __atomic_fetch_add(&true_shared_counter, 1, __ATOMIC_RELAXED);
+        sum += shared_table[(i + tid) % CACHE_LINE];
+    }
+    shared_table[tid % CACHE_LINE] = sum;
+}
+#endif
+
+static void memory_stress(int tid) {
+    size_t count = STRESS_BYTES / sizeof(int);
+    volatile int *data = malloc(count * sizeof(int));
+    if (!data)
+        return;
+    for (int iteration = 0; iteration < 16; iteration++) {
+        for (size_t i = 0; i < count; i++)
+            data[i] = iteration * (int)i + tid;
+        int sum = 0;
+        for (size_t i = 0; i < count; i++)
+            sum += data[i];
+        for (size_t i = 0; i < 64 && count; i++)
+            data[(iteration * 7 + i * 13) % count] = sum + (int)i;
+    }
+    free((void *)data);
+}
+
+static void *worker(void *arg) {
+    int tid = (int)(long)arg;
+
+    m5_work_begin(ROI_WORK_ID, tid);
+
+    // 卷積：tile i 由線程 i % N 計算，等待上一層的相鄰tile就緒
+    m5_work_begin(PHASE_CONVOLUTION, tid);
+    for (int l = 0; l < NUM_LAYERS; l++) {
+        for (int tile = tid; tile < NUM_TILES; tile += num_threads) {
+            wait_inputs(l, tile);
+            conv_tile(l, tile);
+            __atomic_store_n(&tile_ready[l][tile], 1, __ATOMIC_RELEASE);
+        }
+    }
+    m5_work_end(PHASE_CONVOLUTION, tid);
+
+    m5_work_begin(PHASE_POOLING, tid);
+    for (int tile = tid; tile < NUM_TILES; tile += num_threads) {
+        wait_tile(NUM_LAYERS - 1, tile);
+        wait_tile(NUM_LAYERS - 1, tile + 1);
+        pool_tile(tile);
+    }
+    m5_work_end(PHASE_POOLING, tid);
+
+#if FALSE_SHARING
+    m5_work_begin(PHASE_FALSE_SHARING, tid);
+    false_sharing_kernel(tid);
+    m5_work_end(PHASE_FALSE_SHARING, tid);
+#endif
+
+#if TRUE_SHARING
+    m5_work_begin(PHASE_TRUE_SHARING, tid);
+    true_sharing_kernel(tid);
+    m5_work_end(PHASE_TRUE_SHARING, tid);
+#endif
+
+    m5_work_begin(PHASE_MEMORY_STRESS, tid);
+    memory_stress(tid);
+    m5_work_end(PHASE_MEMORY_STRESS, tid);
+
+    m5_work_end(ROI_WORK_ID, tid);
+    return NULL;
+}
+
+static void print_statistics(void) {
+    int channels = shapes[NUM_LAYERS - 1].out_channels;
+    size_t count = (size_t)channels * (HEIGHT / 2) * (WIDTH / 2);
+    double sum = 0;
+    for (size_t i = 0; i < count; i++)
+        sum += pooled[i];
+    printf("Pooled output: %zu elements, sum %.3f\n", count, sum);
+    printf("Shared counter: %ld, false-shared slot 0: %ld\n",
+           true_shared_counter, false_shared.counter[0]);
+}
+
+int main(int argc, char **argv) {
+    printf("=== Generated CNN workload: $name ===\n");
+#if THREADED
+    if (argc > 1)
+        num_threads = atoi(argv[1]);
+    if (num_threads < 1 || num_threads > MAX_THREADS) {
+        printf("Thread count must be between 1 and %d\n", MAX_THREADS);
+        return 1;
+    }
+#else
+    (void)argc;
+    (void)argv;
+#endif
+    printf("Threads: %d, tiles per layer: %d\n", num_threads, NUM_TILES);
+
+    m5_perturb();
+    init_data();
+
+#if THREADED
+    pthread_t threads[MAX_THREADS];
+    for (long t = 1; t < num_threads; t++)
+        pthread_create(&threads[t], NULL, worker, (void *)t);
+    worker((void *)0);
+    for (int t = 1; t < num_threads; t++)
+        pthread_join(threads[t], NULL);
+#else
+    worker((void *)0);
+#endif
+
+    m5_work_begin(PHASE_STATISTICS, 0);
+    print_statistics();
+    m5_work_end(PHASE_STATISTICS, 0);
+
+    printf("=== Workload $name completed ===\n");
+    return 0;
+}
+''')
+
+def generate_source(name, params):
+    """根據登記參數生成C源碼"""
+    validate_workload(name, params)
+    elem_type, acc_type, acc_shift = DTYPES[params.get('dtype', 'float32')]
+    layers = params['layers']
+    kernels = params.get('kernels', [])
+
+    shapes = ",\n".join(f"    {{{layer['in_channels']}, {layer['out_channels']}, {layer['kernel']}}}"
+                        for layer in layers)
+    return _SOURCE.substitute(
+        name=name,
+        description=params.get('description', ''),
+        elem_type=elem_type,
+        acc_type=acc_type,
+        acc_shift=acc_shift,
+        is_float=int(elem_type == 'float'),
+        threaded=int(params.get('threaded', False)),
+        max_threads=MAX_THREADS,
+        num_layers=len(layers),
+        tile_rows=params.get('tile_rows', 4),
+        height=layers[0]['height'],
+        width=layers[0]['width'],
+        stress_bytes=params.get('stress_bytes', 4096),
+        sharing_iterations=params.get('sharing_iterations', 2000),
+        false_sharing=int('false_sharing' in kernels),
+        true_sharing=int('true_sharing' in kernels),
+        shapes=shapes
+    )
+
+def find_compiler():
+    """查找RISC-V交叉編譯器（與compile_cnn_test.sh相同的順序），找不到時返回None"""
+    for compiler in COMPILERS:
+        if shutil.which(compiler):
+            return compiler
+    return None
+
+def build_workload(name, params, src_dir=WORKLOAD_SRC_DIR, bin_dir=WORKLOAD_BIN_DIR,
+                   compiler=None):
+    """生成源碼並編譯，源碼未改變且程序已存在時跳過編譯，返回程序路徑"""
+    source = generate_source(name, params)
+    os.makedirs(src_dir, exist_ok=True)
+    os.makedirs(bin_dir, exist_ok=True)
+
+    source_file = os.path.join(src_dir, f"{name}.c")
+    binary = workload_binary(name, bin_dir)
+    if os.path.exists(source_file) and os.path.exists(binary):
+        with open(source_file, 'r') as f:
+            if f.read() == source:
+                return binary
+
+    with open(source_file, 'w') as f:
+        f.write(source)
+
+    compiler = compiler or find_compiler()
+    if compiler is None:
+        raise RuntimeError(f"找不到RISC-V編譯器（{' / '.join(COMPILERS)}），源碼已生成: {source_file}")
+
+    # m5_markers.h位於倉庫根目錄
+    cmd = [compiler] + CFLAGS + ['-I', os.path.abspath('.'), '-o', binary, source_file,
+                                 '-lpthread', '-lm']
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"編譯 {name} 失敗:\n{result.stderr}")
+    return binary
+
+def ensure_workloads(names, registry=None):
+    """編譯sweep中用到的登記工作負載（未登記的名稱視為已有的程序路徑）"""
+    registry = load_registry() if registry is None else registry
+    for name in sorted(set(names)):
+        if name in registry:
+            binary = build_workload(name, registry[name])
+            print(f"🔧 工作負載 {name}: {binary}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='參數化CNN工作負載生成器')
+    parser.add_argument('--registry', default=WORKLOAD_REGISTRY,
+                        help=f'工作負載登記表（默認: {WORKLOAD_REGISTRY}）')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('list', help='列出登記的工作負載')
+    generate_parser = subparsers.add_parser('generate', help='只生成C源碼')
+    generate_parser.add_argument('names', nargs='*', help='工作負載名稱（默認: 全部）')
+    build_parser = subparsers.add_parser('build', help='生成並編譯')
+    build_parser.add_argument('names', nargs='*', help='工作負載名稱（默認: 全部）')
+    args = parser.parse_args()
+
+    registry = load_registry(args.registry)
+    names = getattr(args, 'names', None) or list(registry)
+    unknown = [name for name in names if name not in registry]
+    if unknown:
+        print(f"❌ 未登記的工作負載: {', '.join(unknown)}")
+        sys.exit(1)
+
+    try:
+        if args.command == 'list':
+            for name, params in registry.items():
+                mode = '多線程' if params.get('threaded') else '每核一個進程'
+                print(f"{name}: {params.get('description', '')} [{mode}, {params.get('dtype', 'float32')}]")
+        elif args.command == 'generate':
+            os.makedirs(WORKLOAD_SRC_DIR, exist_ok=True)
+            for name in names:
+                source_file = os.path.join(WORKLOAD_SRC_DIR, f"{name}.c")
+                with open(source_file, 'w') as f:
+                    f.write(generate_source(name, registry[name]))
+                print(f"📝 {source_file}")
+        elif args.command == 'build':
+            for name in names:
+                print(f"✅ {build_workload(name, registry[name])}")
+        else:
+            parser.print_help()
+            sys.exit(1)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)